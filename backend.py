@@ -1,15 +1,36 @@
 # backend.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from pydantic import BaseModel
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Iterator, List, Optional
+from collections import Counter
+from langchain_core.documents import Document
 import os
+import importlib
+import json
+import math
+import asyncio
+import time
 from dotenv import load_dotenv
+from embedding_cache import CachedEmbeddings
+from dedup import DeviceDeduplicator
+from ratelimit import RateLimiter
+from log_store import LogStore, log_matches, stored_log
+from retention import TieredLogStore
+from sqlite_store import SQLiteLogStore
+from wal import WriteAheadLog, encode_records
+import vector_index
+from live import LiveHub, LogFilter
+import rollups
+from rollups import Rollups
+from search_index import SearchIndex, tokenize
+from summary_cache import SummaryCache
+import binary_logs
+import http_encoding
+import log_export
 
 # ----------------- ENVIRONMENT -----------------
 load_dotenv()
@@ -19,6 +40,69 @@ if not GEMINI_API_KEY:
     print("Warning: GEMINI_API_KEY not found. Please set it in your environment or .env file")
     GEMINI_API_KEY = "demo_key_placeholder"
 
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+NDJSON_CHUNK_SIZE = int(os.getenv("NDJSON_CHUNK_SIZE", "500"))      # parsed lines appended to the store at a time
+NDJSON_MAX_LINE_BYTES = int(os.getenv("NDJSON_MAX_LINE_BYTES", "65536"))
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", "64"))                  # out-of-order sequence numbers tolerated per device
+DEDUP_MAX_DEVICES = int(os.getenv("DEDUP_MAX_DEVICES", "10000"))      # devices tracked before the least recent is forgotten
+# Token buckets on /api/logs and /api/logs/batch, in events per second; a rate of 0 disables that level.
+# Events without a device_id are charged to the client address.
+RATE_LIMIT_DEVICE_RATE = float(os.getenv("RATE_LIMIT_DEVICE_RATE", "5"))
+RATE_LIMIT_DEVICE_BURST = float(os.getenv("RATE_LIMIT_DEVICE_BURST", "50"))
+RATE_LIMIT_GLOBAL_RATE = float(os.getenv("RATE_LIMIT_GLOBAL_RATE", "500"))
+RATE_LIMIT_GLOBAL_BURST = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", "2000"))
+RATE_LIMIT_MAX_DEVICES = int(os.getenv("RATE_LIMIT_MAX_DEVICES", "10000"))
+RATE_LIMIT_CLIENT_RATE = float(os.getenv("RATE_LIMIT_CLIENT_RATE", "50"))     # events without a device_id, per client address
+RATE_LIMIT_CLIENT_BURST = float(os.getenv("RATE_LIMIT_CLIENT_BURST", "500"))
+# Reverse proxies whose X-Forwarded-For is believed; comma-separated addresses
+RATE_LIMIT_TRUSTED_PROXIES = {address.strip() for address in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if address.strip()}
+LOGS_PAGE_SIZE = int(os.getenv("LOGS_PAGE_SIZE", "100"))  # GET /api/logs default limit
+LOGS_PAGE_MAX = int(os.getenv("LOGS_PAGE_MAX", "1000"))
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "1000"))     # events buffered per live subscriber before it catches up from the store
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))      # seconds of silence before a keep-alive frame
+LIVE_MAX_SUBSCRIBERS = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "1000"))
+DATA_DIR = os.getenv("VAULTIFY_DATA_DIR", "data")
+LOG_STORE = os.getenv("LOG_STORE", "memory")                   # memory | sqlite
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(DATA_DIR, "vaultify.db"))
+WAL_DIR = os.getenv("WAL_DIR", os.path.join(DATA_DIR, "wal"))  # memory store only; set to an empty string to disable
+WAL_FSYNC = os.getenv("WAL_FSYNC", "group")                    # always | group | interval
+WAL_FSYNC_INTERVAL = float(os.getenv("WAL_FSYNC_INTERVAL", "1"))
+WAL_SEGMENT_MB = int(os.getenv("WAL_SEGMENT_MB", "64"))
+# Memory store tiers: the newest events stay in memory, older ones move to
+# warm segment files and then to a gzip-compressed cold archive.
+RETENTION_HOT_EVENTS = int(os.getenv("RETENTION_HOT_EVENTS", "100000"))  # 0 keeps everything in memory
+RETENTION_HOT_HOURS = float(os.getenv("RETENTION_HOT_HOURS", "24"))
+RETENTION_EVICT_CHUNK = int(os.getenv("RETENTION_EVICT_CHUNK", "10000"))
+RETENTION_COLD_AFTER_HOURS = float(os.getenv("RETENTION_COLD_AFTER_HOURS", "168"))
+RETENTION_PURGE_AFTER_DAYS = float(os.getenv("RETENTION_PURGE_AFTER_DAYS", "0"))  # 0 keeps the cold archive forever
+RETENTION_DIR = os.getenv("RETENTION_DIR", os.path.join(DATA_DIR, "segments"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "60"))  # seconds between maintenance runs
+NDJSON_MAX_ERRORS = 20  # rejected lines reported back in detail
+EVENT_MAX_CHARS = 256       # longest accepted event type, detail and device id; well within
+DETAIL_MAX_CHARS = 8192     # what the write-ahead log's length prefixes can hold
+DEVICE_ID_MAX_CHARS = 256
+TIMESTAMP_MAX = 2**32       # unix seconds; later timestamps (year 2106) are rejected like the binary format's u32
+EMBED_QUEUE_SIZE = int(os.getenv("EMBED_QUEUE_SIZE", "10000"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_BATCH_WAIT = float(os.getenv("EMBED_BATCH_WAIT", "0.5"))    # seconds to wait for a batch to fill
+EMBED_RETRY_DELAY = float(os.getenv("EMBED_RETRY_DELAY", "5"))    # seconds to back off after an embedding error
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "10000"))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH")  # optional SQLite file to persist cached vectors
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(DATA_DIR, "faiss"))  # empty disables snapshots
+VECTOR_SNAPSHOT_INTERVAL = float(os.getenv("VECTOR_SNAPSHOT_INTERVAL", "300"))  # seconds between snapshots
+ROLLUP_MINUTE_HOURS = float(os.getenv("ROLLUP_MINUTE_HOURS", "48"))  # minute buckets kept; hours and days are kept forever
+ROLLUP_PATH = os.getenv("ROLLUP_PATH", os.path.join(DATA_DIR, "rollups.json"))  # empty disables snapshots
+ROLLUP_SNAPSHOT_INTERVAL = float(os.getenv("ROLLUP_SNAPSHOT_INTERVAL", "60"))
+TIMESERIES_MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", "1000"))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))  # smaller JSON bodies are sent as is; 0 disables compression
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))  # events read from the store per export chunk
+SEARCH_PAGE_MAX = int(os.getenv("SEARCH_PAGE_MAX", "200"))  # most results per /api/search request
+AI_ENABLED = os.getenv("AI_ENABLED", "1") != "0"  # 0 skips loading Gemini entirely
+SUMMARY_STALE_SECONDS = float(os.getenv("SUMMARY_STALE_SECONDS", "30"))  # how far an AI summary may lag behind new logs
+SUMMARY_REFRESH_SECONDS = float(os.getenv("SUMMARY_REFRESH_SECONDS", "0"))  # regenerate even unchanged summaries this often; 0 never
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))  # in-flight LLM requests across /api/summary and /api/ask
+AI_CONTEXT_EVENTS = int(os.getenv("AI_CONTEXT_EVENTS", "500"))  # newest events put in a prompt when there is no vector index
+
 # ----------------- FASTAPI SETUP -----------------
 app = FastAPI()
 app.add_middleware(
@@ -30,8 +114,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Export-Last-Id"],
 )
 
+def json_safe(value):
+    """Replace NaN and Infinity, which strict JSON cannot carry, with their names."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    return value
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # FastAPI's own handler, except that a rejected NaN timestamp echoed back
+    # as the error's input would otherwise fail to render and turn into a 500
+    return JSONResponse(status_code=422, content={"detail": json_safe(jsonable_encoder(exc.errors()))})
+
 # ----------------- ROOT ROUTE -----------------
 @app.get("/")
 def root():
@@ -39,141 +140,1174 @@ def root():
 
 # ----------------- DATA MODELS -----------------
 class LogEntry(BaseModel):
-    event: str
-    detail: str
+    event: str = Field(max_length=EVENT_MAX_CHARS)
+    detail: str = Field(max_length=DETAIL_MAX_CHARS)
+    # unix seconds; defaults to the time the server received it. NaN and
+    # Infinity are rejected, they would poison the rollups and time index
+    timestamp: Optional[float] = Field(None, ge=0, lt=TIMESTAMP_MAX, allow_inf_nan=False)
+    device_id: Optional[str] = Field(None, max_length=DEVICE_ID_MAX_CHARS)
+    seq: Optional[int] = Field(None, ge=0, lt=2**63)  # per-device sequence number, used to drop retried duplicates
+
+if LOG_STORE == "sqlite":
+    store = SQLiteLogStore(SQLITE_PATH)
+elif LOG_STORE == "memory" and RETENTION_HOT_EVENTS > 0:
+    store = TieredLogStore(
+        RETENTION_DIR,
+        hot_events=RETENTION_HOT_EVENTS,
+        hot_hours=RETENTION_HOT_HOURS,
+        evict_chunk=RETENTION_EVICT_CHUNK,
+        cold_after_hours=RETENTION_COLD_AFTER_HOURS,
+        purge_after_days=RETENTION_PURGE_AFTER_DAYS,
+    )
+elif LOG_STORE == "memory":
+    store = LogStore()
+else:
+    raise ValueError(f"Unknown LOG_STORE {LOG_STORE!r}, expected 'memory' or 'sqlite'")
+wal: Optional[WriteAheadLog] = None
+live_hub = LiveHub(
+    read_since=lambda log_id, limit: store.since(log_id, limit),
+    latest_id=lambda: store.last_id,
+    queue_size=LIVE_QUEUE_SIZE,
+    max_subscribers=LIVE_MAX_SUBSCRIBERS,
+)
+event_rollups = Rollups(minute_hours=ROLLUP_MINUTE_HOURS)
+deduplicator = DeviceDeduplicator(window=DEDUP_WINDOW, max_devices=DEDUP_MAX_DEVICES)
+rate_limiter = RateLimiter(
+    device_rate=RATE_LIMIT_DEVICE_RATE,
+    device_burst=RATE_LIMIT_DEVICE_BURST,
+    global_rate=RATE_LIMIT_GLOBAL_RATE,
+    global_burst=RATE_LIMIT_GLOBAL_BURST,
+    max_devices=RATE_LIMIT_MAX_DEVICES,
+    client_rate=RATE_LIMIT_CLIENT_RATE,
+    client_burst=RATE_LIMIT_CLIENT_BURST,
+)
+
+def check_timestamp(timestamp: Optional[float]):
+    """Raise ValueError for a timestamp LogEntry would reject.
+
+    Checked before anything is written: the steps after the store (rollups
+    above all) assume finite, plausible timestamps and must not fail
+    half-way through a batch.
+    """
+    if timestamp is not None and not (math.isfinite(timestamp) and 0 <= timestamp < TIMESTAMP_MAX):
+        raise ValueError(f"timestamp {timestamp!r} is not unix seconds in [0, {TIMESTAMP_MAX})")
+
+def append_records(records: List[dict]) -> List[dict]:
+    """Assign ids and append already-validated records as one atomic step.
+
+    Records whose (device_id, seq) was already seen are dropped, so callers
+    can compare the returned list with their input to count duplicates.
+    Raises ValueError if the records cannot be stored, or OSError if the
+    write-ahead log cannot hold them, in both cases with nothing stored or
+    remembered as seen.
+    """
+    now = time.time()
+    for record in records:
+        check_timestamp(record.get("timestamp"))
+    with store.lock:
+        fresh = deduplicator.filter(records)
+        store.check(fresh)
+        if wal is not None:
+            # Logged before the store changes, so a failed write leaves nothing to undo
+            pending = [stored_log(record, store.last_id + 1 + i, now) for i, record in enumerate(fresh)]
+            wal.append(pending, encode_records(pending))
+        new_logs = store.append(fresh, now)
+        deduplicator.commit(fresh, len(records) - len(fresh))
+        # Enqueue and publish under the lock so consumers see ids in order
+        enqueue_for_indexing(new_logs)
+        live_hub.publish(new_logs)
+        event_rollups.add(new_logs, now)
+        if search_ready:
+            search_index.add(new_logs)
+    return new_logs
+
+def append_logs(entries: List[LogEntry]) -> List[dict]:
+    return append_records([entry.model_dump() for entry in entries])
+
+async def commit_logs():
+    """Wait until appended logs are durable under the WAL's fsync policy, or answer 503."""
+    if wal is not None:
+        try:
+            await wal.commit()
+        except OSError as e:
+            raise HTTPException(status_code=503, detail=f"Logs could not be made durable: {e}")
+
+def restore_dedup(logs: List[dict]):
+    for log in logs:
+        if "device_id" in log and "seq" in log:
+            deduplicator.accept(log["device_id"], log["seq"])
+
+def restore_logs(logs: List[dict]):
+    store.load(logs)
+    restore_dedup(logs)
+
+def replay_wal():
+    started = time.perf_counter()
+    batch = []
+    replayed = 0
+    for log in wal.replay():
+        batch.append(log)
+        if len(batch) >= 10000:
+            restore_logs(batch)
+            replayed += len(batch)
+            batch = []
+    restore_logs(batch)
+    replayed += len(batch)
+    if replayed:
+        print(f"📼 Replayed {replayed} events from the write-ahead log in {time.perf_counter() - started:.2f}s")
+
+# ----------------- RETENTION -----------------
+retention_task = None
 
-logs: List[dict] = []
+async def retention_worker():
+    """Periodically age events through the storage tiers."""
+    while True:
+        await asyncio.sleep(RETENTION_INTERVAL)
+        try:
+            purged = await asyncio.to_thread(store.maintain, time.time())
+            if wal is not None:
+                # Everything below the hot tier is safely in segment files
+                wal.truncate_before(store.hot.first_id)
+            for segment in purged:
+                await forget_logs(range(segment.first_id, segment.last_id + 1))
+            if purged:
+                with store.lock:
+                    search_index.trim(store.first_id)
+            if purged:
+                print(f"🧊 Purged {sum(segment.count for segment in purged)} events from the cold archive")
+        except Exception as e:
+            print(f"Retention maintenance failed: {e}")
+
+# ----------------- ROLLUPS -----------------
+# Counts per event type and minute/hour/day for /api/stats/timeseries. They
+# outlive retention purges, so they are snapshotted to ROLLUP_PATH and only
+# the events newer than the snapshot are recounted on startup.
+rollup_task = None
+rollups_saved = 0  # event_rollups.version at the last snapshot
+
+def restore_rollups():
+    global event_rollups, rollups_saved
+    if ROLLUP_PATH:
+        loaded = rollups.load(ROLLUP_PATH, ROLLUP_MINUTE_HOURS)
+        if loaded is not None:
+            event_rollups = loaded
+    started = time.perf_counter()
+    recounted = 0
+    while True:
+        chunk = store.since(event_rollups.upto, 10000)
+        if not chunk:
+            break
+        event_rollups.add(chunk, time.time())
+        recounted += len(chunk)
+    rollups_saved = event_rollups.version
+    if recounted:
+        print(f"📈 Counted {recounted} events into the rollups in {time.perf_counter() - started:.2f}s")
+
+async def save_rollups():
+    global rollups_saved
+    if not ROLLUP_PATH or event_rollups.version == rollups_saved:
+        return
+    version = event_rollups.version
+    await asyncio.to_thread(rollups.save, event_rollups.to_json(), ROLLUP_PATH)
+    rollups_saved = version
+
+async def rollup_worker():
+    """Fold closed hours and days even when nothing is ingested, and snapshot."""
+    while True:
+        await asyncio.sleep(ROLLUP_SNAPSHOT_INTERVAL)
+        try:
+            event_rollups.compact(time.time())
+            await save_rollups()
+        except Exception as e:
+            print(f"Rollup snapshot failed: {e}")
+
+# ----------------- FULL-TEXT SEARCH -----------------
+# The index is rebuilt from the store in a background thread on startup;
+# once it has caught up, append_records adds new events as they arrive.
+search_index = SearchIndex()
+search_ready = False
+search_task = None
+
+def build_search_index():
+    global search_ready
+    started = time.perf_counter()
+    while True:
+        with store.lock:
+            chunk = store.since(search_index.upto, 5000)
+            if not chunk:
+                search_ready = True
+                break
+            search_index.add(chunk)
+    if len(search_index):
+        print(f"🔎 Search index ready: {len(search_index)} events in {time.perf_counter() - started:.2f}s")
 
 # ----------------- LLM & Embeddings -----------------
-try:
-    llm = ChatGoogleGenerativeAI(
+# The Gemini/LangChain stack takes seconds to import, so it is loaded in a
+# background thread once the server is up. Until then llm and embeddings are
+# None and every endpoint uses its non-AI path; /api/health reports progress.
+llm = None
+embeddings = None
+ai_status = "loading" if AI_ENABLED else "disabled"  # loading | ready | unavailable | disabled
+ai_load_seconds: Optional[float] = None
+ai_task = None
+
+def load_ai_models():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+    # Imported here so the first AI request does not pay for it
+    importlib.import_module("langchain.chains.question_answering")
+
+    chat = ChatGoogleGenerativeAI(
         model="gemini-2.0-flash",
         temperature=0,
         max_tokens=512,
         google_api_key=GEMINI_API_KEY
     )
-
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/embedding-001",
-        google_api_key=GEMINI_API_KEY
+    embedder = CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(
+            model="models/embedding-001",
+            google_api_key=GEMINI_API_KEY
+        ),
+        max_entries=EMBED_CACHE_SIZE,
+        path=EMBED_CACHE_PATH,
+        namespace="models/embedding-001",
     )
-    print("✅ AI models initialized successfully")
-except Exception as e:
-    print(f"❌ Error initializing AI models: {e}")
-    print("Using demo mode - AI features will return placeholder responses")
-    llm = None
-    embeddings = None
+    return chat, embedder
+
+async def warm_up_ai():
+    """Load the models, restore the vector index and start the indexer."""
+    global llm, embeddings, ai_status, ai_load_seconds, embedding_task, snapshot_task
+    started = time.perf_counter()
+    try:
+        chat, embedder = await asyncio.to_thread(load_ai_models)
+    except Exception as e:
+        print(f"❌ Error initializing AI models: {e}")
+        print("Using demo mode - AI features will return placeholder responses")
+        ai_status = "unavailable"
+        return
+    embeddings = embedder
+    if VECTOR_INDEX_DIR:
+        await asyncio.to_thread(load_vector_snapshot)
+        snapshot_task = asyncio.create_task(snapshot_worker())
+    if store.last_id > indexed_upto:
+        embed_backfill.set()  # embed whatever the snapshot does not cover
+    embedding_task = asyncio.create_task(embedding_worker())
+    llm = chat
+    ai_status = "ready"
+    ai_load_seconds = time.perf_counter() - started
+    print(f"✅ AI models initialized in {ai_load_seconds:.2f}s")
 
 vector_store = None
-text_splitter = RecursiveCharacterTextSplitter(
-    separators="\n",
-    chunk_size=1000,
-    chunk_overlap=150,
-    length_function=len
-)
 
-# ----------------- API ENDPOINTS -----------------
-@app.post("/api/logs")
-def add_log(entry: LogEntry):
+def log_text(log: dict) -> str:
+    return f"{log['event']}: {log['detail']}"
+
+async def index_logs(new_logs: List[dict]):
+    """Embed only the given logs and append them to the FAISS index.
+
+    Each log is stored as its own document whose docstore id is the log id,
+    so ingest cost depends on the size of the batch, not of the history.
+    """
     global vector_store
-    logs.append(entry.dict())
-    
-    if embeddings is not None:
+    if embeddings is None or not new_logs:
+        return
+    from langchain_community.vectorstores import FAISS
+
+    texts = [log_text(log) for log in new_logs]
+    metadatas = [{"log_id": log["id"], "event": log["event"]} for log in new_logs]
+    ids = [str(log["id"]) for log in new_logs]
+    vectors = await embeddings.aembed_documents(texts)
+    text_embeddings = list(zip(texts, vectors))
+
+    async with index_lock:
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+        else:
+            vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        mark_index_changed()
+
+async def forget_logs(log_ids: range):
+    """Remove vectors for events that are no longer in the store."""
+    if vector_store is None:
+        return
+    async with index_lock:
+        indexed = set(vector_store.index_to_docstore_id.values())
+        stale = [str(log_id) for log_id in log_ids if str(log_id) in indexed]
+        if stale:
+            vector_store.delete(stale)
+            mark_index_changed()
+
+# ----------------- VECTOR INDEX SNAPSHOTS -----------------
+# The index is written to VECTOR_INDEX_DIR every VECTOR_SNAPSHOT_INTERVAL
+# seconds (when it changed) and on shutdown, and loaded at startup, so a
+# restart only embeds events the snapshot does not cover.
+index_lock = asyncio.Lock()  # held while vector_store is modified or saved
+index_changes = 0            # bumped on every modification
+snapshot_changes = 0         # index_changes at the last snapshot
+snapshot_task = None
+repair_ids: List[int] = []   # ids below the watermark missing from a loaded snapshot
+
+def mark_index_changed():
+    global index_changes
+    index_changes += 1
+
+def load_vector_snapshot():
+    """Load the snapshot and reconcile it with the log store."""
+    global vector_store, indexed_upto
+    loaded = vector_index.load(VECTOR_INDEX_DIR, embeddings)
+    if loaded is None:
+        return
+    snapshot, meta = loaded
+    model = getattr(embeddings, "namespace", None)
+    if meta.get("model") != model or meta.get("indexed_upto", 0) > store.last_id:
+        print("🗂️ Vector index snapshot does not match the current model or log store, rebuilding")
+        return
+    indexed = {int(doc_id) for doc_id in snapshot.index_to_docstore_id.values()}
+    stale = [str(log_id) for log_id in indexed if log_id < store.first_id]
+    if stale:
+        snapshot.delete(stale)
+    watermark = max([meta["indexed_upto"], *indexed])
+    repair_ids[:] = [log_id for log_id in range(store.first_id, watermark + 1) if log_id not in indexed]
+    vector_store = snapshot
+    indexed_upto = watermark
+    print(f"🗂️ Loaded vector index snapshot with {snapshot.index.ntotal} vectors up to log {watermark}; "
+          f"{len(repair_ids)} missing below it, {store.last_id - watermark} newer")
+
+async def snapshot_vector_index():
+    global snapshot_changes
+    if not VECTOR_INDEX_DIR or vector_store is None or index_changes == snapshot_changes:
+        return
+    async with index_lock:
+        changes = index_changes
+        meta = {
+            "indexed_upto": indexed_upto,
+            "model": getattr(embeddings, "namespace", None),
+            "vectors": vector_store.index.ntotal,
+            "saved_at": time.time(),
+        }
+        await asyncio.to_thread(vector_index.save, vector_store, VECTOR_INDEX_DIR, meta)
+        snapshot_changes = changes
+
+async def snapshot_worker():
+    while True:
+        await asyncio.sleep(VECTOR_SNAPSHOT_INTERVAL)
         try:
-            all_texts = [f"{log['event']}: {log['detail']}" for log in logs]
-            chunks = text_splitter.split_text("\n".join(all_texts))
-            vector_store = FAISS.from_texts(chunks, embeddings)
+            await snapshot_vector_index()
         except Exception as e:
-            print(f"Error updating vector store: {e}")
-    
-    return {"message": "Log added", "total_logs": len(logs)}
+            print(f"Vector index snapshot failed: {e}")
+
+async def repair_index():
+    """Embed events a loaded snapshot was missing below its watermark."""
+    while repair_ids:
+        batch_ids = repair_ids[:EMBED_BATCH_SIZE]
+        logs = [log for log in map(store.get, batch_ids) if log is not None]
+        try:
+            await index_logs(logs)
+            del repair_ids[:len(batch_ids)]
+        except Exception as e:
+            print(f"Error repairing vector store: {e}")
+            await asyncio.sleep(EMBED_RETRY_DELAY)
+
+# ----------------- BACKGROUND INDEXING -----------------
+# Ingest only appends and enqueues; a single worker task drains the queue
+# in micro-batches (EMBED_BATCH_SIZE entries or EMBED_BATCH_WAIT seconds,
+# whichever comes first). If the queue overflows or embedding fails, the
+# worker re-reads everything past the watermark from the log store instead,
+# one batch at a time.
+embed_queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=EMBED_QUEUE_SIZE)
+embed_backfill = asyncio.Event()
+embedding_task = None
+indexed_upto = 0  # every log with id <= indexed_upto is in vector_store
+
+def enqueue_for_indexing(new_logs: List[dict]):
+    if embeddings is None:
+        return
+    for log in new_logs:
+        try:
+            embed_queue.put_nowait(log)
+        except asyncio.QueueFull:
+            embed_backfill.set()
+            return
+
+async def next_embed_batch() -> List[dict]:
+    loop = asyncio.get_running_loop()
+    batch = [await embed_queue.get()]
+    deadline = loop.time() + EMBED_BATCH_WAIT
+    while len(batch) < EMBED_BATCH_SIZE:
+        try:
+            batch.append(embed_queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(embed_queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+def drain_embed_queue():
+    while True:
+        try:
+            embed_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+
+async def embedding_worker():
+    global indexed_upto
+    await repair_index()
+    while True:
+        if embed_backfill.is_set():
+            embed_backfill.clear()
+            drain_embed_queue()
+            # One batch of history at a time, so a large backlog is never held in memory at once
+            pending = store.since(indexed_upto, EMBED_BATCH_SIZE)
+            if len(pending) == EMBED_BATCH_SIZE:
+                embed_backfill.set()
+        else:
+            pending = await next_embed_batch()
+
+        pending = [log for log in pending if log["id"] > indexed_upto]
+        for start in range(0, len(pending), EMBED_BATCH_SIZE):
+            batch = pending[start:start + EMBED_BATCH_SIZE]
+            try:
+                await index_logs(batch)
+                indexed_upto = batch[-1]["id"]
+            except Exception as e:
+                print(f"Error updating vector store: {e}")
+                embed_backfill.set()
+                await asyncio.sleep(EMBED_RETRY_DELAY)
+                break
+
+def index_status() -> dict:
+    latest = store.last_id
+    return {
+        "indexed_upto": indexed_upto,
+        "latest_log_id": latest,
+        "pending": latest - indexed_upto if embeddings is not None else 0,
+    }
+
+def unindexed_documents(limit: int = EMBED_BATCH_SIZE) -> List[Document]:
+    """Logs newer than the index watermark, so answers are not stale while the worker catches up."""
+    pending = [log for log in store.tail(limit) if log["id"] > indexed_upto]
+    return [Document(page_content=log_text(log), metadata={"log_id": log["id"], "event": log["event"]}) for log in pending]
+
+async def similar_documents(query: str, k: int = 5) -> List[Document]:
+    # Embed asynchronously, then search on the event loop so FAISS is never
+    # read from one thread while the indexer appends to it from another.
+    vector = await embeddings.aembed_query(query)
+    return vector_store.similarity_search_by_vector(vector, k=k) + unindexed_documents()
+
+# At most AI_MAX_CONCURRENCY Gemini calls are in flight; other requests wait
+# on the semaphore without holding a worker thread.
+ai_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+summary_cache = SummaryCache(stale_seconds=SUMMARY_STALE_SECONDS, refresh_seconds=SUMMARY_REFRESH_SECONDS)
+
+@app.on_event("startup")
+async def startup():
+    global ai_task, retention_task, rollup_task, search_task, wal
+    if isinstance(store, SQLiteLogStore):
+        # SQLite is durable on its own; only the recent dedup windows need restoring
+        restore_dedup(store.tail(DEDUP_MAX_DEVICES))
+    elif WAL_DIR:
+        wal = WriteAheadLog(
+            WAL_DIR,
+            segment_bytes=WAL_SEGMENT_MB * 1024 * 1024,
+            fsync=WAL_FSYNC,
+            fsync_interval=WAL_FSYNC_INTERVAL,
+        )
+        replay_wal()
+    restore_rollups()
+    rollup_task = asyncio.create_task(rollup_worker())
+    search_task = asyncio.create_task(asyncio.to_thread(build_search_index))
+    if isinstance(store, TieredLogStore):
+        retention_task = asyncio.create_task(retention_worker())
+    if AI_ENABLED:
+        ai_task = asyncio.create_task(warm_up_ai())
+
+@app.on_event("shutdown")
+async def shutdown():
+    for task in (ai_task, embedding_task, retention_task, snapshot_task, rollup_task, search_task):
+        if task is not None:
+            task.cancel()
+    try:
+        await snapshot_vector_index()
+    except Exception as e:
+        print(f"Vector index snapshot failed: {e}")
+    try:
+        await save_rollups()
+    except Exception as e:
+        print(f"Rollup snapshot failed: {e}")
+    if wal is not None:
+        wal.close()
+    store.close()
+
+# ----------------- CONDITIONAL REQUESTS -----------------
+# Read endpoints tag responses with the store's write counter. A client that
+# sends the tag back in If-None-Match gets an empty 304 until something is
+# written. BOOT_ID keeps tags from one process from matching another's.
+BOOT_ID = format(time.time_ns(), "x")
+
+def etag_for(*parts) -> str:
+    return 'W/"' + "-".join(str(part) for part in (BOOT_ID, *parts)) + '"'
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set the ETag header; return a 304 response if the client already has this version."""
+    response.headers["ETag"] = etag
+    header = request.headers.get("if-none-match")
+    if header is not None and (header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+def json_response(request: Request, payload, etag: Optional[str] = None) -> Response:
+    """A JSON body for the log endpoints: orjson-serialized, compressed when large."""
+    body, coding = http_encoding.encode_body(
+        http_encoding.dumps(payload), request.headers.get("accept-encoding"), COMPRESS_MIN_BYTES
+    )
+    headers = {"Vary": "Accept-Encoding"}
+    if etag is not None:
+        headers["ETag"] = etag
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(body, media_type="application/json", headers=headers)
+
+# ----------------- API ENDPOINTS -----------------
+def client_address(request: Request) -> str:
+    """The client's address, taken from X-Forwarded-For only when sent by a trusted proxy."""
+    host = request.client.host if request.client else "unknown"
+    if host not in RATE_LIMIT_TRUSTED_PROXIES:
+        return host
+    forwarded = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",")]
+    # The rightmost address not added by one of our own proxies
+    for address in reversed(forwarded):
+        if address and address not in RATE_LIMIT_TRUSTED_PROXIES:
+            return address
+    return host
+
+def admit(request: Request, records: List[dict]):
+    """Charge each device for its records, or raise 429 if any is over its limit.
+
+    Records without a device id share their client address's larger budget,
+    since many devices can sit behind one address (NAT, a proxy).
+    """
+    costs = Counter(record["device_id"] for record in records if record.get("device_id"))
+    anonymous = len(records) - sum(costs.values())
+    client_costs = {client_address(request): anonymous} if anonymous else None
+    retry_after = rate_limiter.admit(costs, client_costs)
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+def store_records(records: List[dict]) -> List[dict]:
+    """append_records, answering 422 if the records cannot be stored, or 503 if the WAL cannot log them."""
+    try:
+        return append_records(records)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Logs could not be stored: {e}")
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Logs could not be written to the write-ahead log: {e}")
+
+@app.post("/api/logs", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": LogEntry.model_json_schema()},
+            binary_logs.CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+})
+async def add_log(request: Request):
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type == binary_logs.CONTENT_TYPE:
+        # Compact device format: decoded straight into store records, no pydantic
+        try:
+            records = binary_logs.decode_records(body, max_records=MAX_BATCH_SIZE)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid binary log body: {e}")
+        admit(request, records)
+        new_logs = store_records(records)
+        await commit_logs()
+        return {
+            "message": f"{len(new_logs)} logs added",
+            "ids": [log["id"] for log in new_logs],
+            "duplicates": len(records) - len(new_logs),
+            "total_logs": len(store),
+        }
+
+    try:
+        entry = LogEntry.model_validate_json(body)
+    except ValidationError as e:
+        # Located under "body", as FastAPI reports errors in a parsed body
+        raise RequestValidationError([
+            {**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)
+        ])
+    records = [entry.model_dump()]
+    admit(request, records)
+    new_logs = store_records(records)
+    await commit_logs()
+    if not new_logs:
+        # Acknowledge retried events so the device stops resending them
+        return {"message": "Duplicate ignored", "duplicate": True, "total_logs": len(store)}
+    return {"message": "Log added", "id": new_logs[0]["id"], "total_logs": len(store)}
+
+@app.post("/api/logs/batch")
+async def add_logs_batch(entries: List[LogEntry], request: Request):
+    if len(entries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(entries)} entries (max {MAX_BATCH_SIZE})")
+    if not entries:
+        return {"message": "No logs added", "ids": [], "total_logs": len(store)}
+
+    records = [entry.model_dump() for entry in entries]
+    admit(request, records)
+    new_logs = store_records(records)
+    await commit_logs()
+    return {
+        "message": f"{len(new_logs)} logs added",
+        "ids": [log["id"] for log in new_logs],
+        "duplicates": len(entries) - len(new_logs),
+        "total_logs": len(store),
+    }
+
+@app.post("/api/logs/ndjson")
+async def add_logs_ndjson(request: Request):
+    """Ingest a newline-delimited JSON stream of LogEntry objects.
+
+    The body is consumed chunk by chunk and valid lines are appended every
+    NDJSON_CHUNK_SIZE entries, so uploads of any length use constant memory.
+    Invalid lines are skipped and counted rather than failing the stream.
+    """
+    accepted = 0
+    duplicates = 0
+    rejected = 0
+    line_no = 0
+    errors = []
+    pending: List[LogEntry] = []
+    buffer = bytearray()
+    skipping = False  # inside an oversized line, discard until the next newline
+
+    def reject(message: str):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < NDJSON_MAX_ERRORS:
+            errors.append({"line": line_no, "error": message})
+
+    def flush():
+        nonlocal accepted, duplicates, rejected, pending
+        try:
+            added = len(append_logs(pending))
+        except ValueError as e:
+            rejected += len(pending) - 1
+            reject(f"{len(pending)} lines could not be stored: {e}")
+            pending = []
+            return
+        except OSError as e:
+            # Earlier chunks are stored; the client learns how far it got and resends the rest
+            raise HTTPException(
+                status_code=503,
+                detail=f"Write-ahead log failed after {accepted} lines were stored: {e}",
+            )
+        accepted += added
+        duplicates += len(pending) - added
+        pending = []
+
+    def parse_line(line: bytes):
+        nonlocal line_no
+        line_no += 1
+        line = line.strip()
+        if not line:
+            return
+        try:
+            pending.append(LogEntry.model_validate_json(line))
+        except ValidationError as e:
+            reject(e.errors()[0]["msg"])
+            return
+        if len(pending) >= NDJSON_CHUNK_SIZE:
+            flush()
+
+    async for chunk in request.stream():
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            if newline < 0:
+                break
+            if skipping or len(buffer) + newline - start > NDJSON_MAX_LINE_BYTES:
+                skipping = False
+                line_no += 1
+                reject(f"Line exceeds {NDJSON_MAX_LINE_BYTES} bytes")
+            else:
+                buffer += chunk[start:newline]
+                parse_line(bytes(buffer))
+            buffer.clear()
+            start = newline + 1
+        if not skipping:
+            buffer += chunk[start:]
+            if len(buffer) > NDJSON_MAX_LINE_BYTES:
+                buffer.clear()
+                skipping = True
+
+    if skipping:
+        line_no += 1
+        reject(f"Line exceeds {NDJSON_MAX_LINE_BYTES} bytes")
+    elif buffer:
+        parse_line(bytes(buffer))
+    if pending:
+        flush()
+    await commit_logs()
+
+    return {
+        "message": f"{accepted} logs added",
+        "lines": line_no,
+        "accepted": accepted,
+        "duplicates": duplicates,
+        "rejected": rejected,
+        "errors": errors,
+        "total_logs": len(store),
+    }
 
 @app.get("/api/logs")
-def get_logs():
-    return {"logs": logs}
+def get_logs(
+    request: Request,
+    response: Response,
+    event: Optional[str] = None,
+    device_id: Optional[str] = None,
+    limit: int = Query(LOGS_PAGE_SIZE, ge=1, le=LOGS_PAGE_MAX),
+    before: Optional[int] = Query(None, description="Return events with a smaller id (older page)"),
+    after: Optional[int] = Query(None, description="Return events with a greater id (newer page)"),
+    since: Optional[int] = Query(None, description="Same as after"),
+    start: Optional[float] = Query(None, description="Only events with timestamp >= start (unix seconds)"),
+    end: Optional[float] = Query(None, description="Only events with timestamp < end (unix seconds)"),
+):
+    """One page of events, oldest first.
+
+    Without `after` this is the newest `limit` matches (below `before` if
+    given); with `after` it is the oldest matches newer than that id, which
+    is how a poller fetches just what it has not seen yet. `before` and
+    `after` in the response are the cursors for the neighbouring pages.
+    """
+    etag = etag_for(store.version)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    if after is None:
+        after = since
+    logs, has_more = store.page(limit, before=before, after=after, event=event, device_id=device_id, start=start, end=end)
+    return json_response(request, {
+        "logs": logs,
+        "has_more": has_more,
+        "before": logs[0]["id"] if logs else before,
+        "after": logs[-1]["id"] if logs else after,
+    }, etag)
+
+def export_pages(event, device_id, start, end, after, stop: int, chunk_size: int) -> Iterator[List[dict]]:
+    """Matching events with after < id < stop, oldest first, one page at a time."""
+    cursor = 0 if after is None else after
+    while True:
+        logs, has_more = store.page(
+            chunk_size, before=stop, after=cursor, event=event, device_id=device_id, start=start, end=end
+        )
+        if logs:
+            yield logs
+            cursor = logs[-1]["id"]
+        if not has_more:
+            return
+
+@app.get("/api/logs/export")
+def export_logs(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(csv|ndjson|columnar)$"),
+    event: Optional[str] = None,
+    device_id: Optional[str] = None,
+    start: Optional[float] = Query(None, description="Only events with timestamp >= start (unix seconds)"),
+    end: Optional[float] = Query(None, description="Only events with timestamp < end (unix seconds)"),
+    after: Optional[int] = Query(None, description="Only events with a greater id"),
+    before: Optional[int] = Query(None, description="Only events with a smaller id"),
+):
+    """Stream the whole history, or a filtered slice, as CSV, NDJSON or columnar binary.
+
+    Events are read from the store EXPORT_CHUNK_SIZE at a time and encoded
+    as they go, so memory stays flat whatever the size of the export. Events
+    stored after the request started are not included; X-Export-Last-Id says
+    where a follow-up export (`after=`) should continue.
+    """
+    upto = store.last_id
+    stop = upto + 1 if before is None else min(before, upto + 1)
+    pages = export_pages(event, device_id, start, end, after, stop, EXPORT_CHUNK_SIZE)
+    body = log_export.ENCODERS[format](pages)
+    headers = {
+        "Content-Disposition": f'attachment; filename="vaultify-logs-{upto}.{log_export.EXTENSIONS[format]}"',
+        "X-Export-Last-Id": str(upto),
+        "Vary": "Accept-Encoding",
+    }
+    coding = http_encoding.negotiate(request.headers.get("accept-encoding")) if COMPRESS_MIN_BYTES > 0 else None
+    if coding is not None:
+        body = http_encoding.compress_stream(body, coding)
+        headers["Content-Encoding"] = coding
+    # A plain iterator: Starlette runs each step in a worker thread, off the event loop
+    return StreamingResponse(body, media_type=log_export.CONTENT_TYPES[format], headers=headers)
+
+@app.get("/api/logs/stream")
+async def stream_logs(
+    request: Request,
+    event: Optional[str] = None,
+    device_id: Optional[str] = None,
+    last_event_id: Optional[int] = Query(None, description="Resume after this id; the Last-Event-ID header takes precedence"),
+):
+    """Server-Sent Events: every new event as it is stored, oldest first.
+
+    Reconnecting clients resume where they left off via Last-Event-ID.
+    A comment frame is sent after LIVE_HEARTBEAT idle seconds so proxies
+    keep the connection open.
+    """
+    header = request.headers.get("last-event-id", "")
+    resume = int(header) if header.isdigit() else last_event_id
+    matches = None
+    if event is not None or device_id is not None:
+        matches = lambda log: log_matches(log, event=event, device_id=device_id)
+    subscriber = live_hub.subscribe(resume, matches)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many live subscribers")
+
+    async def frames():
+        try:
+            yield b"retry: 3000\n\n"
+            async for item in subscriber.events(LIVE_HEARTBEAT):
+                yield b": keep-alive\n\n" if item is None else item.sse
+        finally:
+            live_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/api/logs/ws")
+async def logs_websocket(websocket: WebSocket, last_event_id: Optional[int] = None):
+    """Control-room channel: one connection, several server-side filtered views.
+
+    Client messages:
+        {"type": "subscribe", "id": "door-wall", "events": [...], "devices": [...], "min_severity": "warning"}
+        {"type": "unsubscribe", "id": "door-wall"}
+    Every filter field is optional. The server sends each matching event once
+    per connection as {"type": "log", "views": [ids of matching views], "log": {...}},
+    and {"type": "ping"} after LIVE_HEARTBEAT idle seconds.
+
+    The connection joins the live hub with its first view, so resuming from
+    `last_event_id` replays the missed events that view matches rather than
+    skipping past them while there was nothing to match.
+    """
+    await websocket.accept()
+    views: dict = {}
+    subscriber = None
+    subscribed = asyncio.Event()
+    send_lock = asyncio.Lock()
+
+    async def send(text: str):
+        async with send_lock:
+            await websocket.send_text(text)
+
+    def refresh_event_types():
+        if any(view.events is None for view in views.values()):
+            live_hub.set_event_types(subscriber, None)
+        else:
+            live_hub.set_event_types(subscriber, set().union(*(view.events for view in views.values())))
+
+    async def receive():
+        nonlocal subscriber
+        while True:
+            text = await websocket.receive_text()
+            view_id = None
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise ValueError("message must be a JSON object")
+                view_id = str(message.get("id", "default"))
+                if message.get("type") == "subscribe":
+                    view = LogFilter(message.get("events"), message.get("devices"), message.get("min_severity"))
+                    if subscriber is None:
+                        subscriber = live_hub.subscribe(last_event_id, lambda log: any(view.matches(log) for view in views.values()))
+                        if subscriber is None:
+                            await websocket.close(code=1013, reason="Too many live subscribers")
+                            return
+                        subscribed.set()
+                    views[view_id] = view
+                    reply = "subscribed"
+                elif message.get("type") == "unsubscribe":
+                    views.pop(view_id, None)
+                    reply = "unsubscribed"
+                else:
+                    raise ValueError(f"unknown message type {message.get('type')!r}")
+            except ValueError as e:
+                await send(json.dumps({"type": "error", "id": view_id, "message": str(e)}))
+                continue
+            if subscriber is None:
+                # Unsubscribed before ever subscribing
+                await send(json.dumps({"type": reply, "id": view_id, "last_id": last_event_id}))
+                continue
+            refresh_event_types()
+            await send(json.dumps({"type": reply, "id": view_id, "last_id": subscriber.last_id}))
+
+    async def deliver():
+        await subscribed.wait()
+        async for item in subscriber.events(LIVE_HEARTBEAT):
+            if item is None:
+                await send('{"type":"ping"}')
+                continue
+            matched = [view_id for view_id, view in views.items() if view.matches(item.log)]
+            if matched:
+                await send(item.frame(matched))
+
+    tasks = [asyncio.create_task(receive()), asyncio.create_task(deliver())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"Live WebSocket closed with error: {error!r}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        if subscriber is not None:
+            live_hub.unsubscribe(subscriber)
+
+def recent_logs_text() -> str:
+    """The newest AI_CONTEXT_EVENTS logs as prompt lines, so a prompt stays bounded as history grows."""
+    logs_text = "\n".join([f"- {log['event']}: {log['detail']}" for log in store.tail(AI_CONTEXT_EVENTS)])
+    if len(store) > AI_CONTEXT_EVENTS:
+        logs_text = f"(the latest {AI_CONTEXT_EVENTS} of {len(store)} events)\n{logs_text}"
+    return logs_text
+
+async def generate_summary() -> str:
+    """One LLM summary of the logs; only called by summary_cache."""
+    async with ai_semaphore:
+        if vector_store is None:
+            logs_text = recent_logs_text()
+            prompt = f"Please provide a concise summary of these security events:\n{logs_text}\n\nSummary:"
+            return (await llm.ainvoke(prompt)).content
+        from langchain.chains.question_answering import load_qa_chain
+        chain = load_qa_chain(llm, chain_type="stuff")
+        input_docs = await similar_documents("Summarize all security events")
+        result = await chain.ainvoke({"input_documents": input_docs, "question": "Summarize all security events"})
+        return result["output_text"]
 
 @app.get("/api/summary")
-def summarize_logs():
-    if not logs:
+async def summarize_logs(request: Request, response: Response, since: Optional[int] = None):
+    """Summary of all events, or with `since` just the counts of newer events.
+
+    AI summaries come from summary_cache, so polling dashboards cost no LLM
+    calls until the logs change (and then at most one per
+    SUMMARY_STALE_SECONDS). `stale` says the summary predates the newest logs.
+    """
+    if since is not None or llm is None or not len(store):
+        cached = not_modified(request, response, etag_for(store.version, ai_status, indexed_upto))
+        if cached is not None:
+            return cached
+    if since is not None:
+        return {"since": since, "latest_id": store.last_id, "new_events": store.event_counts(after=since)}
+    if not len(store):
         return {"summary": "No logs available yet."}
     
     if llm is None:
-        event_counts = {}
-        for log in logs:
-            event_counts[log['event']] = event_counts.get(log['event'], 0) + 1
+        # Counters kept by the store at ingest; no pass over the logs
+        event_counts = store.event_counts()
         summary = "Security Events Summary:\n"
         for event, count in event_counts.items():
             summary += f"- {event}: {count} occurrence(s)\n"
+        device_counts = store.device_counts()
+        if device_counts:
+            summary += "By device:\n"
+            for device, count in device_counts.items():
+                summary += f"- {device}: {count} event(s)\n"
         return {"summary": summary}
     
     try:
-        if vector_store is None:
-            logs_text = "\n".join([f"- {log['event']}: {log['detail']}" for log in logs])
-            prompt = f"Please provide a concise summary of these security events:\n{logs_text}\n\nSummary:"
-            summary = llm.invoke(prompt).content
-            return {"summary": summary}
-        else:
-            chain = load_qa_chain(llm, chain_type="stuff")
-            input_docs = vector_store.similarity_search("Summarize all security events", k=5)
-            summary = chain.run(input_documents=input_docs, question="Summarize all security events")
-            return {"summary": summary}
+        entry = await summary_cache.get(store.version, generate_summary)
     except Exception as e:
-        print(f"Error generating AI summary: {e}")
-        return {"summary": f"Error generating summary: {str(e)}"}
+        return {"summary": f"Error generating summary: {str(e)}", "index": index_status()}
+    cached = not_modified(request, response, etag_for("summary", entry.serial))
+    if cached is not None:
+        return cached
+    return {
+        "summary": entry.text,
+        "index": index_status(),
+        "generated_at": entry.generated_at,
+        "stale": entry.version != store.version,
+    }
 
 @app.get("/api/ask")
-def ask_ai(question: str):
-    if not logs:
+async def ask_ai(question: str):
+    if not len(store):
         return {"answer": "No logs available yet."}
     
     if llm is None:
         question_lower = question.lower()
-        event_counts = {}
-        for log in logs:
-            event_counts[log['event']] = event_counts.get(log['event'], 0) + 1
         
         if "door" in question_lower and "unlock" in question_lower:
-            count = event_counts.get('door_unlocked', 0)
+            count = store.count(event='door_unlocked')
             return {"answer": f"The door has been unlocked {count} times based on the current logs."}
         elif "motion" in question_lower:
-            count = event_counts.get('motion_alert', 0)
+            count = store.count(event='motion_alert')
             return {"answer": f"There have been {count} motion alerts detected."}
         elif "rfid" in question_lower or "invalid" in question_lower:
-            count = event_counts.get('rfid_invalid', 0)
+            count = store.count(event='rfid_invalid')
             return {"answer": f"{count} invalid RFID card scans have been detected."}
         elif "autolock" in question_lower:
-            count = event_counts.get('door_autolock', 0)
+            count = store.count(event='door_autolock')
             return {"answer": f"The door has auto-locked {count} times."}
         elif "summary" in question_lower or "overview" in question_lower:
             summary = "Security Events Summary:\n"
-            for event, count in event_counts.items():
+            for event, count in store.event_counts().items():
                 summary += f"• {event.replace('_', ' ').title()}: {count} occurrence(s)\n"
             return {"answer": summary}
         else:
-            total_events = len(logs)
-            recent_events = logs[-3:] if len(logs) >= 3 else logs
-            recent_summary = "\n".join([f"• {log['event']}: {log['detail']}" for log in recent_events])
-            return {"answer": f"You asked '{question}'. \n\nTotal events logged: {total_events}\nRecent events:\n{recent_summary}\n\nThis is a basic analysis. For more detailed insights, the AI can provide deeper analysis."}
+            total_events = len(store)
+            matches = search_logs_for(question, 3)
+            if matches:
+                heading = "Most relevant events"
+            else:
+                heading, matches = "Recent events", store.tail(3)
+            recent_summary = "\n".join([f"• {log['event']}: {log['detail']}" for log in matches])
+            return {"answer": f"You asked '{question}'. \n\nTotal events logged: {total_events}\n{heading}:\n{recent_summary}\n\nThis is a basic analysis. For more detailed insights, the AI can provide deeper analysis."}
     
     try:
-        if vector_store is None:
-            logs_text = "\n".join([f"- {log['event']}: {log['detail']}" for log in logs])
-            prompt = f"Based on these security logs:\n{logs_text}\n\nQuestion: {question}\n\nPlease provide a helpful analysis:"
-            answer = llm.invoke(prompt).content
-            return {"answer": answer}
-        else:
-            chain = load_qa_chain(llm, chain_type="stuff")
-            input_docs = vector_store.similarity_search(question, k=5)
-            answer = chain.run(input_documents=input_docs, question=question)
-            return {"answer": answer}
+        async with ai_semaphore:
+            if vector_store is None:
+                logs_text = recent_logs_text()
+                prompt = f"Based on these security logs:\n{logs_text}\n\nQuestion: {question}\n\nPlease provide a helpful analysis:"
+                answer = (await llm.ainvoke(prompt)).content
+                return {"answer": answer, "index": index_status()}
+            else:
+                from langchain.chains.question_answering import load_qa_chain
+                chain = load_qa_chain(llm, chain_type="stuff")
+                input_docs = await similar_documents(question)
+                result = await chain.ainvoke({"input_documents": input_docs, "question": question})
+                answer = result["output_text"]
+                return {"answer": answer, "index": index_status()}
     except Exception as e:
         print(f"Error generating AI answer: {e}")
-        return {"answer": f"Error generating answer: {str(e)}"}
+        return {"answer": f"Error generating answer: {str(e)}", "index": index_status()}
+
+# ----------------- STATS -----------------
+BUCKET_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+def parse_bucket(value: str) -> int:
+    """Bucket width in seconds from e.g. "5m", "1h", "1d" or plain seconds."""
+    try:
+        if value[-1:] in BUCKET_UNITS:
+            seconds = int(value[:-1]) * BUCKET_UNITS[value[-1]]
+        else:
+            seconds = int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid bucket {value!r}; use e.g. 5m, 1h or 1d")
+    if seconds <= 0 or seconds % 60:
+        raise HTTPException(status_code=400, detail="bucket must be a positive whole number of minutes")
+    return seconds
+
+@app.get("/api/stats/timeseries")
+async def stats_timeseries(
+    request: Request,
+    response: Response,
+    bucket: str = Query("1h", description="Bucket width: 5m, 1h, 1d, ... or seconds"),
+    start: Optional[float] = Query(None, allow_inf_nan=False, description="Window start (unix seconds); defaults to 24 buckets before end"),
+    end: Optional[float] = Query(None, allow_inf_nan=False, description="Window end (unix seconds); defaults to now"),
+    event: Optional[List[str]] = Query(None, description="Only these event types (repeatable)"),
+):
+    """Events per type per bucket, from the minute/hour/day rollups.
+
+    Buckets are aligned to the epoch (UTC) and every bucket overlapping
+    [start, end) is returned, empty ones included. Minute-resolution buckets
+    only reach back ROLLUP_MINUTE_HOURS; older windows need a bucket that is
+    a whole number of hours.
+    """
+    width = parse_bucket(bucket)
+    end = time.time() if end is None else end
+    start = end - 24 * width if start is None else start
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    first = int(start // width) * width
+    count = math.ceil((end - first) / width)
+    if count > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{count} buckets requested (max {TIMESERIES_MAX_BUCKETS}); use a wider bucket or a shorter window",
+        )
+    if Rollups.resolution(width) == 60 and event_rollups.minutes_from is not None and first < event_rollups.minutes_from:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Minute buckets are only kept for {ROLLUP_MINUTE_HOURS:g} hours; use a bucket of 1h or more",
+        )
+    etag = etag_for(event_rollups.version, event_rollups.hours_upto, first, count)
+    cached = not_modified(request, response, etag)
+    if cached is not None:
+        return cached
+    return json_response(request, {
+        "bucket": width,
+        "start": first,
+        "end": first + count * width,
+        "buckets": event_rollups.series(first, end, width, event),
+    }, etag)
+
+# ----------------- SEARCH -----------------
+def search_logs_for(text: str, limit: int) -> List[dict]:
+    """Events best matching any word of free text (BM25), for the keyword fallback."""
+    words = tokenize(text)
+    if not words:
+        return []
+    with store.lock:
+        results, _ = search_index.search(("or", [("terms", (word,)) for word in words]), limit)
+        return [log for log in (store.get(log_id) for log_id, _ in results) if log is not None]
+
+@app.get("/api/search")
+def search_logs(
+    request: Request,
+    q: str = Query(..., description='Terms are ANDed; OR, NOT, -term, (groups) and "phrases" are supported'),
+    limit: int = Query(20, ge=1, le=SEARCH_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+):
+    """Full-text search over event types, details and device ids, ranked by BM25."""
+    started = time.perf_counter()
+    with store.lock:
+        try:
+            results, total = search_index.search(q, limit, offset)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid query: {e}")
+        hits = []
+        for log_id, score in results:
+            log = store.get(log_id)
+            if log is not None:
+                hits.append({"score": round(score, 4), "log": log})
+    return json_response(request, {
+        "query": q,
+        "total": total,
+        "results": hits,
+        "complete": search_ready,  # False while the index is still being built after startup
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
 
 # ----------------- HEALTH CHECK -----------------
 @app.get("/api/health")
 def health():
-    return {"status": "Vaultify backend running!"}
+    status = {
+        "status": "Vaultify backend running!",
+        "ready": {"ingest": True, "ai": ai_status == "ready"},
+        "ai": {"status": ai_status, "load_seconds": ai_load_seconds},
+        "store": store.stats(),
+        "index": index_status(),
+        "dedup": deduplicator.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "live": live_hub.stats(),
+        "rollups": event_rollups.stats(),
+        "search": {"ready": search_ready, **search_index.stats()},
+        "summary_cache": summary_cache.stats(),
+    }
+    if wal is not None:
+        status["wal"] = wal.stats()
+    if isinstance(embeddings, CachedEmbeddings):
+        status["embedding_cache"] = embeddings.stats()
+    return status
 
 # ----------------- RUN SERVER -----------------
 if __name__ == "__main__":
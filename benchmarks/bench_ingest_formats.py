@@ -0,0 +1,88 @@
+# benchmarks/bench_ingest_formats.py
+"""Compare JSON and binary ingest throughput for POST /api/logs.
+
+Usage: python benchmarks/bench_ingest_formats.py [events]
+
+Measures the decode path on its own (body -> store records) and the full
+request through the FastAPI app in-process. Embedding is disabled so only
+parsing and appending are timed.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("WAL_DIR", "")  # measure parsing, not disk writes
+os.environ.setdefault("RETENTION_HOT_EVENTS", "0")
+os.environ.setdefault("AI_ENABLED", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import backend
+import binary_logs
+from fastapi.testclient import TestClient
+from ratelimit import RateLimiter
+
+EVENTS = [
+    {"event": "door_unlocked", "detail": "RFID authorized"},
+    {"event": "motion_alert", "detail": "Possible intrusion detected"},
+    {"event": "door_autolock", "detail": "Auto-lock executed"},
+    {"event": "rfid_invalid", "detail": "Unauthorized card scanned"},
+]
+
+
+def report(name: str, count: int, seconds: float, nbytes: int):
+    print(f"{name:<28} {count / seconds:>12,.0f} events/s   {seconds * 1e6 / count:>8.2f} us/event   {nbytes / count:>6.1f} bytes/event")
+
+
+def bench_decode(events):
+    json_bodies = [json.dumps(e).encode() for e in events]
+    start = time.perf_counter()
+    for body in json_bodies:
+        backend.LogEntry.model_validate_json(body).model_dump()
+    report("json decode (1/request)", len(events), time.perf_counter() - start, sum(map(len, json_bodies)))
+
+    binary_bodies = [binary_logs.encode_records([e]) for e in events]
+    start = time.perf_counter()
+    for body in binary_bodies:
+        binary_logs.decode_records(body)
+    report("binary decode (1/request)", len(events), time.perf_counter() - start, sum(map(len, binary_bodies)))
+
+    batches = [events[i:i + 100] for i in range(0, len(events), 100)]
+    json_batches = [json.dumps(b).encode() for b in batches]
+    start = time.perf_counter()
+    for body in json_batches:
+        [backend.LogEntry.model_validate(e).model_dump() for e in json.loads(body)]
+    report("json decode (100/request)", len(events), time.perf_counter() - start, sum(map(len, json_batches)))
+
+    binary_batches = [binary_logs.encode_records(b) for b in batches]
+    start = time.perf_counter()
+    for body in binary_batches:
+        binary_logs.decode_records(body)
+    report("binary decode (100/request)", len(events), time.perf_counter() - start, sum(map(len, binary_batches)))
+
+
+def bench_app(events):
+    backend.embeddings = None
+    backend.rate_limiter = RateLimiter(0, 0, 0, 0)
+    with TestClient(backend.app) as client:
+        for name, content_type, encode in (
+            ("json POST /api/logs", "application/json", lambda e: json.dumps(e).encode()),
+            ("binary POST /api/logs", binary_logs.CONTENT_TYPE, lambda e: binary_logs.encode_records([e])),
+        ):
+            bodies = [encode(e) for e in events]
+            headers = {"Content-Type": content_type}
+            start = time.perf_counter()
+            for body in bodies:
+                client.post("/api/logs", content=body, headers=headers)
+            report(name, len(events), time.perf_counter() - start, sum(map(len, bodies)))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(0)
+    events = [random.choice(EVENTS) for _ in range(count)]
+    print(f"--- decode only ({count} events) ---")
+    bench_decode(events)
+    print(f"--- full request ({min(count, 2000)} events) ---")
+    bench_app(events[:2000])
@@ -0,0 +1,108 @@
+# benchmarks/bench_log_responses.py
+"""Bytes and milliseconds per 10k events served by GET /api/logs.
+
+Usage: python benchmarks/bench_log_responses.py [events]
+
+First times the encoders on their own: FastAPI's default path
+(jsonable_encoder + stdlib json), orjson, and orjson followed by gzip or
+brotli. Then pages through the whole store over the in-process app, once
+with the endpoint patched back to FastAPI's default serialization
+("before") and once per Accept-Encoding with the current code ("after").
+"""
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("WAL_DIR", "")
+os.environ.setdefault("RETENTION_HOT_EVENTS", "0")
+os.environ.setdefault("AI_ENABLED", "0")
+os.environ.setdefault("ROLLUP_PATH", "")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import backend
+import http_encoding
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+EVENTS = [
+    ("door_unlocked", "RFID authorized"),
+    ("motion_alert", "Possible intrusion detected"),
+    ("door_autolock", "Auto-lock executed"),
+    ("rfid_invalid", "Unauthorized card scanned"),
+]
+PAGE = 1000
+
+
+def report(name: str, count: int, seconds: float, nbytes: int):
+    per = 10000 / count
+    print(f"{name:<34} {seconds * 1000 * per:>9.1f} ms/10k   {nbytes * per / 1024:>9.1f} KiB/10k")
+
+
+def bench_encoders(logs):
+    pages = [{"logs": logs[i:i + PAGE], "has_more": True, "before": 1, "after": 2} for i in range(0, len(logs), PAGE)]
+
+    start = time.perf_counter()
+    bodies = [JSONResponse(jsonable_encoder(page)).body for page in pages]
+    report("jsonable_encoder + json", len(logs), time.perf_counter() - start, sum(map(len, bodies)))
+
+    start = time.perf_counter()
+    bodies = [http_encoding.dumps(page) for page in pages]
+    report("orjson", len(logs), time.perf_counter() - start, sum(map(len, bodies)))
+
+    for coding in http_encoding.supported_encodings():
+        start = time.perf_counter()
+        compressed = [http_encoding.compress(http_encoding.dumps(page), coding) for page in pages]
+        report(f"orjson + {coding}", len(logs), time.perf_counter() - start, sum(map(len, compressed)))
+
+
+def page_through(client: TestClient, headers: dict):
+    """Fetch every event newest first; return (seconds, bytes on the wire)."""
+    before, wire = None, 0
+    start = time.perf_counter()
+    while True:
+        params = {"limit": PAGE} if before is None else {"limit": PAGE, "before": before}
+        response = client.get("/api/logs", params=params, headers=headers)
+        wire += response.num_bytes_downloaded
+        page = response.json()
+        if not page["has_more"]:
+            return time.perf_counter() - start, wire
+        before = page["before"]
+
+
+def bench_endpoint(count: int):
+    client = TestClient(backend.app)
+    json_response = backend.json_response
+    backend.json_response = lambda request, payload, etag=None: payload  # FastAPI's default path
+    seconds, wire = page_through(client, {"Accept-Encoding": "identity"})
+    report("before: GET /api/logs", count, seconds, wire)
+    backend.json_response = json_response
+    for coding in ("identity", *http_encoding.supported_encodings()):
+        seconds, wire = page_through(client, {"Accept-Encoding": coding})
+        report(f"after:  GET /api/logs ({coding})", count, seconds, wire)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    random.seed(1)
+    now = time.time()
+    records = []
+    for i in range(count):
+        event, detail = random.choice(EVENTS)
+        records.append({
+            "event": event,
+            "detail": detail,
+            "timestamp": now - (count - i) * 0.5,
+            "device_id": f"esp32-{random.randint(1, 20):02d}",
+            "seq": i,
+        })
+    backend.store.append(records, now)
+    print(f"{count} events, pages of {PAGE}, orjson {'on' if http_encoding.orjson else 'off'}\n")
+    bench_encoders(backend.store.rows())
+    print()
+    bench_endpoint(count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_startup.py
+"""Measure how quickly a fresh backend process can serve requests.
+
+Usage: python benchmarks/bench_startup.py [runs]
+
+Each run starts a new interpreter, so imports are cold, and reports:
+
+    import   -- `import backend`
+    startup  -- FastAPI startup hooks (WAL replay, background tasks)
+    health   -- first GET /api/health answered
+    ingest   -- first POST /api/logs accepted
+    ai       -- the background AI warm-up finished (status ready/unavailable)
+
+All times are seconds since the interpreter started. Runs use an empty
+temporary data directory and a placeholder Gemini key. The models are
+imported and constructed as usual, but the embedding provider is then
+swapped for a local fake so indexing the probe event makes no network call.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, os.environ["BENCH_ROOT"])
+timings = {}
+import backend
+timings["import"] = time.perf_counter() - started
+
+load_ai_models = backend.load_ai_models
+def offline_ai_models():
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+    chat, embedder = load_ai_models()
+    embedder.model = DeterministicFakeEmbedding(size=768)
+    return chat, embedder
+backend.load_ai_models = offline_ai_models
+
+from fastapi.testclient import TestClient
+with TestClient(backend.app) as client:
+    timings["startup"] = time.perf_counter() - started
+    client.get("/api/health")
+    timings["health"] = time.perf_counter() - started
+    client.post("/api/logs", json={"event": "motion_alert", "detail": "startup probe"})
+    timings["ingest"] = time.perf_counter() - started
+    while client.get("/api/health").json()["ai"]["status"] == "loading":
+        time.sleep(0.01)
+    timings["ai"] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+STAGES = ("import", "startup", "health", "ingest", "ai")
+
+
+def run_once() -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, BENCH_ROOT=ROOT, VAULTIFY_DATA_DIR=data_dir, GEMINI_API_KEY="benchmark-placeholder")
+        result = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(runs)]
+    print(f"{'stage':<10} {'median s':>10} {'min s':>10} {'max s':>10}   ({runs} runs)")
+    for stage in STAGES:
+        values = [r[stage] for r in results]
+        print(f"{stage:<10} {statistics.median(values):>10.3f} {min(values):>10.3f} {max(values):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# binary_logs.py
+"""Compact binary encoding of log entries for constrained devices.
+
+A body is one header followed by `count` records (all integers little-endian):
+
+    header : magic b"VL" | version u8 | count u16
+             [device id length u8 | device id bytes]    version 2 only
+    record : event code u8 | timestamp u32 | [seq u32, version 2 only] | detail length u8
+             [event length u8 | event bytes]    only when event code is 0
+             detail bytes (UTF-8)
+
+Version 2 carries a device id once per body and a sequence number per
+record so retried bodies can be deduplicated; version 1 has neither.
+
+Known events are sent as a one-byte code; anything else uses code 0 and
+carries its name inline. A timestamp of 0 means "use the server's clock",
+which suits devices without NTP.
+"""
+import struct
+from typing import Dict, List, Optional
+
+CONTENT_TYPE = "application/x-vaultify-log"
+MAGIC = b"VL"
+VERSION = 1
+VERSION_SEQ = 2
+
+EVENT_CODES = {
+    "door_unlocked": 1,
+    "door_locked": 2,
+    "door_autolock": 3,
+    "motion_alert": 4,
+    "rfid_valid": 5,
+    "rfid_invalid": 6,
+}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+
+_HEADER = struct.Struct("<2sBH")
+_RECORD = struct.Struct("<BIB")
+_RECORD_SEQ = struct.Struct("<BIIB")
+
+
+def encode_records(records: List[dict], device_id: Optional[str] = None) -> bytes:
+    """Encode dicts with `event`, `detail` and optional `timestamp` keys.
+
+    Passing `device_id` produces a version 2 body; every record then needs
+    a `seq` key.
+    """
+    if device_id is None:
+        parts = [_HEADER.pack(MAGIC, VERSION, len(records))]
+    else:
+        device = device_id.encode("utf-8")
+        if len(device) > 255:
+            raise ValueError("device id longer than 255 bytes")
+        parts = [_HEADER.pack(MAGIC, VERSION_SEQ, len(records)), bytes((len(device),)), device]
+
+    for record in records:
+        detail = record["detail"].encode("utf-8")
+        if len(detail) > 255:
+            raise ValueError("detail longer than 255 bytes")
+        code = EVENT_CODES.get(record["event"], 0)
+        timestamp = int(record.get("timestamp") or 0)
+        if device_id is None:
+            parts.append(_RECORD.pack(code, timestamp, len(detail)))
+        else:
+            parts.append(_RECORD_SEQ.pack(code, timestamp, record["seq"], len(detail)))
+        if code == 0:
+            event = record["event"].encode("utf-8")
+            if len(event) > 255:
+                raise ValueError("event name longer than 255 bytes")
+            parts.append(bytes((len(event),)) + event)
+        parts.append(detail)
+    return b"".join(parts)
+
+
+def decode_records(body: bytes, max_records: Optional[int] = None) -> List[dict]:
+    """Decode a binary body into dicts ready for the log store.
+
+    Raises ValueError on a malformed body. Repeated detail strings are
+    decoded once and shared between records.
+    """
+    if len(body) < _HEADER.size:
+        raise ValueError("body shorter than header")
+    magic, version, count = _HEADER.unpack_from(body, 0)
+    if magic != MAGIC:
+        raise ValueError("bad magic")
+    if version not in (VERSION, VERSION_SEQ):
+        raise ValueError(f"unsupported version {version}")
+    if max_records is not None and count > max_records:
+        raise ValueError(f"too many records: {count} (max {max_records})")
+
+    view = memoryview(body)
+    offset = _HEADER.size
+    strings: Dict[bytes, str] = {}
+    records = []
+    device_id = None
+    seq = None
+    try:
+        if version == VERSION_SEQ:
+            device_len = body[offset]
+            raw = bytes(view[offset + 1:offset + 1 + device_len])
+            if len(raw) != device_len:
+                raise ValueError("truncated header")
+            device_id = raw.decode("utf-8")
+            offset += 1 + device_len
+
+        for _ in range(count):
+            if version == VERSION_SEQ:
+                code, timestamp, seq, detail_len = _RECORD_SEQ.unpack_from(body, offset)
+                offset += _RECORD_SEQ.size
+            else:
+                code, timestamp, detail_len = _RECORD.unpack_from(body, offset)
+                offset += _RECORD.size
+            if code == 0:
+                event_len = body[offset]
+                raw = bytes(view[offset + 1:offset + 1 + event_len])
+                if len(raw) != event_len:
+                    raise ValueError("truncated record")
+                offset += 1 + event_len
+                event = strings.get(raw)
+                if event is None:
+                    event = strings[raw] = raw.decode("utf-8")
+            else:
+                event = EVENT_NAMES.get(code)
+                if event is None:
+                    raise ValueError(f"unknown event code {code}")
+            raw = bytes(view[offset:offset + detail_len])
+            if len(raw) != detail_len:
+                raise ValueError("truncated record")
+            offset += detail_len
+            detail = strings.get(raw)
+            if detail is None:
+                detail = strings[raw] = raw.decode("utf-8")
+            records.append({
+                "event": event,
+                "detail": detail,
+                "timestamp": float(timestamp) if timestamp else None,
+                "device_id": device_id,
+                "seq": seq,
+            })
+    except (struct.error, IndexError):
+        raise ValueError("truncated record")
+    except UnicodeDecodeError:
+        raise ValueError("invalid UTF-8 in record")
+    if offset != len(body):
+        raise ValueError("trailing bytes after last record")
+    return records
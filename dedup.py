@@ -0,0 +1,104 @@
+# dedup.py
+from collections import OrderedDict
+from typing import Dict, List
+
+
+class ReplayWindow:
+    """High-water mark plus a bitmap of the `size` sequence numbers below it.
+
+    Bit i of `mask` is set when `high - i` has been seen, so checking and
+    marking a sequence number is O(1) and costs a couple of ints per device.
+    """
+
+    __slots__ = ("high", "mask")
+
+    def __init__(self, seq: int):
+        self.high = seq
+        self.mask = 1
+
+    def copy(self) -> "ReplayWindow":
+        window = ReplayWindow(self.high)
+        window.mask = self.mask
+        return window
+
+    def accept(self, seq: int, size: int) -> bool:
+        if seq > self.high:
+            shift = seq - self.high
+            self.mask = ((self.mask << shift) | 1) & ((1 << size) - 1) if shift < size else 1
+            self.high = seq
+            return True
+
+        offset = self.high - seq
+        if offset >= size:
+            # Retries are only ever seconds old, so a sequence number this far
+            # behind means the device restarted its counter: start over.
+            self.high = seq
+            self.mask = 1
+            return True
+
+        bit = 1 << offset
+        if self.mask & bit:
+            return False
+        self.mask |= bit
+        return True
+
+
+class DeviceDeduplicator:
+    """Per-device replay windows, evicting the least recently seen device
+    once more than `max_devices` are tracked."""
+
+    def __init__(self, window: int = 64, max_devices: int = 10000):
+        self.window = window
+        self.max_devices = max_devices
+        self.devices: "OrderedDict[str, ReplayWindow]" = OrderedDict()
+        self.duplicates = 0
+
+    def accept(self, device_id: str, seq: int) -> bool:
+        """Record (device_id, seq) and return False if it was already seen."""
+        window = self.devices.get(device_id)
+        if window is None:
+            self.devices[device_id] = ReplayWindow(seq)
+            if len(self.devices) > self.max_devices:
+                self.devices.popitem(last=False)
+            return True
+
+        self.devices.move_to_end(device_id)
+        if window.accept(seq, self.window):
+            return True
+        self.duplicates += 1
+        return False
+
+    def filter(self, records: List[dict]) -> List[dict]:
+        """Records not seen before (nor earlier in `records`), without recording them.
+
+        Lets a caller check a batch, write it, and only then commit() it, so
+        a batch that fails to be stored is not remembered as seen.
+        """
+        trial: Dict[str, ReplayWindow] = {}
+        fresh = []
+        for record in records:
+            device_id, seq = record.get("device_id"), record.get("seq")
+            if device_id is None or seq is None:
+                fresh.append(record)
+                continue
+            window = trial.get(device_id)
+            if window is None:
+                current = self.devices.get(device_id)
+                if current is None:
+                    trial[device_id] = ReplayWindow(seq)
+                    fresh.append(record)
+                    continue
+                window = trial[device_id] = current.copy()
+            if window.accept(seq, self.window):
+                fresh.append(record)
+        return fresh
+
+    def commit(self, fresh: List[dict], duplicates: int = 0):
+        """Record the records returned by filter() as seen, and count the duplicates it dropped."""
+        for record in fresh:
+            if record.get("device_id") is not None and record.get("seq") is not None:
+                self.accept(record["device_id"], record["seq"])
+        self.duplicates += duplicates
+
+    def stats(self) -> dict:
+        return {"devices": len(self.devices), "window": self.window, "duplicates": self.duplicates}
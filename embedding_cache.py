@@ -0,0 +1,139 @@
+# embedding_cache.py
+import array
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed cache in front of another Embeddings model.
+
+    Vectors are keyed by a SHA-256 of the normalized text, so the same event
+    text is only ever sent to the provider once. An in-memory LRU holds the
+    hottest `max_entries` vectors; when `path` is given, every vector is also
+    written to a SQLite file and survives restarts.
+    """
+
+    def __init__(self, model: Embeddings, max_entries: int = 10000, path: Optional[str] = None, namespace: str = ""):
+        self.model = model
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self._memory: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    def _key(self, kind: str, text: str) -> bytes:
+        return hashlib.sha256(f"{self.namespace}\0{kind}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+    def _get(self, key: bytes) -> Optional[List[float]]:
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return vector
+        if self._db is not None:
+            row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                vector = array.array("f", row[0]).tolist()
+                self._remember(key, vector)
+                self.disk_hits += 1
+                return vector
+        return None
+
+    def _remember(self, key: bytes, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _put_many(self, items: Dict[bytes, List[float]]):
+        for key, vector in items.items():
+            self._remember(key, vector)
+        if self._db is not None and items:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array.array("f", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._db.commit()
+
+    def _lookup(self, keys: List[bytes], texts: List[str]):
+        vectors: Dict[bytes, List[float]] = {}
+        missing: Dict[bytes, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in vectors or key in missing:
+                    continue
+                vector = self._get(key)
+                if vector is None:
+                    missing[key] = text
+                else:
+                    vectors[key] = vector
+        return vectors, missing
+
+    def _store(self, fresh: Dict[bytes, List[float]]):
+        with self._lock:
+            self.misses += len(fresh)
+            self._put_many(fresh)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("doc", text) for text in texts]
+        vectors, missing = self._lookup(keys, texts)
+        if missing:
+            # One provider round-trip for every distinct text not yet cached
+            fresh = dict(zip(missing.keys(), self.model.embed_documents(list(missing.values()))))
+            self._store(fresh)
+            vectors.update(fresh)
+        return [vectors[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("doc", text) for text in texts]
+        vectors, missing = self._lookup(keys, texts)
+        if missing:
+            fresh = dict(zip(missing.keys(), await self.model.aembed_documents(list(missing.values()))))
+            self._store(fresh)
+            vectors.update(fresh)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        vectors, _ = self._lookup([key], [text])
+        if key in vectors:
+            return vectors[key]
+        vector = self.model.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        vectors, _ = self._lookup([key], [text])
+        if key in vectors:
+            return vectors[key]
+        vector = await self.model.aembed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "persistent": self._db is not None,
+        }
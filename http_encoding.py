@@ -0,0 +1,94 @@
+# http_encoding.py
+"""Response bodies for the log endpoints: fast JSON and negotiated compression.
+
+JSON is serialized with orjson when it is installed (several times faster
+than the stdlib and straight to bytes), skipping FastAPI's jsonable_encoder
+pass, which only matters for types the log endpoints never return. Bodies
+of at least `min_size` bytes are compressed with brotli or gzip, whichever
+the client prefers in Accept-Encoding; brotli is only offered when the
+`brotli` package is installed.
+"""
+import gzip
+import json
+import zlib
+from typing import Iterable, Iterator, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional codec
+    brotli = None
+
+GZIP_LEVEL = 5      # most of level 9's ratio at a fraction of the CPU
+BROTLI_QUALITY = 4  # fast enough for per-request use, smaller than gzip
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The best supported coding acceptable to the client, or None for identity.
+
+    Honours q-values; on a tie the server's preference (brotli) wins.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for coding in supported_encodings():
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_body(body: bytes, accept_encoding: Optional[str], min_size: int) -> Tuple[bytes, Optional[str]]:
+    """Compress `body` if it is large enough and the client accepts a coding (min_size 0 never compresses)."""
+    if min_size <= 0 or len(body) < min_size:
+        return body, None
+    coding = negotiate(accept_encoding)
+    if coding is None:
+        return body, None
+    return compress(body, coding), coding
+
+
+def compress_stream(chunks: Iterable[bytes], coding: str) -> Iterator[bytes]:
+    """Compress a streamed body incrementally, yielding output as it is produced."""
+    if coding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        output = process(chunk)
+        if output:
+            yield output
+    yield finish()
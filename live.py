@@ -0,0 +1,197 @@
+# live.py
+"""Fan-out of newly stored events to live subscribers (SSE, WebSocket).
+
+Each event is serialized once, in publish(), and the same bytes are handed
+to every subscriber. Subscribers have bounded queues: one that falls behind
+stops queueing and, once it has drained what it holds, catches up by
+reading the missed events from the store in chunks. A slow dashboard
+therefore costs a bounded amount of memory and never sees a gap, and
+resuming after a reconnect (Last-Event-ID) is the same catch-up.
+
+Subscribers that only want some event types are indexed by type, so
+publish() visits just the subscribers that could match an event; finer
+filters (devices, severity) run once per subscriber before queueing.
+
+Everything here runs on the event loop; publish() must be called from it.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+# Severity of each known event type; anything else is "info"
+SEVERITY_LEVELS = ("info", "warning", "critical")
+EVENT_SEVERITY = {
+    "motion_alert": "critical",
+    "rfid_invalid": "warning",
+}
+
+
+def severity(event: str) -> str:
+    return EVENT_SEVERITY.get(event, "info")
+
+
+class LogFilter:
+    """A view's filter: any of `events`, any of `devices`, at least `min_severity`."""
+
+    def __init__(self, events: Optional[Iterable[str]] = None, devices: Optional[Iterable[str]] = None,
+                 min_severity: Optional[str] = None):
+        if min_severity is not None and min_severity not in SEVERITY_LEVELS:
+            raise ValueError(f"min_severity must be one of {SEVERITY_LEVELS}")
+        self.events = self._names(events, "events")
+        self.devices = self._names(devices, "devices")
+        self.min_level = SEVERITY_LEVELS.index(min_severity) if min_severity is not None else 0
+
+    @staticmethod
+    def _names(values, field: str) -> Optional[Set[str]]:
+        if values is None:
+            return None
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError(f"{field} must be a list of strings")
+        return set(values)
+
+    def matches(self, log: dict) -> bool:
+        return (
+            (self.events is None or log["event"] in self.events)
+            and (self.devices is None or log.get("device_id") in self.devices)
+            and (not self.min_level or SEVERITY_LEVELS.index(severity(log["event"])) >= self.min_level)
+        )
+
+
+class LiveEvent:
+    __slots__ = ("log", "id", "data", "_sse")
+
+    def __init__(self, log: dict):
+        self.log = log
+        self.id = log["id"]
+        self.data = json.dumps(log, separators=(",", ":"))
+        self._sse: Optional[bytes] = None
+
+    def frame(self, views: List[str]) -> str:
+        """The event as a WebSocket message for the given view ids, reusing `data`."""
+        return f'{{"type":"log","views":{json.dumps(views)},"log":{self.data}}}'
+
+    @property
+    def sse(self) -> bytes:
+        """The event as a Server-Sent Events frame, built on first use."""
+        if self._sse is None:
+            self._sse = f"id: {self.id}\nevent: log\ndata: {self.data}\n\n".encode("utf-8")
+        return self._sse
+
+
+class Subscriber:
+    def __init__(self, hub: "LiveHub", last_id: int, matches: Optional[Callable[[dict], bool]] = None):
+        self.hub = hub
+        self.queue: "asyncio.Queue[LiveEvent]" = asyncio.Queue(maxsize=hub.queue_size)
+        self.last_id = last_id  # newest id handed to the client (or skipped by the filter)
+        self.matches = matches
+        self.behind = last_id < hub.latest_id()  # resuming: catch up from the store first
+        self.catch_ups = 0
+        self.event_types: Optional[Set[str]] = None  # None: offered every event
+
+    def offer(self, event: LiveEvent):
+        if self.behind:
+            return
+        if self.matches is not None and not self.matches(event.log):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.behind = True
+            self.catch_ups += 1
+            self.hub.overflows += 1
+
+    async def events(self, heartbeat: float) -> AsyncIterator[Optional[LiveEvent]]:
+        """Yield events in id order, or None after `heartbeat` idle seconds."""
+        while True:
+            if self.queue.empty() and self.behind:
+                logs = self.hub.read_since(self.last_id, self.hub.catch_up_chunk)
+                if not logs:
+                    # Caught up; nothing can be published between the read and this line
+                    self.behind = False
+                    continue
+                self.last_id = logs[-1]["id"]
+                for log in logs:
+                    if self.matches is None or self.matches(log):
+                        yield LiveEvent(log)
+                continue
+            try:
+                event = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event.id > self.last_id:
+                self.last_id = event.id
+                yield event
+
+
+class LiveHub:
+    """Registry of subscribers; `read_since(after_id, limit)` reads missed events."""
+
+    def __init__(self, read_since: Callable[[int, int], List[dict]], latest_id: Callable[[], int],
+                 queue_size: int = 1000, catch_up_chunk: int = 500, max_subscribers: int = 1000):
+        self.read_since = read_since
+        self.latest_id = latest_id
+        self.queue_size = queue_size
+        self.catch_up_chunk = catch_up_chunk
+        self.max_subscribers = max_subscribers
+        self.subscribers: Set[Subscriber] = set()
+        # Subscribers limited to some event types are only offered those
+        self.any_event: Set[Subscriber] = set()
+        self.by_event: Dict[str, Set[Subscriber]] = {}
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, last_id: Optional[int] = None, matches: Optional[Callable[[dict], bool]] = None) -> Optional[Subscriber]:
+        """Register a subscriber, or return None if the hub is full."""
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        latest = self.latest_id()
+        subscriber = Subscriber(self, latest if last_id is None else min(last_id, latest), matches)
+        self.subscribers.add(subscriber)
+        self.any_event.add(subscriber)
+        return subscriber
+
+    def set_event_types(self, subscriber: Subscriber, event_types: Optional[Iterable[str]]):
+        """Restrict which event types are offered to a subscriber (None for all)."""
+        self._unindex(subscriber)
+        subscriber.event_types = set(event_types) if event_types is not None else None
+        if subscriber.event_types is None:
+            self.any_event.add(subscriber)
+        else:
+            for event_type in subscriber.event_types:
+                self.by_event.setdefault(event_type, set()).add(subscriber)
+
+    def _unindex(self, subscriber: Subscriber):
+        self.any_event.discard(subscriber)
+        for event_type in subscriber.event_types or ():
+            subscribers = self.by_event.get(event_type)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.by_event[event_type]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._unindex(subscriber)
+        self.subscribers.discard(subscriber)
+
+    def publish(self, logs: List[dict]):
+        if not self.subscribers:
+            return
+        for log in logs:
+            interested = self.by_event.get(log["event"])
+            if not interested and not self.any_event:
+                continue
+            event = LiveEvent(log)
+            for subscriber in self.any_event:
+                subscriber.offer(event)
+            for subscriber in interested or ():
+                subscriber.offer(event)
+        self.published += len(logs)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "overflows": self.overflows,
+            "behind": sum(1 for subscriber in self.subscribers if subscriber.behind),
+        }
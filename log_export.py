@@ -0,0 +1,181 @@
+# log_export.py
+"""Encoders for /api/logs/export: CSV, NDJSON and a columnar binary format.
+
+Each encoder takes an iterable of pages (lists of log dicts, oldest first)
+and yields bytes per page, so an export of any size is streamed without
+holding more than one page in memory.
+
+The columnar format stores each page as a row group, column by column like
+the in-memory store (all integers little-endian):
+
+    file    : magic b"VLCF" | version u8 | group* | u32 0 (end marker)
+    group   : rows u32
+              | strings(events) | strings(details) | strings(devices)
+              | first id i64 | id deltas u32[rows] (from the previous id)
+              | timestamps f64[rows]
+              | event u16[rows] | detail u32[rows]    indexes into the strings
+              | device u32[rows]                     0 = none, else index + 1
+              | seq i64[rows]                        -1 = none
+    strings : count u32 | (length u32 | UTF-8 bytes)*
+
+Repeated strings are stored once per group and numeric columns are packed
+arrays, so the format is a fraction of the size of CSV and compresses well.
+read_columnar() decodes it back into log dicts.
+"""
+import csv
+import io
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List
+
+from http_encoding import dumps
+
+CSV_COLUMNS = ("id", "timestamp", "event", "detail", "device_id", "seq")
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "columnar": "application/x-vaultify-columnar",
+}
+EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "columnar": "vlcf"}
+
+COLUMNAR_MAGIC = b"VLCF"
+COLUMNAR_VERSION = 1
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+
+
+def csv_chunks(pages: Iterable[List[dict]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for logs in pages:
+        for log in logs:
+            writer.writerow((
+                log["id"], log["timestamp"], log["event"], log["detail"],
+                log.get("device_id", ""), log.get("seq", ""),
+            ))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(pages: Iterable[List[dict]]) -> Iterator[bytes]:
+    for logs in pages:
+        yield b"".join(dumps(log) + b"\n" for log in logs)
+
+
+# ----------------- columnar -----------------
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _strings(values: List[str]) -> bytes:
+    parts = [_U32.pack(len(values))]
+    for value in values:
+        raw = value.encode("utf-8")
+        parts.append(_U32.pack(len(raw)))
+        parts.append(raw)
+    return b"".join(parts)
+
+
+def _row_group(logs: List[dict]) -> bytes:
+    tables: List[Dict[str, int]] = [{}, {}, {}]
+    events, details, devices = array("H"), array("I"), array("I")
+    deltas, timestamps, seqs = array("I"), array("d"), array("q")
+    previous = logs[0]["id"]
+    for log in logs:
+        deltas.append(log["id"] - previous)
+        previous = log["id"]
+        timestamps.append(log["timestamp"])
+        events.append(tables[0].setdefault(log["event"], len(tables[0])))
+        details.append(tables[1].setdefault(log["detail"], len(tables[1])))
+        device = log.get("device_id")
+        devices.append(0 if device is None else tables[2].setdefault(device, len(tables[2])) + 1)
+        seqs.append(log.get("seq", -1))
+    return b"".join([
+        _U32.pack(len(logs)),
+        *(_strings(list(table)) for table in tables),
+        _I64.pack(logs[0]["id"]),
+        *(_little_endian(column) for column in (deltas, timestamps, events, details, devices, seqs)),
+    ])
+
+
+def columnar_chunks(pages: Iterable[List[dict]]) -> Iterator[bytes]:
+    yield COLUMNAR_MAGIC + bytes((COLUMNAR_VERSION,))
+    for logs in pages:
+        if logs:
+            yield _row_group(logs)
+    yield _U32.pack(0)
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def take(self, size: int) -> bytes:
+        if self.offset + size > len(self.data):
+            raise ValueError("truncated columnar export")
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return chunk
+
+    def unpack(self, layout: struct.Struct):
+        return layout.unpack(self.take(layout.size))[0]
+
+    def column(self, typecode: str, rows: int) -> array:
+        column = array(typecode)
+        column.frombytes(self.take(column.itemsize * rows))
+        if sys.byteorder == "big":
+            column.byteswap()
+        return column
+
+    def strings(self) -> List[str]:
+        return [self.take(self.unpack(_U32)).decode("utf-8") for _ in range(self.unpack(_U32))]
+
+
+def read_columnar(data: bytes) -> Iterator[dict]:
+    """Decode a columnar export, raising ValueError if it is malformed."""
+    reader = _Reader(data)
+    if reader.take(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("not a columnar export")
+    version = reader.take(1)[0]
+    if version != COLUMNAR_VERSION:
+        raise ValueError(f"unsupported columnar version {version}")
+    while True:
+        rows = reader.unpack(_U32)
+        if rows == 0:
+            break
+        events, details, devices = reader.strings(), reader.strings(), reader.strings()
+        log_id = reader.unpack(_I64)
+        deltas = reader.column("I", rows)
+        timestamps = reader.column("d", rows)
+        event_codes, detail_codes = reader.column("H", rows), reader.column("I", rows)
+        device_codes, seqs = reader.column("I", rows), reader.column("q", rows)
+        try:
+            for row in range(rows):
+                log_id += deltas[row]
+                log = {
+                    "id": log_id,
+                    "event": events[event_codes[row]],
+                    "detail": details[detail_codes[row]],
+                    "timestamp": timestamps[row],
+                }
+                if device_codes[row]:
+                    log["device_id"] = devices[device_codes[row] - 1]
+                if seqs[row] >= 0:
+                    log["seq"] = seqs[row]
+                yield log
+        except IndexError:
+            raise ValueError("string index out of range in columnar export")
+    if reader.offset != len(data):
+        raise ValueError("trailing bytes after columnar export")
+
+
+ENCODERS = {"csv": csv_chunks, "ndjson": ndjson_chunks, "columnar": columnar_chunks}
@@ -0,0 +1,519 @@
+# log_store.py
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+def log_matches(log: dict, event: Optional[str] = None, device_id: Optional[str] = None,
+                start: Optional[float] = None, end: Optional[float] = None) -> bool:
+    """Whether a row dict passes the filters shared by every store's page()."""
+    return (
+        (event is None or log["event"] == event)
+        and (device_id is None or log.get("device_id") == device_id)
+        and (start is None or log["timestamp"] >= start)
+        and (end is None or log["timestamp"] < end)
+    )
+
+
+def stored_log(record: dict, log_id: int, now: float) -> dict:
+    """The row dict a store returns for `record` once appended with `log_id` at `now`."""
+    log = {
+        "id": log_id,
+        "event": record["event"],
+        "detail": record["detail"],
+        "timestamp": record.get("timestamp") or now,
+    }
+    if record.get("device_id") is not None:
+        log["device_id"] = record["device_id"]
+    if record.get("seq") is not None:
+        log["seq"] = record["seq"]
+    return log
+
+
+class StringTable:
+    """Interns strings to small integer codes (dictionary encoding)."""
+
+    def __init__(self, reserve_none: bool = False):
+        # Code 0 stands for None when reserve_none is set
+        self.values: List[Optional[str]] = [None] if reserve_none else []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class _Slice:
+    """A read-only view of ids[start:stop] that can be walked either way without copying."""
+
+    __slots__ = ("ids", "start", "stop")
+
+    def __init__(self, ids: Sequence[int], start: int, stop: int):
+        self.ids, self.start, self.stop = ids, start, stop
+
+    def __iter__(self) -> Iterator[int]:
+        ids = self.ids
+        return (ids[i] for i in range(self.start, self.stop))
+
+    def __reversed__(self) -> Iterator[int]:
+        ids = self.ids
+        return (ids[i] for i in range(self.stop - 1, self.start - 1, -1))
+
+
+MAX_EVENT_TYPES = 0x10000  # event codes are stored as u16
+
+
+class LogStore:
+    """In-memory, column-oriented store of security events.
+
+    Each event costs a few bytes spread over typed arrays instead of a dict:
+    interned event and device codes, a dictionary-encoded detail column, a
+    float timestamp and an int sequence number. Ids are assigned by the store
+    and are contiguous, so the row for an id is found by subtraction.
+
+    Secondary indexes are kept up to date on every append and eviction: a
+    posting list of ids per event type and per device, and the ids ordered
+    by timestamp. A filtered read walks the shortest of them (an event
+    type's list sliced by bisect, or the bisected time range) instead of
+    every row, and counts are posting-list lengths, so e.g. "rfid_invalid
+    between 02:00 and 04:00" costs O(log n + k) and the per-type counts
+    behind the summary fallback O(1) per type.
+
+    All reads and writes hold `lock`; callers that must do more work
+    atomically with an append (deduplication, enqueueing) may hold it too.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.first_id = 1
+        self.version = 0  # bumped on every write, usable as a cache key
+        self.event_names = StringTable()
+        self.detail_values = StringTable()
+        self.device_ids = StringTable(reserve_none=True)
+        self._events = array("H")
+        self._details = array("I")
+        self._devices = array("I")
+        self._seqs = array("q")  # -1 when the event carried no sequence number
+        self._timestamps = array("d")
+        # Secondary indexes; every array holds ids in ascending order except
+        # _by_time, which holds them ordered by (timestamp, id)
+        self._event_postings: List[array] = []  # indexed by event code
+        self._device_postings: Dict[int, array] = {}  # by device code, None excluded
+        self._by_time = array("q")
+
+    def __len__(self):
+        return len(self._events)
+
+    @property
+    def last_id(self) -> int:
+        """Id of the newest event, or first_id - 1 when the store is empty."""
+        return self.first_id + len(self._events) - 1
+
+    def _push(self, record: dict, now: float, log_id: int):
+        event, device = self.event_names.code(record["event"]), self.device_ids.code(record.get("device_id"))
+        timestamp = record.get("timestamp") or now
+        self._events.append(event)
+        self._details.append(self.detail_values.code(record["detail"]))
+        self._devices.append(device)
+        seq = record.get("seq")
+        self._seqs.append(-1 if seq is None else seq)
+        self._timestamps.append(timestamp)
+        self._index(log_id, event, device)
+
+    def _index(self, log_id: int, event: int, device: int):
+        while len(self._event_postings) <= event:
+            self._event_postings.append(array("q"))
+        self._event_postings[event].append(log_id)
+        if device:
+            self._device_postings.setdefault(device, array("q")).append(log_id)
+
+    def _index_times(self, first: int, timestamps: Sequence[float]):
+        """Add ids first, first + 1, ... (already in the columns) to the time index."""
+        if not timestamps:
+            return
+        by_time = self._by_time
+        ids = range(first, first + len(timestamps))
+        in_order = all(timestamps[i] <= timestamps[i + 1] for i in range(len(timestamps) - 1))
+        if in_order and (not by_time or timestamps[0] >= self._time_of(by_time[-1])):
+            by_time.extend(ids)
+            return
+        # Late events: sort just the new ids, then rebuild the part of the index
+        # they overlap in one pass, copying the runs between them as slices.
+        # New ids are the largest, so they go after equal timestamps.
+        new = ids if in_order else sorted(ids, key=self._time_of)  # stable, so ties stay in id order
+        position = bisect_right(by_time, self._time_of(new[0]), key=self._time_of)
+        tail = by_time[position:]
+        del by_time[position:]
+        copied = 0
+        for log_id in new:
+            cut = bisect_right(tail, self._time_of(log_id), lo=copied, key=self._time_of)
+            by_time.extend(tail[copied:cut])
+            by_time.append(log_id)
+            copied = cut
+        by_time.extend(tail[copied:])
+
+    def _time_of(self, log_id: int) -> float:
+        return self._timestamps[log_id - self.first_id]
+
+    def _check_event_types(self, records: List[dict]):
+        # Checked before anything is written so a batch is stored whole or not at all
+        if len(self.event_names) + len(records) <= MAX_EVENT_TYPES:
+            return
+        known = self.event_names.codes
+        new = {record["event"] for record in records if record["event"] not in known}
+        if len(self.event_names) + len(new) > MAX_EVENT_TYPES:
+            raise ValueError(f"more than {MAX_EVENT_TYPES} distinct event types")
+
+    def check(self, records: List[dict]):
+        """Raise ValueError if append(records) would, without changing anything."""
+        with self.lock:
+            self._check_event_types(records)
+
+    def append(self, records: List[dict], now: float) -> List[dict]:
+        """Append records and return them as stored, with ids assigned.
+
+        Raises ValueError, having stored nothing, if the records would
+        exceed the store's capacity for distinct event types.
+        """
+        with self.lock:
+            self._check_event_types(records)
+            next_id = self.last_id + 1
+            stored = []
+            for i, record in enumerate(records):
+                self._push(record, now, next_id + i)
+                stored.append(self._row(len(self._events) - 1, next_id + i))
+            self._index_times(next_id, self._timestamps[len(self._timestamps) - len(stored):])
+            if stored:
+                self.version += 1
+            return stored
+
+    def load(self, logs: List[dict]):
+        """Append logs that already have ids, e.g. replayed from disk.
+
+        Ids must continue the store without gaps; an empty store starts at
+        the first id it is given. Columns are extended in bulk, which makes
+        this much faster than append() for large replays.
+        """
+        if not logs:
+            return
+        with self.lock:
+            if not self._events:
+                self.first_id = logs[0]["id"]
+            expected = self.last_id + 1
+            if logs[0]["id"] != expected or logs[-1]["id"] != expected + len(logs) - 1:
+                raise ValueError(f"logs must continue the store at id {expected} without gaps")
+            self._check_event_types(logs)
+            event_code, detail_code, device_code = self.event_names.code, self.detail_values.code, self.device_ids.code
+            events = [event_code(log["event"]) for log in logs]
+            devices = [device_code(log.get("device_id")) for log in logs]
+            timestamps = [log["timestamp"] for log in logs]
+            self._events.extend(events)
+            self._details.extend([detail_code(log["detail"]) for log in logs])
+            self._devices.extend(devices)
+            self._seqs.extend([log.get("seq", -1) for log in logs])
+            self._timestamps.extend(timestamps)
+            self._index_bulk(expected, events, devices, timestamps)
+            self.version += 1
+
+    def _index_bulk(self, first: int, events: List[int], devices: List[int], timestamps: List[float]):
+        postings: Dict[int, List[int]] = {}
+        device_postings: Dict[int, List[int]] = {}
+        for log_id, event, device in zip(range(first, first + len(events)), events, devices):
+            postings.setdefault(event, []).append(log_id)
+            if device:
+                device_postings.setdefault(device, []).append(log_id)
+        while len(self._event_postings) < len(self.event_names):
+            self._event_postings.append(array("q"))
+        for event, ids in postings.items():
+            self._event_postings[event].extend(ids)
+        for device, ids in device_postings.items():
+            self._device_postings.setdefault(device, array("q")).extend(ids)
+        self._index_times(first, timestamps)
+
+    def evict(self, count: int) -> int:
+        """Drop the `count` oldest events and return how many were dropped.
+
+        Interned details no longer referenced are released once the table
+        holds twice as many strings as there are live rows, so the memory
+        of a store trimmed this way stays bounded.
+        """
+        with self.lock:
+            count = min(count, len(self._events))
+            if count <= 0:
+                return 0
+            self._unindex_before(self.first_id + count, count)
+            for column in (self._events, self._details, self._devices, self._seqs, self._timestamps):
+                del column[:count]
+            self.first_id += count
+            if len(self.detail_values) > 2 * len(self._details) + 1024:
+                self._compact_details()
+            return count
+
+    def _unindex_before(self, first_id: int, count: int):
+        for postings in self._event_postings:
+            del postings[:bisect_left(postings, first_id)]
+        for device, postings in list(self._device_postings.items()):
+            del postings[:bisect_left(postings, first_id)]
+            if not postings:
+                del self._device_postings[device]
+        # The oldest ids are usually also the earliest timestamps
+        head = self._by_time[:count]
+        if all(log_id < first_id for log_id in head):
+            del self._by_time[:count]
+        else:
+            self._by_time = array("q", (log_id for log_id in self._by_time if log_id >= first_id))
+
+    def _compact_details(self):
+        table = StringTable()
+        old = self.detail_values.values
+        self._details = array("I", [table.code(old[code]) for code in self._details])
+        self.detail_values = table
+
+    def count_older_than(self, cutoff: float) -> int:
+        """Number of leading (oldest by id) events with a timestamp before cutoff."""
+        with self.lock:
+            count = 0
+            for timestamp in self._timestamps:
+                if timestamp >= cutoff:
+                    break
+                count += 1
+            return count
+
+    def _row(self, offset: int, log_id: int) -> dict:
+        log = {
+            "id": log_id,
+            "event": self.event_names.values[self._events[offset]],
+            "detail": self.detail_values.values[self._details[offset]],
+            "timestamp": self._timestamps[offset],
+        }
+        device = self._devices[offset]
+        if device:
+            log["device_id"] = self.device_ids.values[device]
+        seq = self._seqs[offset]
+        if seq >= 0:
+            log["seq"] = seq
+        return log
+
+    def get(self, log_id: int) -> Optional[dict]:
+        with self.lock:
+            offset = log_id - self.first_id
+            if 0 <= offset < len(self._events):
+                return self._row(offset, log_id)
+            return None
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """Materialize rows by offset, like slicing a list."""
+        with self.lock:
+            start, stop, _ = slice(start, stop).indices(len(self._events))
+            return [self._row(offset, self.first_id + offset) for offset in range(start, stop)]
+
+    def since(self, log_id: int, limit: Optional[int] = None) -> List[dict]:
+        """Events with an id greater than log_id, oldest first."""
+        with self.lock:
+            start = max(0, log_id + 1 - self.first_id)
+            stop = None if limit is None else start + limit
+            return self.rows(start, stop)
+
+    def tail(self, count: int) -> List[dict]:
+        with self.lock:
+            return self.rows(max(0, len(self._events) - count))
+
+    def iter_rows(self, chunk_size: int = 1000) -> Iterator[dict]:
+        """Iterate every event oldest first, holding the lock one chunk at a time."""
+        last_id = self.first_id - 1
+        while True:
+            chunk = self.since(last_id, chunk_size)
+            if not chunk:
+                return
+            yield from chunk
+            last_id = chunk[-1]["id"]
+
+    def event_counts(self, after: Optional[int] = None) -> Dict[str, int]:
+        """Events per type, optionally only those with an id greater than `after`."""
+        with self.lock:
+            counts = {}
+            for code, postings in enumerate(self._event_postings):
+                count = len(postings) if after is None else len(postings) - bisect_right(postings, after)
+                if count:
+                    counts[self.event_names.values[code]] = count
+            return counts
+
+    def device_counts(self, after: Optional[int] = None) -> Dict[str, int]:
+        """Events per device id (events without one are not counted)."""
+        with self.lock:
+            counts = {}
+            for code, postings in self._device_postings.items():
+                count = len(postings) if after is None else len(postings) - bisect_right(postings, after)
+                if count:
+                    counts[self.device_ids.values[code]] = count
+            return counts
+
+    def _postings(self, event: Optional[str], device_id: Optional[str]) -> Optional[List[Sequence[int]]]:
+        """Posting lists for the given filters, or None if a filter matches nothing."""
+        postings = []
+        if event is not None:
+            code = self.event_names.codes.get(event)
+            if code is None:
+                return None
+            postings.append(self._event_postings[code])
+        if device_id is not None:
+            code = self.device_ids.codes.get(device_id)
+            if code is None or code not in self._device_postings:
+                return None
+            postings.append(self._device_postings[code])
+        return postings
+
+    def _matches(self, offset: int, event_code: Optional[int], device_code: Optional[int],
+                 start: Optional[float], end: Optional[float]) -> bool:
+        if event_code is not None and self._events[offset] != event_code:
+            return False
+        if device_code is not None and self._devices[offset] != device_code:
+            return False
+        timestamp = self._timestamps[offset]
+        return (start is None or timestamp >= start) and (end is None or timestamp < end)
+
+    def _matching_offsets(self, event: Optional[str], device_id: Optional[str]) -> Iterator[int]:
+        postings = self._postings(event, device_id)
+        if postings is None:
+            return iter(())
+        if not postings:
+            return iter(range(len(self._events)))
+        # Walk the shorter list and check the other filter on the columns
+        shortest = min(postings, key=len)
+        event_code = self.event_names.codes.get(event) if event is not None else None
+        device_code = self.device_ids.codes.get(device_id) if device_id is not None else None
+        offsets = (log_id - self.first_id for log_id in shortest)
+        if len(postings) == 1:
+            return offsets
+        return (offset for offset in offsets if self._matches(offset, event_code, device_code, None, None))
+
+    def page(
+        self,
+        limit: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        event: Optional[str] = None,
+        device_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Tuple[List[dict], bool]:
+        """Up to `limit` matching events next to an id cursor, oldest first.
+
+        With `after`, returns the oldest matches with a greater id; otherwise
+        the newest matches with an id below `before` (or overall). Timestamps
+        match when start <= timestamp < end. The flag says whether further
+        matches exist beyond the page in the direction it was read.
+
+        Candidates come from whichever is smallest: the id range between the
+        cursors, an event type's or device's posting list cut to that range
+        by bisect, or the time index cut to [start, end) by bisect. Each
+        candidate is then checked against every filter. Since a walk by id
+        stops after `limit` matches, it is tried before a smaller time range,
+        up to that range's size.
+        """
+        with self.lock:
+            postings = self._postings(event, device_id)
+            if postings is None:
+                return [], False
+            event_code = self.event_names.codes.get(event) if event is not None else None
+            device_code = self.device_ids.codes.get(device_id) if device_id is not None else None
+            low = self.first_id if after is None else max(self.first_id, after + 1)
+            high = self.last_id + 1 if before is None else min(self.last_id + 1, before)
+            if high <= low:
+                return [], False
+
+            # (size, ids ascending) for each way of enumerating the candidates
+            candidates = [(high - low, range(low, high))]
+            for ids in postings:
+                i, j = bisect_left(ids, low), bisect_left(ids, high)
+                candidates.append((j - i, _Slice(ids, i, j)))
+            size, ids = min(candidates, key=lambda candidate: candidate[0])
+            scan = (ids, after is not None, limit, event_code, device_code, start, end)
+            found = None
+            if start is None and end is None:
+                found = self._scan(*scan)
+            else:
+                first, last = self._time_range(start, end)
+                if last - first >= size:
+                    found = self._scan(*scan)
+                elif last - first > limit and self._starts_in_range(*scan[:2], start, end):
+                    # The time range is smaller, but walking by id stops after `limit`
+                    # matches, and the walk starts among them: try that first, giving
+                    # up once it has cost what the time range would
+                    found = self._scan(*scan, budget=last - first)
+                if found is None:
+                    ids = sorted(log_id for log_id in self._by_time[first:last] if low <= log_id < high)
+                    found = self._scan(ids, *scan[1:])
+            has_more = len(found) > limit
+            found = found[:limit]
+            if after is None:
+                found.reverse()
+            return [self._row(offset, self.first_id + offset) for offset in found], has_more
+
+    def _starts_in_range(self, ids, ascending: bool, start: Optional[float], end: Optional[float]) -> bool:
+        """Whether the first id a walk over `ids` would visit has a timestamp in [start, end)."""
+        edge = next(iter(ids) if ascending else reversed(ids), None)
+        return edge is not None and self._matches(edge - self.first_id, None, None, start, end)
+
+    def _scan(self, ids, ascending: bool, limit: int, event_code: Optional[int], device_code: Optional[int],
+              start: Optional[float], end: Optional[float], budget: Optional[int] = None) -> Optional[List[int]]:
+        """Offsets of the first limit + 1 matches in `ids` walked in the given
+        direction, or None if `budget` ids were checked without finding them."""
+        found = []
+        checked = 0
+        for log_id in (ids if ascending else reversed(ids)):
+            if budget is not None and checked >= budget:
+                return None
+            checked += 1
+            offset = log_id - self.first_id
+            if not self._matches(offset, event_code, device_code, start, end):
+                continue
+            found.append(offset)
+            if len(found) > limit:
+                break
+        return found
+
+    def _time_range(self, start: Optional[float], end: Optional[float]) -> Tuple[int, int]:
+        """Positions in the time index of the events with start <= timestamp < end."""
+        i = 0 if start is None else bisect_left(self._by_time, start, key=self._time_of)
+        j = len(self._by_time) if end is None else bisect_left(self._by_time, end, key=self._time_of)
+        return i, max(i, j)
+
+    def count(self, event: Optional[str] = None, device_id: Optional[str] = None) -> int:
+        with self.lock:
+            postings = self._postings(event, device_id)
+            if postings is None:
+                return 0
+            if len(postings) < 2:
+                return len(postings[0]) if postings else len(self._events)
+            return sum(1 for _ in self._matching_offsets(event, device_id))
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the columns (excluding interned strings)."""
+        columns = (self._events, self._details, self._devices, self._seqs, self._timestamps)
+        return sum(column.itemsize * len(column) for column in columns)
+
+    def index_usage(self) -> int:
+        """Approximate bytes held by the secondary indexes."""
+        indexes = [self._by_time, *self._event_postings, *self._device_postings.values()]
+        return sum(index.itemsize * len(index) for index in indexes)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "logs": len(self._events),
+            "column_bytes": self.memory_usage(),
+            "index_bytes": self.index_usage(),
+        }
+
+    def close(self):
+        pass
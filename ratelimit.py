@@ -0,0 +1,124 @@
+# ratelimit.py
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second up to `capacity`.
+
+    A request is admitted while the bucket holds at least min(cost, capacity)
+    tokens and is then charged its full cost, so a batch larger than the
+    burst size still gets through once but leaves the bucket in debt.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """Seconds until `cost` would be admitted (0 if it is admitted now)."""
+        needed = min(cost, self.capacity)
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def consume(self, cost: float):
+        self.tokens -= cost
+
+
+class RateLimiter:
+    """A global bucket plus one bucket per device key and per client key.
+
+    Client buckets cover traffic that cannot be told apart by device (e.g.
+    events without a device id, keyed by client address), so they usually
+    get a larger budget. A rate of 0 disables that level. Buckets are kept
+    in LRU order and at most `max_devices` of each kind are tracked; a
+    forgotten key simply starts again with a full bucket.
+    """
+
+    def __init__(self, device_rate: float, device_burst: float, global_rate: float, global_burst: float,
+                 max_devices: int = 10000, client_rate: float = 0, client_burst: float = 0):
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_devices = max_devices
+        self.global_bucket = TokenBucket(global_rate, global_burst, time.monotonic()) if global_rate > 0 else None
+        self.devices: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.admitted = 0
+        self.shed_device = 0
+        self.shed_global = 0
+
+    def _bucket(self, table: "OrderedDict[str, TokenBucket]", key: str, rate: float, burst: float, now: float) -> TokenBucket:
+        bucket = table.get(key)
+        if bucket is None:
+            bucket = table[key] = TokenBucket(rate, burst, now)
+            if len(table) > self.max_devices:
+                table.popitem(last=False)
+        else:
+            table.move_to_end(key)
+            bucket.refill(now)
+        return bucket
+
+    def admit(self, costs: Dict[str, int], client_costs: Optional[Dict[str, int]] = None) -> Optional[float]:
+        """Charge each device key in `costs` and client key in `client_costs`
+        its cost if every bucket allows it.
+
+        Returns None when admitted, otherwise the number of seconds to wait
+        before retrying. Nothing is charged for a rejected request.
+        """
+        client_costs = client_costs or {}
+        if not costs and not client_costs:
+            return None
+        now = time.monotonic()
+        total = sum(costs.values()) + sum(client_costs.values())
+
+        # (bucket, cost) for every per-key bucket this request is charged to
+        charges = []
+        if self.device_rate > 0:
+            charges += [
+                (self._bucket(self.devices, key, self.device_rate, self.device_burst, now), cost)
+                for key, cost in costs.items()
+            ]
+        if self.client_rate > 0:
+            charges += [
+                (self._bucket(self.clients, key, self.client_rate, self.client_burst, now), cost)
+                for key, cost in client_costs.items()
+            ]
+        if charges:
+            wait = max(bucket.wait_time(cost) for bucket, cost in charges)
+            if wait > 0:
+                self.shed_device += total
+                return wait
+
+        if self.global_bucket is not None:
+            self.global_bucket.refill(now)
+            wait = self.global_bucket.wait_time(total)
+            if wait > 0:
+                self.shed_global += total
+                return wait
+            self.global_bucket.consume(total)
+
+        for bucket, cost in charges:
+            bucket.consume(cost)
+        self.admitted += total
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "shed_device": self.shed_device,
+            "shed_global": self.shed_global,
+            "tracked_devices": len(self.devices),
+            "tracked_clients": len(self.clients),
+        }
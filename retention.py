@@ -0,0 +1,534 @@
+# retention.py
+"""Tiered retention for the in-memory log store.
+
+    hot  -- the newest events, held in a LogStore capped at `hot_events`
+            events (and optionally `hot_hours` of age)
+    warm -- events evicted from the hot tier, written to segment files in
+            the WAL frame format (checksummed, one file per eviction)
+    cold -- warm segments older than `cold_after_hours`, gzip-compressed;
+            still readable, just slower to open
+
+Each segment has a JSON sidecar with its id and time range and its event
+and device counts, so filtered reads skip segments that cannot match. The
+store keeps running totals of those counts, added when a segment is written
+and subtracted when one is purged, so whole-store counts are O(1) per type. Ids stay contiguous across tiers,
+and every read returns events oldest first as a single LogStore would.
+"""
+import bisect
+import gzip
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from log_store import LogStore, log_matches
+from wal import decode_frames, encode_records
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Segment:
+    """One immutable file of evicted events plus its summary."""
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.first_id: int = meta["first_id"]
+        self.last_id: int = meta["last_id"]
+        self.min_ts: float = meta["min_ts"]
+        self.max_ts: float = meta["max_ts"]
+        self.event_counts: Dict[str, int] = meta["events"]
+        self.device_counts: Dict[str, int] = meta["devices"]
+        self.size = os.path.getsize(path)
+
+    @property
+    def compressed(self) -> bool:
+        return self.path.endswith(".gz")
+
+    @property
+    def count(self) -> int:
+        return self.last_id - self.first_id + 1
+
+    @staticmethod
+    def summarize(logs: List[dict]) -> dict:
+        timestamps = [log["timestamp"] for log in logs]
+        devices = Counter(log["device_id"] for log in logs if "device_id" in log)
+        return {
+            "first_id": logs[0]["id"],
+            "last_id": logs[-1]["id"],
+            "min_ts": min(timestamps),
+            "max_ts": max(timestamps),
+            "events": dict(Counter(log["event"] for log in logs)),
+            "devices": dict(devices),
+        }
+
+    @classmethod
+    def write(cls, path: str, logs: List[dict], data: Optional[bytes] = None, meta: Optional[dict] = None) -> "Segment":
+        """Write logs (or already encoded frames) to path, then its sidecar."""
+        if data is None:
+            data = encode_records(logs)
+        if path.endswith(".gz"):
+            data = gzip.compress(data, compresslevel=6)
+        meta = meta or cls.summarize(logs)
+        _write_atomic(path, data)
+        _write_atomic(path + ".json", json.dumps(meta).encode("utf-8"))
+        return cls(path, meta)
+
+    @classmethod
+    def open(cls, path: str) -> "Segment":
+        """Open an existing segment, rebuilding a missing or damaged sidecar."""
+        try:
+            with open(path + ".json", "rb") as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError, KeyError):
+            logs = list(decode_frames(cls.raw(path)))
+            meta = cls.summarize(logs)
+            _write_atomic(path + ".json", json.dumps(meta).encode("utf-8"))
+            return cls(path, meta)
+
+    @staticmethod
+    def raw(path: str) -> bytes:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            return f.read()
+
+    def read(self) -> List[dict]:
+        return list(decode_frames(self.raw(self.path)))
+
+    def remove(self):
+        for path in (self.path, self.path + ".json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def may_match(self, event: Optional[str], device_id: Optional[str],
+                  start: Optional[float] = None, end: Optional[float] = None) -> bool:
+        return (
+            (event is None or event in self.event_counts)
+            and (device_id is None or device_id in self.device_counts)
+            and (start is None or self.max_ts >= start)
+            and (end is None or self.min_ts < end)
+        )
+
+
+def segment_filename(first_id: int, last_id: int, compressed: bool = False) -> str:
+    return f"seg-{first_id:020d}-{last_id:020d}.log" + (".gz" if compressed else "")
+
+
+class TieredLogStore:
+    """LogStore-compatible store that keeps only recent events in memory.
+
+    Appends go to the hot tier; once it holds more than `hot_events +
+    evict_chunk` events a background thread writes the oldest to a warm
+    segment, so appends never wait on disk I/O. maintain(), run periodically, also
+    evicts events older than `hot_hours` in chunks of `evict_chunk` (a
+    partial chunk once it is twice that old), compresses warm segments into the
+    cold archive and, if `purge_after_days` is set, deletes the oldest cold
+    segments.
+
+    Shares the hot tier's lock, so callers can hold `store.lock` exactly as
+    with a plain LogStore. Segment files are written without it: evicted
+    rows are copied under the lock, written, and only then dropped from the
+    hot tier under the lock again.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        hot_events: int = 100000,
+        hot_hours: float = 0,
+        evict_chunk: int = 10000,
+        cold_after_hours: float = 168,
+        purge_after_days: float = 0,
+        cache_segments: int = 4,
+    ):
+        self.warm_dir = os.path.join(directory, "warm")
+        self.cold_dir = os.path.join(directory, "cold")
+        os.makedirs(self.warm_dir, exist_ok=True)
+        os.makedirs(self.cold_dir, exist_ok=True)
+        self.hot_events = hot_events
+        self.hot_hours = hot_hours
+        self.evict_chunk = evict_chunk
+        self.cold_after_hours = cold_after_hours
+        self.purge_after_days = purge_after_days
+        self.cache_segments = cache_segments
+        self.hot = LogStore()
+        self.lock = self.hot.lock
+        self.purged = 0
+        self._cache: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._evict_lock = threading.Lock()  # one eviction at a time; taken before self.lock, never inside it
+        self._evict_wanted = threading.Event()
+        self._closed = False
+
+        paths = []
+        for tier in (self.warm_dir, self.cold_dir):
+            for name in os.listdir(tier):
+                if name.startswith("seg-") and (name.endswith(".log") or name.endswith(".log.gz")):
+                    paths.append(os.path.join(tier, name))
+                elif name.endswith(".tmp"):
+                    os.remove(os.path.join(tier, name))
+        self.segments: List[Segment] = []
+        for path in sorted(paths, key=os.path.basename):
+            segment = Segment.open(path)
+            if self.segments and segment.first_id <= self.segments[-1].last_id:
+                # A crash between writing a cold copy and removing the warm one
+                if segment.compressed:
+                    self.segments[-1].remove()
+                    self.segments[-1] = segment
+                else:
+                    segment.remove()
+                continue
+            self.segments.append(segment)
+        self._segment_logs = 0
+        self._segment_events: Counter = Counter()
+        self._segment_devices: Counter = Counter()
+        for segment in self.segments:
+            self._add_counts(segment)
+        if self.segments:
+            self.hot.first_id = self.segments[-1].last_id + 1
+        threading.Thread(target=self._evict_worker, name="retention-evict", daemon=True).start()
+
+    # ----------------- writes -----------------
+    @property
+    def version(self) -> int:
+        return self.hot.version + self.purged
+
+    @property
+    def first_id(self) -> int:
+        return self.segments[0].first_id if self.segments else self.hot.first_id
+
+    @property
+    def last_id(self) -> int:
+        return self.hot.last_id
+
+    def __len__(self):
+        return self._segment_logs + len(self.hot)
+
+    def check(self, records: List[dict]):
+        self.hot.check(records)
+
+    def append(self, records: List[dict], now: float) -> List[dict]:
+        with self.lock:
+            stored = self.hot.append(records, now)
+            if len(self.hot) > self.hot_events + self.evict_chunk:
+                self._evict_wanted.set()
+            return stored
+
+    def load(self, logs: List[dict]):
+        """Load replayed logs, skipping any already moved to a segment."""
+        with self._evict_lock:
+            with self.lock:
+                logs = [log for log in logs if log["id"] >= self.hot.first_id]
+                if not logs:
+                    return
+                if not len(self.hot) and logs[0]["id"] != self.hot.first_id and self.segments:
+                    raise ValueError(f"logs must continue the store at id {self.hot.first_id} without gaps")
+                self.hot.load(logs)
+            while len(self.hot) > self.hot_events + self.evict_chunk:
+                self._evict(min(self.evict_chunk, len(self.hot) - self.hot_events))
+
+    def evict_excess(self):
+        """Write the oldest hot events to a warm segment if the hot tier is over its cap."""
+        with self._evict_lock:
+            if len(self.hot) > self.hot_events + self.evict_chunk:
+                self._evict(len(self.hot) - self.hot_events)
+
+    def _evict_worker(self):
+        while True:
+            self._evict_wanted.wait()
+            self._evict_wanted.clear()
+            if self._closed:
+                return
+            try:
+                self.evict_excess()
+            except OSError as e:
+                # The records are stored either way; eviction is retried on the next append
+                print(f"Retention: could not write a warm segment: {e}")
+
+    def _evict(self, count: int) -> Optional[Segment]:
+        """Move the `count` oldest hot events to a warm segment; called holding _evict_lock."""
+        with self.lock:
+            logs = self.hot.rows(0, count)
+        if not logs:
+            return None
+        # Written without the store lock; appends meanwhile only add newer rows
+        path = os.path.join(self.warm_dir, segment_filename(logs[0]["id"], logs[-1]["id"]))
+        segment = Segment.write(path, logs)
+        with self.lock:
+            # Dropped from memory only once the segment is safely on disk
+            self.hot.evict(len(logs))
+            self.segments.append(segment)
+            self._add_counts(segment)
+        return segment
+
+    def _add_counts(self, segment: Segment):
+        self._segment_logs += segment.count
+        self._segment_events.update(segment.event_counts)
+        self._segment_devices.update(segment.device_counts)
+
+    def _remove_counts(self, segment: Segment):
+        self._segment_logs -= segment.count
+        # In-place subtraction drops the keys that reach zero
+        self._segment_events -= Counter(segment.event_counts)
+        self._segment_devices -= Counter(segment.device_counts)
+
+    def maintain(self, now: float) -> List[Segment]:
+        """Age events through the tiers; returns the segments purged."""
+        with self._evict_lock:
+            if self.hot_hours > 0:
+                cutoff = now - self.hot_hours * 3600
+                with self.lock:
+                    count = self.hot.count_older_than(cutoff)
+                    if count and self.hot.get(self.hot.first_id)["timestamp"] >= cutoff - self.hot_hours * 3600:
+                        # Only whole chunks, so a trickle of events does not leave a tiny segment
+                        # per run; a partial chunk goes once it has been due for another hot_hours
+                        count -= count % self.evict_chunk
+                while count > 0:
+                    evicted = self._evict(min(count, self.evict_chunk))
+                    if evicted is None:
+                        break
+                    count -= evicted.count
+
+        with self.lock:
+            cold_before = now - self.cold_after_hours * 3600
+            warm = [segment for segment in self.segments if not segment.compressed and segment.max_ts < cold_before]
+        for segment in warm:
+            self._compress(segment)
+
+        purged = []
+        if self.purge_after_days > 0:
+            purge_before = now - self.purge_after_days * 86400
+            with self.lock:
+                while self.segments and self.segments[0].compressed and self.segments[0].max_ts < purge_before:
+                    segment = self.segments.pop(0)
+                    self._remove_counts(segment)
+                    self._cache.pop(segment.path, None)
+                    purged.append(segment)
+                if purged:
+                    self.purged += 1
+            for segment in purged:
+                segment.remove()
+        return purged
+
+    def _compress(self, segment: Segment):
+        # Done outside the lock: the warm file stays readable until the swap
+        path = os.path.join(self.cold_dir, segment_filename(segment.first_id, segment.last_id, compressed=True))
+        meta = {
+            "first_id": segment.first_id, "last_id": segment.last_id,
+            "min_ts": segment.min_ts, "max_ts": segment.max_ts,
+            "events": segment.event_counts, "devices": segment.device_counts,
+        }
+        cold = Segment.write(path, [], data=Segment.raw(segment.path), meta=meta)
+        with self.lock:
+            index = self.segments.index(segment)
+            self.segments[index] = cold
+            self._cache.pop(segment.path, None)
+        segment.remove()
+
+    # ----------------- reads -----------------
+    def _read(self, segment: Segment) -> List[dict]:
+        logs = self._cache.get(segment.path)
+        if logs is None:
+            logs = self._cache[segment.path] = segment.read()
+            if len(self._cache) > self.cache_segments:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(segment.path)
+        return logs
+
+    def _segment_index(self, log_id: int) -> int:
+        """Index of the first segment whose last id is >= log_id."""
+        return bisect.bisect_left([segment.last_id for segment in self.segments], log_id)
+
+    def get(self, log_id: int) -> Optional[dict]:
+        with self.lock:
+            if log_id >= self.hot.first_id:
+                return self.hot.get(log_id)
+            index = self._segment_index(log_id)
+            if index == len(self.segments) or log_id < self.segments[index].first_id:
+                return None
+            segment = self.segments[index]
+            return self._read(segment)[log_id - segment.first_id]
+
+    def since(self, log_id: int, limit: Optional[int] = None) -> List[dict]:
+        with self.lock:
+            out: List[dict] = []
+            for segment in self.segments[self._segment_index(log_id + 1):]:
+                if limit is not None and len(out) >= limit:
+                    return out[:limit]
+                logs = self._read(segment)
+                out.extend(logs[max(0, log_id + 1 - segment.first_id):])
+            remaining = None if limit is None else max(0, limit - len(out))
+            if remaining == 0:
+                return out[:limit]
+            return out + self.hot.since(log_id, remaining)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        """Materialize rows by offset across all tiers, like slicing a list."""
+        with self.lock:
+            start, stop, _ = slice(start, stop).indices(len(self))
+            if stop <= start:
+                return []
+            first_id = self.first_id
+            return self.since(first_id + start - 1, stop - start)
+
+    def tail(self, count: int) -> List[dict]:
+        with self.lock:
+            out = self.hot.tail(count)
+            for segment in reversed(self.segments):
+                if len(out) >= count:
+                    break
+                out = self._read(segment)[-(count - len(out)):] + out
+            return out
+
+    def iter_rows(self, chunk_size: int = 1000) -> Iterator[dict]:
+        """Iterate every event oldest first, one segment or hot chunk at a time."""
+        last_id = self.first_id - 1
+        while True:
+            with self.lock:
+                index = self._segment_index(last_id + 1)
+                segment = self.segments[index] if index < len(self.segments) else None
+                if segment is None:
+                    chunk = self.hot.since(last_id, chunk_size)
+                    if not chunk:
+                        return
+            if segment is not None:
+                # Read without caching so a full scan does not evict hot reads
+                try:
+                    chunk = [log for log in segment.read() if log["id"] > last_id]
+                except FileNotFoundError:
+                    # Compressed or purged since it was looked up: look again
+                    continue
+            yield from chunk
+            last_id = chunk[-1]["id"] if chunk else segment.last_id
+
+    def page(
+        self,
+        limit: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        event: Optional[str] = None,
+        device_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Tuple[List[dict], bool]:
+        """See LogStore.page. Segments whose summary rules them out are never opened."""
+        filters = {"event": event, "device_id": device_id, "start": start, "end": end}
+        with self.lock:
+            lo = -1 if after is None else after
+            hi = self.last_id + 1 if before is None else before
+            segments = [
+                segment for segment in self.segments
+                if segment.last_id > lo and segment.first_id < hi and segment.may_match(**filters)
+            ]
+            if after is None:
+                # Newest first: the hot tier, then segments from the newest down
+                found, has_more = self.hot.page(limit, before=before, **filters)
+                found.reverse()
+                for segment in reversed(segments):
+                    if has_more:
+                        break
+                    for log in reversed(self._read(segment)):
+                        if lo < log["id"] < hi and log_matches(log, **filters):
+                            if len(found) == limit:
+                                has_more = True
+                                break
+                            found.append(log)
+                found.reverse()
+                return found, has_more
+
+            found = []
+            for segment in segments:
+                for log in self._read(segment):
+                    if lo < log["id"] < hi and log_matches(log, **filters):
+                        if len(found) == limit:
+                            return found, True
+                        found.append(log)
+            if len(found) == limit:
+                return found, bool(self.hot.page(1, before=before, after=after, **filters)[0])
+            rows, has_more = self.hot.page(limit - len(found), before=before, after=after, **filters)
+            return found + rows, has_more
+
+    def count(self, event: Optional[str] = None, device_id: Optional[str] = None) -> int:
+        with self.lock:
+            if event is None and device_id is None:
+                return len(self)
+            if device_id is None:
+                cold = self._segment_events.get(event, 0)
+            elif event is None:
+                cold = self._segment_devices.get(device_id, 0)
+            else:
+                cold = sum(
+                    1 for segment in self.segments if segment.may_match(event, device_id)
+                    for log in self._read(segment)
+                    if log["event"] == event and log.get("device_id") == device_id
+                )
+            return cold + self.hot.count(event, device_id)
+
+    def event_counts(self, after: Optional[int] = None) -> Dict[str, int]:
+        with self.lock:
+            if after is None or after < self.first_id:
+                return self._merge(self._segment_events, self.hot.event_counts())
+            counts: Dict[str, int] = {}
+            for segment in self.segments:
+                if after is not None and segment.last_id <= after:
+                    continue
+                if after is None or segment.first_id > after:
+                    segment_counts = segment.event_counts
+                else:
+                    segment_counts = Counter(log["event"] for log in self._read(segment) if log["id"] > after)
+                for event, count in segment_counts.items():
+                    counts[event] = counts.get(event, 0) + count
+            return self._merge(counts, self.hot.event_counts(after))
+
+    def device_counts(self, after: Optional[int] = None) -> Dict[str, int]:
+        with self.lock:
+            if after is None or after < self.first_id:
+                return self._merge(self._segment_devices, self.hot.device_counts())
+            counts: Dict[str, int] = {}
+            for segment in self.segments:
+                if segment.last_id <= after:
+                    continue
+                if segment.first_id > after:
+                    segment_counts = segment.device_counts
+                else:
+                    segment_counts = Counter(
+                        log["device_id"] for log in self._read(segment) if log["id"] > after and "device_id" in log
+                    )
+                for device, count in segment_counts.items():
+                    counts[device] = counts.get(device, 0) + count
+            return self._merge(counts, self.hot.device_counts(after))
+
+    @staticmethod
+    def _merge(counts: Dict[str, int], more: Dict[str, int]) -> Dict[str, int]:
+        merged = dict(counts)
+        for key, count in more.items():
+            merged[key] = merged.get(key, 0) + count
+        return merged
+
+    def stats(self) -> dict:
+        with self.lock:
+            warm = [segment for segment in self.segments if not segment.compressed]
+            cold = [segment for segment in self.segments if segment.compressed]
+            return {
+                "backend": "tiered",
+                "logs": len(self),
+                "hot": {
+                    "logs": len(self.hot),
+                    "max_logs": self.hot_events + self.evict_chunk,
+                    "column_bytes": self.hot.memory_usage(),
+                    "index_bytes": self.hot.index_usage(),
+                },
+                "warm": {"segments": len(warm), "logs": sum(s.count for s in warm), "bytes": sum(s.size for s in warm)},
+                "cold": {"segments": len(cold), "logs": sum(s.count for s in cold), "bytes": sum(s.size for s in cold)},
+            }
+
+    def close(self):
+        self._closed = True
+        self._evict_wanted.set()
@@ -0,0 +1,224 @@
+# rollups.py
+"""Per-event-type counts in minute, hour and day buckets, kept at ingest.
+
+Ingest only touches the minute table. Once an hour (or day) has closed on
+the wall clock, its counts are folded from the minutes (or hours) into the
+coarser table, so:
+
+    minutes -- every minute, kept for `minute_hours` and then dropped
+    hours   -- closed hours, folded from minutes; kept forever
+    days    -- closed days, folded from hours; kept forever
+
+Buckets not yet folded are summed from the finer table when read, and a late
+event for an already folded bucket updates every table that covers it, so
+each level always agrees with the ones below it. Buckets are aligned to the
+unix epoch (UTC).
+
+Which minutes are kept is decided by the server's clock, never by event
+timestamps, which come from devices: a device with a clock far in the
+future cannot make the rollups drop recent minutes.
+
+Everything here runs on the event loop, like the live hub.
+"""
+import heapq
+import json
+import math
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+
+def _floor(timestamp: float, size: int) -> int:
+    return int(timestamp // size) * size
+
+
+class Rollups:
+    def __init__(self, minute_hours: float = 48):
+        self.minute_hours = minute_hours
+        self.minutes: Dict[int, Counter] = {}
+        self.hours: Dict[int, Counter] = {}
+        self.days: Dict[int, Counter] = {}
+        # Hours before hours_upto (days before days_upto) have been folded
+        self.hours_upto: Optional[int] = None
+        self.days_upto: Optional[int] = None
+        self.clock: Optional[float] = None  # newest wall-clock time seen by add() or compact()
+        self._minute_order: List[int] = []  # heap of the keys of `minutes`, to expire the oldest first
+        self.upto = 0  # newest log id counted
+        self.version = 0
+
+    @property
+    def minutes_from(self) -> Optional[float]:
+        """Minute buckets from here on are complete; None before the first event."""
+        return None if self.hours_upto is None else self._minute_cutoff()
+
+    def add(self, logs: Iterable[dict], now: float):
+        self._tick(now)
+        added = False
+        for log in logs:
+            self._count(log["timestamp"], log["event"])
+            self.upto = log["id"]
+            added = True
+        if added:
+            self.version += 1
+            self.compact(now)
+
+    def _tick(self, now: float):
+        if self.clock is None or now > self.clock:
+            self.clock = now
+
+    def _count(self, timestamp: float, event: str):
+        if not math.isfinite(timestamp):
+            # Ingest rejects these; one stored before it did has no bucket
+            return
+        if self.hours_upto is None:
+            # Earlier hours and days count as folded: older events go straight into them
+            self.hours_upto = _floor(self.clock, HOUR)
+            self.days_upto = _floor(self.clock, DAY)
+        minute = _floor(timestamp, MINUTE)
+        if minute >= self._minute_cutoff():
+            counts = self.minutes.get(minute)
+            if counts is None:
+                counts = self.minutes[minute] = Counter()
+                heapq.heappush(self._minute_order, minute)
+            counts[event] += 1
+        if timestamp < self.hours_upto:
+            self.hours.setdefault(_floor(timestamp, HOUR), Counter())[event] += 1
+        if timestamp < self.days_upto:
+            self.days.setdefault(_floor(timestamp, DAY), Counter())[event] += 1
+
+    def _minute_cutoff(self) -> float:
+        # Minutes are only dropped once their hour has been folded
+        return min(self.hours_upto, _floor(self.clock, MINUTE) - self.minute_hours * HOUR)
+
+    def compact(self, now: float):
+        """Fold closed hours and days into the coarser tables and drop old minutes."""
+        if self.hours_upto is None:
+            return
+        self._tick(now)
+        now = self.clock
+        hour = _floor(now, HOUR)
+        if hour > self.hours_upto:
+            for minute, counts in self.minutes.items():
+                if self.hours_upto <= minute < hour:
+                    self.hours.setdefault(_floor(minute, HOUR), Counter()).update(counts)
+            self.hours_upto = hour
+        day = _floor(now, DAY)
+        if day > self.days_upto:
+            for start, counts in self.hours.items():
+                if self.days_upto <= start < day:
+                    self.days.setdefault(_floor(start, DAY), Counter()).update(counts)
+            self.days_upto = day
+        cutoff = self._minute_cutoff()
+        order = self._minute_order
+        while order and order[0] < cutoff:
+            del self.minutes[heapq.heappop(order)]
+
+    # ----------------- reads -----------------
+    def _minute(self, start: int) -> Counter:
+        return self.minutes.get(start) or Counter()
+
+    def _hour(self, start: int) -> Counter:
+        if self.hours_upto is not None and start < self.hours_upto:
+            return self.hours.get(start) or Counter()
+        counts = Counter()
+        for minute in range(start, start + HOUR, MINUTE):
+            counts.update(self._minute(minute))
+        return counts
+
+    def _day(self, start: int) -> Counter:
+        if self.days_upto is not None and start < self.days_upto:
+            return self.days.get(start) or Counter()
+        counts = Counter()
+        for hour in range(start, start + DAY, HOUR):
+            counts.update(self._hour(hour))
+        return counts
+
+    @staticmethod
+    def resolution(bucket: int) -> int:
+        """The coarsest table whose buckets divide `bucket` seconds."""
+        for size in (DAY, HOUR, MINUTE):
+            if bucket % size == 0:
+                return size
+        raise ValueError("bucket must be a whole number of minutes")
+
+    def series(self, start: float, end: float, bucket: int, events: Optional[List[str]] = None) -> List[dict]:
+        """Counts per event type for each `bucket`-second bucket overlapping [start, end).
+
+        Buckets are aligned to multiples of `bucket` since the epoch and are
+        returned oldest first, including empty ones.
+        """
+        size = self.resolution(bucket)
+        read = {DAY: self._day, HOUR: self._hour, MINUTE: self._minute}[size]
+        series = []
+        for bucket_start in range(_floor(start, bucket), int(end), bucket):
+            counts = Counter()
+            for part in range(bucket_start, bucket_start + bucket, size):
+                counts.update(read(part))
+            if events is not None:
+                counts = Counter({event: counts[event] for event in events if counts[event]})
+            series.append({"start": bucket_start, "counts": dict(counts), "total": sum(counts.values())})
+        return series
+
+    def stats(self) -> dict:
+        return {
+            "upto": self.upto,
+            "minutes": len(self.minutes),
+            "hours": len(self.hours),
+            "days": len(self.days),
+            "minutes_from": self.minutes_from,
+        }
+
+    # ----------------- persistence -----------------
+    def to_json(self) -> str:
+        tables = {
+            name: {str(start): counts for start, counts in table.items()}
+            for name, table in (("minutes", self.minutes), ("hours", self.hours), ("days", self.days))
+        }
+        return json.dumps({
+            "upto": self.upto, "hours_upto": self.hours_upto, "days_upto": self.days_upto, "clock": self.clock, **tables,
+        })
+
+    @classmethod
+    def from_json(cls, data: str, minute_hours: float = 48) -> "Rollups":
+        state = json.loads(data)
+        rollups = cls(minute_hours)
+        rollups.upto = state["upto"]
+        rollups.hours_upto = state["hours_upto"]
+        rollups.days_upto = state["days_upto"]
+        for name in ("minutes", "hours", "days"):
+            table = getattr(rollups, name)
+            for start, counts in state[name].items():
+                table[int(start)] = Counter(counts)
+        rollups._minute_order = sorted(rollups.minutes)  # a sorted list is a valid heap
+        # Snapshots from before the clock was saved: their newest bucket is close enough
+        rollups.clock = state.get("clock") or max(rollups.minutes, default=rollups.hours_upto)
+        return rollups
+
+
+def save(rollups_json: str, path: str):
+    """Write a snapshot atomically; serialize with Rollups.to_json on the loop first."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(rollups_json)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path: str, minute_hours: float = 48) -> Optional[Rollups]:
+    """The snapshot at `path`, or None if there is none or it is unreadable."""
+    try:
+        with open(path) as f:
+            return Rollups.from_json(f.read(), minute_hours)
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError) as e:
+        print(f"Could not load rollups from {path}: {e}")
+        return None
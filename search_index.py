@@ -0,0 +1,251 @@
+# search_index.py
+"""Local full-text search over events: an inverted index with BM25 ranking.
+
+An event's document is its event type, detail and device id, lower-cased
+and split on anything that is not a letter or digit (so `rfid_invalid`
+matches both "rfid" and "invalid"). IoT events repeat the same few texts,
+so the index is built over distinct documents ("shapes"), each holding the
+ids of the events that share it, much like the log store dictionary-encodes
+its detail column. Term postings list shapes; document frequencies and
+lengths are counted per event, so BM25 scores are what a per-event index
+would give. Phrases are checked against a shape's tokens, so no positional
+postings are needed.
+
+Query syntax: terms are ANDed; `OR`, `AND`, `NOT` (upper case), a leading
+`-`, parentheses and "quoted phrases" work as usual.
+"""
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+TOKEN = re.compile(r"[a-z0-9]+")
+QUERY_TOKEN = re.compile(r'"[^"]*"?|\(|\)|-(?=[^\s)])|[^\s()"]+')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+def document_tokens(event: str, detail: str, device_id: Optional[str]) -> Tuple[str, ...]:
+    return tuple(tokenize(event) + tokenize(detail) + (tokenize(device_id) if device_id else []))
+
+
+# ----------------- query parsing -----------------
+# A parsed query is a tree of tuples: ("terms", tokens) is a term or phrase
+# (one token is a plain term), ("and", [nodes]), ("or", [nodes]), ("not", node).
+
+def parse_query(query: str):
+    """Parse a query string, raising ValueError if it is malformed or empty."""
+    tokens = QUERY_TOKEN.findall(query)
+    node, position = _parse_or(tokens, 0)
+    if position < len(tokens):
+        raise ValueError(f"Unexpected {tokens[position]!r} in query")
+    if node is None:
+        raise ValueError("Query has no search terms")
+    return node
+
+
+def _parse_or(tokens: List[str], position: int):
+    nodes = []
+    while True:
+        node, position = _parse_and(tokens, position)
+        if node is not None:
+            nodes.append(node)
+        if position < len(tokens) and tokens[position] == "OR":
+            position += 1
+            continue
+        break
+    if not nodes:
+        return None, position
+    return (nodes[0] if len(nodes) == 1 else ("or", nodes)), position
+
+
+def _parse_and(tokens: List[str], position: int):
+    nodes = []
+    while position < len(tokens) and tokens[position] not in (")", "OR"):
+        if tokens[position] == "AND":
+            position += 1
+            continue
+        node, position = _parse_unary(tokens, position)
+        if node is not None:
+            nodes.append(node)
+    if not nodes:
+        return None, position
+    return (nodes[0] if len(nodes) == 1 else ("and", nodes)), position
+
+
+def _parse_unary(tokens: List[str], position: int):
+    token = tokens[position]
+    if token in ("NOT", "-"):
+        if position + 1 >= len(tokens):
+            raise ValueError(f"{token} needs something to negate")
+        node, position = _parse_unary(tokens, position + 1)
+        return (("not", node) if node is not None else None), position
+    if token == "(":
+        node, position = _parse_or(tokens, position + 1)
+        if position >= len(tokens) or tokens[position] != ")":
+            raise ValueError("Unbalanced parenthesis in query")
+        return node, position + 1
+    words = tokenize(token.strip('"'))
+    return (("terms", tuple(words)) if words else None), position + 1
+
+
+def _positive_terms(node) -> Iterator[str]:
+    """Terms that count towards the score (those not under a NOT)."""
+    kind = node[0]
+    if kind == "terms":
+        yield from node[1]
+    elif kind in ("and", "or"):
+        for child in node[1]:
+            yield from _positive_terms(child)
+
+
+# ----------------- index -----------------
+class SearchIndex:
+    """Inverted index over events, added to in id order.
+
+    Not thread-safe: callers serialize access (the backend holds the store
+    lock for every add, trim and search).
+    """
+
+    def __init__(self):
+        self.shape_codes: Dict[Tuple[str, str, Optional[str]], int] = {}
+        self.shape_keys: List[Optional[Tuple[str, str, Optional[str]]]] = []
+        self.shape_tokens: List[Optional[Tuple[str, ...]]] = []
+        self.shape_ids: List[array] = []  # ascending log ids per shape
+        self.postings: Dict[str, Set[int]] = {}  # term -> shapes containing it
+        self.doc_freq: Dict[str, int] = {}  # term -> events containing it
+        self.docs = 0
+        self.total_length = 0
+        self.upto = 0  # newest log id added
+
+    def __len__(self):
+        return self.docs
+
+    def add(self, logs: List[dict]):
+        for log in logs:
+            key = (log["event"], log["detail"], log.get("device_id"))
+            code = self.shape_codes.get(key)
+            if code is None:
+                code = self.shape_codes[key] = len(self.shape_tokens)
+                tokens = document_tokens(*key)
+                self.shape_keys.append(key)
+                self.shape_tokens.append(tokens)
+                self.shape_ids.append(array("q"))
+                for term in set(tokens):
+                    self.postings.setdefault(term, set()).add(code)
+            tokens = self.shape_tokens[code]
+            self.shape_ids[code].append(log["id"])
+            self._count(tokens, 1)
+            self.upto = log["id"]
+
+    def _count(self, tokens: Tuple[str, ...], events: int):
+        self.docs += events
+        self.total_length += events * len(tokens)
+        for term in set(tokens):
+            self.doc_freq[term] = self.doc_freq.get(term, 0) + events
+
+    def trim(self, first_id: int):
+        """Forget events with an id below first_id (e.g. purged by retention)."""
+        for code, ids in enumerate(self.shape_ids):
+            if not ids or ids[0] >= first_id:
+                continue
+            cut = bisect_left(ids, first_id)
+            del ids[:cut]
+            tokens = self.shape_tokens[code]
+            self._count(tokens, -cut)
+            if not ids:
+                self._drop_shape(code)
+
+    def _drop_shape(self, code: int):
+        tokens = self.shape_tokens[code]
+        for term in set(tokens):
+            shapes = self.postings[term]
+            shapes.discard(code)
+            if not shapes:
+                del self.postings[term]
+                del self.doc_freq[term]
+        del self.shape_codes[self.shape_keys[code]]
+        self.shape_keys[code] = self.shape_tokens[code] = None
+
+    # ----------------- queries -----------------
+    def _match(self, node) -> Set[int]:
+        kind = node[0]
+        if kind == "terms":
+            terms = node[1]
+            shapes = [self.postings.get(term, set()) for term in set(terms)]
+            found = set.intersection(*sorted(shapes, key=len))
+            if len(terms) > 1:
+                found = {code for code in found if _contains(self.shape_tokens[code], terms)}
+            return found
+        if kind == "and":
+            positive = [self._match(child) for child in node[1] if child[0] != "not"]
+            negative = [self._match(child[1]) for child in node[1] if child[0] == "not"]
+            found = set.intersection(*sorted(positive, key=len)) if positive else self._all_shapes()
+            for excluded in negative:
+                found -= excluded
+            return found
+        if kind == "or":
+            return set().union(*(self._match(child) for child in node[1]))
+        return self._all_shapes() - self._match(node[1])
+
+    def _all_shapes(self) -> Set[int]:
+        return {code for code, tokens in enumerate(self.shape_tokens) if tokens is not None}
+
+    def _score(self, tokens: Tuple[str, ...], terms: Set[str]) -> float:
+        average = self.total_length / self.docs if self.docs else 1.0
+        norm = K1 * (1 - B + B * len(tokens) / average)
+        score = 0.0
+        for term in terms:
+            tf = tokens.count(term)
+            if tf:
+                df = self.doc_freq[term]
+                idf = math.log(1 + (self.docs - df + 0.5) / (df + 0.5))
+                score += idf * tf * (K1 + 1) / (tf + norm)
+        return score
+
+    def search(self, query, limit: int = 20, offset: int = 0) -> Tuple[List[Tuple[int, float]], int]:
+        """Return ([(log_id, score)], total matches) for a query string or parsed tree.
+
+        Events are ranked by BM25 score, newest first among equal scores.
+        """
+        node = parse_query(query) if isinstance(query, str) else query
+        shapes = [code for code in self._match(node) if self.shape_ids[code]]
+        total = sum(len(self.shape_ids[code]) for code in shapes)
+        terms = set(_positive_terms(node))
+        scored: Dict[float, List[int]] = {}
+        for code in shapes:
+            scored.setdefault(round(self._score(self.shape_tokens[code], terms), 9), []).append(code)
+
+        wanted = offset + limit
+        results: List[Tuple[int, float]] = []
+        for score in sorted(scored, reverse=True):
+            # Every event of a shape has the same score: merge them newest first
+            newest = heapq.merge(*(reversed(self.shape_ids[code]) for code in scored[score]), reverse=True)
+            for log_id in newest:
+                if len(results) >= wanted:
+                    break
+                results.append((log_id, score))
+            if len(results) >= wanted:
+                break
+        return results[offset:], total
+
+    def stats(self) -> dict:
+        return {
+            "events": self.docs,
+            "upto": self.upto,
+            "documents": len(self.shape_codes),
+            "terms": len(self.postings),
+        }
+
+
+def _contains(tokens: Tuple[str, ...], phrase: Tuple[str, ...]) -> bool:
+    size = len(phrase)
+    return any(tokens[i:i + size] == phrase for i in range(len(tokens) - size + 1))
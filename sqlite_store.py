@@ -0,0 +1,224 @@
+# sqlite_store.py
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    event TEXT NOT NULL,
+    detail TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    device_id TEXT,
+    seq INTEGER
+);
+-- An index on one column is ordered by rowid (the id) within each value, so
+-- "WHERE event = ? ORDER BY id DESC LIMIT ?" walks it newest first and stops
+-- after LIMIT rows, without sorting every match in a temporary B-tree
+CREATE INDEX IF NOT EXISTS logs_event ON logs (event);
+CREATE INDEX IF NOT EXISTS logs_device ON logs (device_id);
+-- Superseded: they made pages sort every match
+DROP INDEX IF EXISTS logs_event_timestamp;
+DROP INDEX IF EXISTS logs_device_timestamp;
+DROP INDEX IF EXISTS logs_timestamp;
+"""
+
+# Statements are constant strings so sqlite3's statement cache keeps them
+# compiled; only the bound parameters change between calls.
+INSERT = "INSERT INTO logs (id, event, detail, timestamp, device_id, seq) VALUES (?, ?, ?, ?, ?, ?)"
+SELECT_COLUMNS = "SELECT id, event, detail, timestamp, device_id, seq FROM logs"
+SELECT_BY_ID = SELECT_COLUMNS + " WHERE id = ?"
+SELECT_SINCE = SELECT_COLUMNS + " WHERE id > ? ORDER BY id LIMIT ?"
+COUNT_BY_EVENT = "SELECT event, COUNT(*) FROM logs GROUP BY event ORDER BY MIN(id)"
+COUNT_BY_EVENT_AFTER = "SELECT event, COUNT(*) FROM logs WHERE id > ? GROUP BY event ORDER BY MIN(id)"
+COUNT_BY_DEVICE = "SELECT device_id, COUNT(*) FROM logs WHERE device_id IS NOT NULL GROUP BY device_id ORDER BY MIN(id)"
+COUNT_BY_DEVICE_AFTER = (
+    "SELECT device_id, COUNT(*) FROM logs WHERE device_id IS NOT NULL AND id > ? GROUP BY device_id ORDER BY MIN(id)"
+)
+
+
+def row_to_log(row) -> dict:
+    log = {"id": row[0], "event": row[1], "detail": row[2], "timestamp": row[3]}
+    if row[4] is not None:
+        log["device_id"] = row[4]
+    if row[5] is not None:
+        log["seq"] = row[5]
+    return log
+
+
+class SQLiteLogStore:
+    """Log store backed by a SQLite database in WAL mode.
+
+    Offers the same interface as LogStore, but filters run as SQL against
+    the event and device_id indexes instead of scanning Python objects, and whole-table counts per event type and per
+    device are kept in memory. Each append is one transaction.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.lock = threading.RLock()
+        self.version = 0
+        self.db = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # Kept in memory so len(), last_id and the per-type and per-device
+        # counts never need a table scan; the counts are read once here and
+        # then updated by every write
+        first, last, count = self.db.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM logs").fetchone()
+        self.first_id = first or 1
+        self._last_id = last or 0
+        self._count = count
+        self._event_counts: Dict[str, int] = dict(self.db.execute(COUNT_BY_EVENT).fetchall())
+        self._device_counts: Dict[str, int] = dict(self.db.execute(COUNT_BY_DEVICE).fetchall())
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def check(self, records: List[dict]):
+        """Nothing valid is refused by the database, so there is nothing to check."""
+
+    def append(self, records: List[dict], now: float) -> List[dict]:
+        with self.lock:
+            stored = []
+            for i, record in enumerate(records):
+                log = {
+                    "id": self._last_id + 1 + i,
+                    "event": record["event"],
+                    "detail": record["detail"],
+                    "timestamp": record.get("timestamp") or now,
+                }
+                if record.get("device_id") is not None:
+                    log["device_id"] = record["device_id"]
+                if record.get("seq") is not None:
+                    log["seq"] = record["seq"]
+                stored.append(log)
+            self.load(stored)
+            return stored
+
+    def load(self, logs: List[dict]):
+        if not logs:
+            return
+        with self.lock, self.db:
+            self.db.executemany(INSERT, [
+                (log["id"], log["event"], log["detail"], log["timestamp"], log.get("device_id"), log.get("seq"))
+                for log in logs
+            ])
+            if not self._count:
+                self.first_id = logs[0]["id"]
+            self._last_id = logs[-1]["id"]
+            self._count += len(logs)
+            for log in logs:
+                self._event_counts[log["event"]] = self._event_counts.get(log["event"], 0) + 1
+                device = log.get("device_id")
+                if device is not None:
+                    self._device_counts[device] = self._device_counts.get(device, 0) + 1
+            self.version += 1
+
+    def get(self, log_id: int) -> Optional[dict]:
+        with self.lock:
+            row = self.db.execute(SELECT_BY_ID, (log_id,)).fetchone()
+            return row_to_log(row) if row else None
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[dict]:
+        with self.lock:
+            start, stop, _ = slice(start, stop).indices(self._count)
+            if stop <= start:
+                return []
+            cursor = self.db.execute(SELECT_COLUMNS + " ORDER BY id LIMIT ? OFFSET ?", (stop - start, start))
+            return [row_to_log(row) for row in cursor]
+
+    def since(self, log_id: int, limit: Optional[int] = None) -> List[dict]:
+        with self.lock:
+            cursor = self.db.execute(SELECT_SINCE, (log_id, -1 if limit is None else limit))
+            return [row_to_log(row) for row in cursor]
+
+    def tail(self, count: int) -> List[dict]:
+        with self.lock:
+            cursor = self.db.execute(SELECT_COLUMNS + " ORDER BY id DESC LIMIT ?", (count,))
+            return [row_to_log(row) for row in reversed(cursor.fetchall())]
+
+    def iter_rows(self, chunk_size: int = 1000) -> Iterator[dict]:
+        last_id = 0
+        while True:
+            chunk = self.since(last_id, chunk_size)
+            if not chunk:
+                return
+            yield from chunk
+            last_id = chunk[-1]["id"]
+
+    def page(
+        self,
+        limit: int,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        event: Optional[str] = None,
+        device_id: Optional[str] = None,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Tuple[List[dict], bool]:
+        """See LogStore.page; one indexed query reading at most limit + 1 rows."""
+        clauses, params = self._filters(event, device_id)
+        extra = []
+        for clause, value in (("id < ?", before), ("id > ?", after), ("timestamp >= ?", start), ("timestamp < ?", end)):
+            if value is not None:
+                extra.append(clause)
+                params.append(value)
+        if extra:
+            clauses += (" AND " if clauses else " WHERE ") + " AND ".join(extra)
+        order = "ASC" if after is not None else "DESC"
+        with self.lock:
+            cursor = self.db.execute(f"{SELECT_COLUMNS}{clauses} ORDER BY id {order} LIMIT ?", (*params, limit + 1))
+            logs = [row_to_log(row) for row in cursor]
+        has_more = len(logs) > limit
+        logs = logs[:limit]
+        if after is None:
+            logs.reverse()
+        return logs, has_more
+
+    def count(self, event: Optional[str] = None, device_id: Optional[str] = None) -> int:
+        if device_id is None:
+            return self._count if event is None else self._event_counts.get(event, 0)
+        if event is None:
+            return self._device_counts.get(device_id, 0)
+        clauses, params = self._filters(event, device_id)
+        with self.lock:
+            return self.db.execute(f"SELECT COUNT(*) FROM logs{clauses}", params).fetchone()[0]
+
+    def event_counts(self, after: Optional[int] = None) -> Dict[str, int]:
+        with self.lock:
+            if after is None or after < self.first_id:
+                return dict(self._event_counts)
+            return dict(self.db.execute(COUNT_BY_EVENT_AFTER, (after,)).fetchall())
+
+    def device_counts(self, after: Optional[int] = None) -> Dict[str, int]:
+        with self.lock:
+            if after is None or after < self.first_id:
+                return dict(self._device_counts)
+            return dict(self.db.execute(COUNT_BY_DEVICE_AFTER, (after,)).fetchall())
+
+    @staticmethod
+    def _filters(event: Optional[str], device_id: Optional[str]):
+        clauses, params = [], []
+        if event is not None:
+            clauses.append("event = ?")
+            params.append(event)
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "path": self.path, "logs": self._count}
+
+    def close(self):
+        with self.lock:
+            self.db.close()
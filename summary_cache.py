@@ -0,0 +1,106 @@
+# summary_cache.py
+"""Cache of the AI summary, keyed on the log store's version counter.
+
+Every dashboard polls /api/summary, but the summary only needs an LLM call
+when the logs have changed. A cached summary is served as is while
+
+  - the store version it was generated for is still current, or
+  - it is younger than `stale_seconds` (tolerated lag behind new logs),
+
+and, if `refresh_seconds` is set, it is regenerated once it is that old
+even when nothing changed. When a summary has to be regenerated, the old
+one keeps being served while a single background generation runs
+(stale-while-revalidate); only the very first request waits. Concurrent
+requests never start a second generation, and a failed one is not retried
+for `stale_seconds` (at least `RETRY_SECONDS`).
+
+Everything here runs on the event loop.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+RETRY_SECONDS = 5.0
+
+
+class CachedSummary:
+    __slots__ = ("text", "version", "generated_at", "serial")
+
+    def __init__(self, text: str, version: int, generated_at: float, serial: int):
+        self.text = text
+        self.version = version  # store version the summary was generated for
+        self.generated_at = generated_at
+        self.serial = serial  # distinguishes entries, e.g. in ETags
+
+
+class SummaryCache:
+    def __init__(self, stale_seconds: float = 30, refresh_seconds: float = 0):
+        self.stale_seconds = stale_seconds
+        self.refresh_seconds = refresh_seconds
+        self.entry: Optional[CachedSummary] = None
+        self._task: Optional["asyncio.Task[Optional[CachedSummary]]"] = None
+        self._error: Optional[Exception] = None
+        self._failed_at: Optional[float] = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.generations = 0
+        self.failures = 0
+
+    def _current(self, entry: CachedSummary, version: int, now: float) -> bool:
+        age = now - entry.generated_at
+        if self.refresh_seconds > 0 and age >= self.refresh_seconds:
+            return False
+        return entry.version == version or age < self.stale_seconds
+
+    def _backing_off(self, now: float) -> bool:
+        return self._failed_at is not None and now - self._failed_at < max(self.stale_seconds, RETRY_SECONDS)
+
+    async def get(self, version: int, generate: Callable[[], Awaitable[str]]) -> CachedSummary:
+        """The summary to serve for `version`, generating one only when needed.
+
+        Raises the generation error if there is no summary to fall back on.
+        """
+        now = time.time()
+        entry = self.entry
+        if entry is not None and self._current(entry, version, now):
+            self.hits += 1
+            return entry
+        if not self._backing_off(now) and self._task is None:
+            self._task = asyncio.create_task(self._generate(version, generate, now))
+        if entry is not None:
+            self.stale_hits += 1
+            return entry
+        if self._task is None:
+            raise self._error
+        # Shielded so a client hanging up does not cancel the shared generation
+        result = await asyncio.shield(self._task)
+        if result is None:
+            raise self._error
+        return result
+
+    async def _generate(self, version: int, generate: Callable[[], Awaitable[str]], started: float) -> Optional[CachedSummary]:
+        try:
+            text = await generate()
+        except Exception as e:
+            # Kept rather than raised, so a background refresh never leaves an unretrieved exception
+            print(f"Error generating AI summary: {e}")
+            self.failures += 1
+            self._error, self._failed_at = e, time.time()
+            return None
+        finally:
+            self._task = None
+        self.generations += 1
+        self._error = self._failed_at = None
+        self.entry = CachedSummary(text, version, started, self.generations)
+        return self.entry
+
+    def stats(self) -> dict:
+        return {
+            "cached_version": self.entry.version if self.entry is not None else None,
+            "generated_at": self.entry.generated_at if self.entry is not None else None,
+            "generating": self._task is not None,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "generations": self.generations,
+            "failures": self.failures,
+        }
@@ -0,0 +1,106 @@
+# tests/conftest.py
+import asyncio
+import os
+import sys
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+# The backend's modules live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read when backend is imported: no write-ahead log, retention, rollup
+# snapshots or Gemini, so importing it has no side effects
+os.environ.setdefault("WAL_DIR", "")
+os.environ.setdefault("RETENTION_HOT_EVENTS", "0")
+os.environ.setdefault("ROLLUP_PATH", "")
+os.environ.setdefault("VECTOR_INDEX_DIR", "")
+os.environ.setdefault("AI_ENABLED", "0")
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic stand-in for the Gemini embedder that records every call."""
+
+    namespace = "fake"
+
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+        self.fail = 0  # calls left to fail
+
+    @staticmethod
+    def vector(text):
+        # Bag of words hashed into a few dimensions, so similar texts are close
+        vector = [0.0] * 8
+        for word in text.lower().replace(":", " ").split():
+            vector[sum(map(ord, word)) % 8] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("embedding service unavailable")
+        self.documents.append(list(texts))
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self.vector(text)
+
+
+@pytest.fixture
+def app_state(monkeypatch):
+    """The backend module with fresh in-memory state; no startup tasks run."""
+    import backend
+    from dedup import DeviceDeduplicator
+    from live import LiveHub
+    from log_store import LogStore
+    from ratelimit import RateLimiter
+    from rollups import Rollups
+    from search_index import SearchIndex
+    from summary_cache import SummaryCache
+
+    monkeypatch.setattr(backend, "store", LogStore())
+    monkeypatch.setattr(backend, "wal", None)
+    monkeypatch.setattr(backend, "deduplicator", DeviceDeduplicator())
+    monkeypatch.setattr(backend, "rate_limiter", RateLimiter(0, 0, 0, 0))
+    monkeypatch.setattr(backend, "live_hub", LiveHub(
+        read_since=lambda log_id, limit: backend.store.since(log_id, limit),
+        latest_id=lambda: backend.store.last_id,
+    ))
+    monkeypatch.setattr(backend, "event_rollups", Rollups())
+    monkeypatch.setattr(backend, "search_index", SearchIndex())
+    monkeypatch.setattr(backend, "search_ready", True)
+    monkeypatch.setattr(backend, "summary_cache", SummaryCache())
+    # AI state, as before the models have loaded
+    monkeypatch.setattr(backend, "llm", None)
+    monkeypatch.setattr(backend, "embeddings", None)
+    monkeypatch.setattr(backend, "vector_store", None)
+    monkeypatch.setattr(backend, "indexed_upto", 0)
+    monkeypatch.setattr(backend, "repair_ids", [])
+    monkeypatch.setattr(backend, "index_changes", 0)
+    monkeypatch.setattr(backend, "snapshot_changes", 0)
+    monkeypatch.setattr(backend, "ai_status", "disabled")
+    monkeypatch.setattr(backend, "ai_load_seconds", None)
+    monkeypatch.setattr(backend, "embedding_task", None)
+    monkeypatch.setattr(backend, "snapshot_task", None)
+    # asyncio primitives bind to the first event loop that waits on them
+    monkeypatch.setattr(backend, "embed_queue", asyncio.Queue(maxsize=backend.EMBED_QUEUE_SIZE))
+    monkeypatch.setattr(backend, "embed_backfill", asyncio.Event())
+    monkeypatch.setattr(backend, "index_lock", asyncio.Lock())
+    monkeypatch.setattr(backend, "ai_semaphore", asyncio.Semaphore(backend.AI_MAX_CONCURRENCY))
+    return backend
+
+
+@pytest.fixture
+def client(app_state):
+    from fastapi.testclient import TestClient
+    return TestClient(app_state.app)
+
+
+@pytest.fixture
+def fake_embeddings(app_state, monkeypatch):
+    """Embeddings loaded, as after warm-up, with a fake model."""
+    embedder = FakeEmbeddings()
+    monkeypatch.setattr(app_state, "embeddings", embedder)
+    return embedder
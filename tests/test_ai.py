@@ -0,0 +1,137 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+
+T0 = 1_700_000_000.0
+
+
+class RecordingChat:
+    """Chat model stand-in that records prompts and how many calls overlap."""
+
+    def __init__(self, delay=0.0):
+        self.prompts = []
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return AIMessage(content=f"answer {len(self.prompts)}")
+
+
+def store_logs(backend, count=3):
+    return backend.store.append(
+        [{"event": "door_unlocked", "detail": f"card {i}", "timestamp": T0} for i in range(count)], T0
+    )
+
+
+def test_ask_awaits_the_model_without_a_vector_index(client, app_state, monkeypatch):
+    chat = RecordingChat()
+    monkeypatch.setattr(app_state, "llm", chat)
+    store_logs(app_state)
+    response = client.get("/api/ask", params={"question": "Who opened the door?"}).json()
+    assert response["answer"] == "answer 1"
+    assert "- door_unlocked: card 2" in chat.prompts[0] and "Who opened the door?" in chat.prompts[0]
+
+
+def test_ai_calls_share_the_concurrency_limit(app_state, monkeypatch):
+    chat = RecordingChat(delay=0.02)
+    monkeypatch.setattr(app_state, "llm", chat)
+    store_logs(app_state)
+
+    async def scenario():
+        monkeypatch.setattr(app_state, "ai_semaphore", asyncio.Semaphore(2))
+        return await asyncio.gather(
+            *(app_state.ask_ai(f"question {i}") for i in range(4)),
+            *(app_state.generate_summary() for _ in range(2)),
+        )
+
+    results = asyncio.run(scenario())
+    assert len(chat.prompts) == 6 and chat.max_in_flight == 2
+    assert all(result["answer"].startswith("answer") for result in results[:4])
+
+
+def test_ask_answers_from_the_vector_index(client, app_state, fake_embeddings, monkeypatch):
+    asyncio.run(app_state.index_logs(store_logs(app_state)))
+    monkeypatch.setattr(app_state, "indexed_upto", 3)
+    monkeypatch.setattr(app_state, "llm", FakeListChatModel(responses=["The door was unlocked 3 times."]))
+    response = client.get("/api/ask", params={"question": "How often was the door unlocked?"}).json()
+    assert response == {
+        "answer": "The door was unlocked 3 times.",
+        "index": {"indexed_upto": 3, "latest_log_id": 3, "pending": 0},
+    }
+    assert fake_embeddings.queries == ["How often was the door unlocked?"]
+
+
+def test_summary_is_generated_by_the_model(client, app_state, monkeypatch):
+    chat = RecordingChat()
+    monkeypatch.setattr(app_state, "llm", chat)
+    store_logs(app_state)
+    response = client.get("/api/summary").json()
+    assert response["summary"] == "answer 1" and response["stale"] is False
+    assert chat.prompts[0].startswith("Please provide a concise summary")
+
+
+def test_prompts_hold_only_the_newest_logs(client, app_state, monkeypatch):
+    chat = RecordingChat()
+    monkeypatch.setattr(app_state, "llm", chat)
+    monkeypatch.setattr(app_state, "AI_CONTEXT_EVENTS", 2)
+    store_logs(app_state, count=5)
+    client.get("/api/ask", params={"question": "What happened?"})
+    client.get("/api/summary")
+    for prompt in chat.prompts:
+        assert "(the latest 2 of 5 events)" in prompt
+        assert "card 3" in prompt and "card 4" in prompt and "card 2" not in prompt
+
+
+def test_health_reports_ai_loading_while_ingest_is_ready(client, app_state, monkeypatch):
+    monkeypatch.setattr(app_state, "ai_status", "loading")
+    assert client.post("/api/logs", json={"event": "door_unlocked", "detail": "card 7"}).status_code == 200
+    health = client.get("/api/health").json()
+    assert health["ready"] == {"ingest": True, "ai": False}
+    assert health["ai"] == {"status": "loading", "load_seconds": None}
+    # Endpoints answer on their non-AI path meanwhile
+    assert "door_unlocked: 1" in client.get("/api/summary").json()["summary"]
+
+
+def test_warm_up_loads_the_models_and_backfills_the_index(client, app_state, monkeypatch):
+    from conftest import FakeEmbeddings
+    embedder = FakeEmbeddings()
+    chat = FakeListChatModel(responses=["ok"])
+    monkeypatch.setattr(app_state, "load_ai_models", lambda: (chat, embedder))
+    monkeypatch.setattr(app_state, "EMBED_BATCH_WAIT", 0.01)
+    store_logs(app_state)  # ingested before the models were ready
+
+    async def scenario():
+        await app_state.warm_up_ai()
+        try:
+            for _ in range(500):
+                if app_state.indexed_upto == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            app_state.embedding_task.cancel()
+
+    asyncio.run(scenario())
+    assert app_state.llm is chat and app_state.embeddings is embedder
+    assert app_state.indexed_upto == 3
+    health = client.get("/api/health").json()
+    assert health["ready"]["ai"] is True and health["ai"]["load_seconds"] >= 0
+
+
+def test_warm_up_failure_leaves_the_non_ai_paths(client, app_state, monkeypatch):
+    def unavailable():
+        raise ImportError("langchain_google_genai")
+
+    monkeypatch.setattr(app_state, "load_ai_models", unavailable)
+    asyncio.run(app_state.warm_up_ai())
+    assert app_state.llm is None and client.get("/api/health").json()["ai"]["status"] == "unavailable"
+    store_logs(app_state)
+    assert "door has been unlocked 3 times" in client.get("/api/ask", params={"question": "door unlocked?"}).json()["answer"]
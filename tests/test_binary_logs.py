@@ -0,0 +1,63 @@
+import struct
+
+import pytest
+
+import binary_logs
+from binary_logs import decode_records, encode_records
+
+
+def test_round_trip_version_1():
+    records = [
+        {"event": "door_unlocked", "detail": "RFID authorized", "timestamp": 1700000000},
+        {"event": "custom_event", "detail": "inline name", "timestamp": None},
+    ]
+    decoded = decode_records(encode_records(records))
+    assert [(r["event"], r["detail"], r["timestamp"], r["device_id"], r["seq"]) for r in decoded] == [
+        ("door_unlocked", "RFID authorized", 1700000000.0, None, None),
+        ("custom_event", "inline name", None, None, None),
+    ]
+
+
+def test_round_trip_version_2_carries_device_and_seq():
+    records = [{"event": "motion_alert", "detail": "hall", "seq": seq} for seq in (41, 42)]
+    decoded = decode_records(encode_records(records, device_id="esp32-1"))
+    assert [(r["device_id"], r["seq"]) for r in decoded] == [("esp32-1", 41), ("esp32-1", 42)]
+    # Repeated strings are decoded once and shared
+    assert decoded[0]["detail"] is decoded[1]["detail"]
+
+
+def test_encode_rejects_fields_longer_than_a_byte_length():
+    with pytest.raises(ValueError, match="detail"):
+        encode_records([{"event": "door_locked", "detail": "x" * 256}])
+    with pytest.raises(ValueError, match="event name"):
+        encode_records([{"event": "e" * 256, "detail": ""}])
+    with pytest.raises(ValueError, match="device id"):
+        encode_records([], device_id="d" * 256)
+
+
+def header(version=binary_logs.VERSION, count=1, magic=binary_logs.MAGIC):
+    return struct.pack("<2sBH", magic, version, count)
+
+
+@pytest.mark.parametrize("body, message", [
+    (b"VL", "shorter than header"),
+    (header(magic=b"XX"), "bad magic"),
+    (header(version=9), "unsupported version"),
+    (header(count=1), "truncated record"),
+    (header() + struct.pack("<BIB", 1, 0, 5) + b"ab", "truncated record"),
+    (header() + struct.pack("<BIB", 0, 0, 0) + b"\x05ab", "truncated record"),
+    (header() + struct.pack("<BIB", 200, 0, 0), "unknown event code"),
+    (header() + struct.pack("<BIB", 1, 0, 2) + b"\xff\xfe", "invalid UTF-8"),
+    (header() + struct.pack("<BIB", 1, 0, 0) + b"extra", "trailing bytes"),
+    (header(version=binary_logs.VERSION_SEQ, count=0) + b"\x05ab", "truncated header"),
+])
+def test_decode_errors(body, message):
+    with pytest.raises(ValueError, match=message):
+        decode_records(body)
+
+
+def test_decode_enforces_max_records():
+    body = encode_records([{"event": "door_locked", "detail": ""}] * 3)
+    assert len(decode_records(body, max_records=3)) == 3
+    with pytest.raises(ValueError, match="too many records"):
+        decode_records(body, max_records=2)
@@ -0,0 +1,55 @@
+import random
+
+from dedup import DeviceDeduplicator, ReplayWindow
+
+
+def test_replay_window_accepts_each_seq_once():
+    window = ReplayWindow(10)
+    assert [window.accept(seq, 8) for seq in (10, 12, 11, 11, 12, 5, 5)] == [False, True, True, False, False, True, False]
+
+
+def test_replay_window_restarts_when_seq_falls_far_behind():
+    window = ReplayWindow(1000)
+    assert window.accept(3, 64)  # device rebooted and restarted its counter
+    assert (window.high, window.mask) == (3, 1)
+    assert not window.accept(3, 64)
+    assert window.accept(4, 64)
+
+
+def test_accept_evicts_the_least_recently_seen_device():
+    dedup = DeviceDeduplicator(window=8, max_devices=2)
+    assert dedup.accept("a", 1) and dedup.accept("b", 1)
+    assert not dedup.accept("a", 1)  # a is now the most recent
+    assert dedup.accept("c", 1)
+    assert list(dedup.devices) == ["a", "c"]
+    assert dedup.accept("b", 1)  # forgotten, so accepted again
+    assert dedup.duplicates == 1
+
+
+def records(*pairs):
+    return [{"device_id": device_id, "seq": seq} for device_id, seq in pairs]
+
+
+def test_filter_does_not_record_anything():
+    dedup = DeviceDeduplicator()
+    dedup.accept("a", 5)
+    batch = records(("a", 5), ("a", 6), ("a", 6), ("b", 1), ("b", 1), (None, 1), ("c", None), ("c", None))
+    assert dedup.filter(batch) == [batch[1], batch[3], batch[5], batch[6], batch[7]]
+    assert list(dedup.devices) == ["a"] and dedup.devices["a"].high == 5
+    assert dedup.duplicates == 0
+    # Filtering again gives the same answer
+    assert dedup.filter(batch) == [batch[1], batch[3], batch[5], batch[6], batch[7]]
+
+
+def test_filter_then_commit_is_equivalent_to_accept():
+    rng = random.Random(1)
+    accepting, committing = DeviceDeduplicator(window=16), DeviceDeduplicator(window=16)
+    for _ in range(300):
+        batch = records(*[(rng.choice("abcdefg"), rng.randint(0, 40)) for _ in range(rng.randint(1, 8))])
+        expected = [record for record in batch if accepting.accept(record["device_id"], record["seq"])]
+        fresh = committing.filter(batch)
+        committing.commit(fresh, len(batch) - len(fresh))
+        assert fresh == expected
+    assert committing.duplicates == accepting.duplicates
+    assert list(committing.devices) == list(accepting.devices)
+    assert committing.stats() == accepting.stats()
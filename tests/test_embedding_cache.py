@@ -0,0 +1,70 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings, normalize_text
+
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic fake model that records every text it is asked to embed."""
+
+    def __init__(self):
+        self.documents = []
+        self.queries = []
+
+    @staticmethod
+    def _vector(text):
+        return [float(len(text)), float(sum(map(ord, text)) % 97), 0.5]
+
+    def embed_documents(self, texts):
+        self.documents.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return self._vector(text)
+
+
+def test_normalize_text():
+    assert normalize_text("  Door\tUNLOCKED \n now ") == "door unlocked now"
+
+
+def test_each_distinct_text_is_embedded_once():
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model)
+    vectors = cache.embed_documents(["door unlocked", "Door  Unlocked", "motion alert", "door unlocked"])
+    assert model.documents == [["door unlocked", "motion alert"]]
+    assert vectors[0] == vectors[1] == vectors[3] != vectors[2]
+    assert cache.embed_documents(["motion alert", "rfid invalid"])[0] == vectors[2]
+    assert model.documents[-1] == ["rfid invalid"]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_queries_are_cached_apart_from_documents():
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model)
+    cache.embed_documents(["door unlocked"])
+    cache.embed_query("door unlocked")
+    cache.embed_query("DOOR unlocked")
+    assert model.queries == ["door unlocked"]
+    assert asyncio.run(cache.aembed_query("door unlocked")) == model._vector("door unlocked")
+    assert asyncio.run(cache.aembed_documents(["door unlocked", "new"])) == [model._vector("door unlocked"), model._vector("new")]
+    assert model.queries == ["door unlocked"]
+
+
+def test_lru_is_bounded_and_disk_survives_restarts(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, max_entries=2, path=path, namespace="model-a")
+    cache.embed_documents(["a", "b", "c"])
+    assert cache.stats()["entries"] == 2
+    assert cache.embed_documents(["a"]) == [model._vector("a")]  # evicted from memory, read from disk
+    assert cache.disk_hits == 1
+
+    restarted = CachedEmbeddings(model, path=path, namespace="model-a")
+    assert restarted.embed_documents(["b", "c"]) == [model._vector("b"), model._vector("c")]
+    assert restarted.disk_hits == 2 and len(model.documents) == 1
+
+    # Another model's vectors are never reused
+    CachedEmbeddings(model, path=path, namespace="model-b").embed_documents(["a"])
+    assert model.documents[-1] == ["a"]
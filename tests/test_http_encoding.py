@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import pytest
+
+import http_encoding
+from http_encoding import compress_stream, dumps, encode_body, negotiate
+
+
+@pytest.fixture(params=["with brotli", "without brotli"])
+def codecs(request, monkeypatch):
+    if request.param == "without brotli":
+        monkeypatch.setattr(http_encoding, "brotli", None)
+    elif http_encoding.brotli is None:
+        pytest.skip("brotli is not installed")
+    return http_encoding.supported_encodings()
+
+
+def test_negotiate_prefers_brotli_on_a_tie(codecs):
+    assert negotiate("gzip, deflate, br") == codecs[0]
+    assert negotiate("*") == codecs[0]
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("deflate", None),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("gzip;q=0, *", "br"),
+    ("gzip;q=0", None),
+    ("GZIP ; q=1", "gzip"),
+    ("gzip;q=oops", None),
+])
+def test_negotiate_honours_q_values(header, expected, monkeypatch):
+    if http_encoding.brotli is None:
+        pytest.skip("brotli is not installed")
+    assert negotiate(header) == expected
+
+
+def test_dumps_without_orjson_matches(monkeypatch):
+    payload = {"logs": [{"id": 1, "detail": "café"}], "has_more": False}
+    fast = dumps(payload)
+    monkeypatch.setattr(http_encoding, "orjson", None)
+    assert json.loads(fast) == json.loads(dumps(payload)) == payload
+
+
+def decompress(body, coding):
+    return http_encoding.brotli.decompress(body) if coding == "br" else gzip.decompress(body)
+
+
+def test_encode_body_compresses_large_bodies_only(codecs):
+    body = dumps([{"id": i, "event": "door_unlocked"} for i in range(200)])
+    encoded, coding = encode_body(body, "gzip, br", min_size=1024)
+    assert coding == codecs[0] and len(encoded) < len(body)
+    assert decompress(encoded, coding) == body
+    assert encode_body(body[:100], "gzip, br", min_size=1024) == (body[:100], None)
+    assert encode_body(body, "gzip, br", min_size=0) == (body, None)
+    assert encode_body(body, None, min_size=1) == (body, None)
+
+
+def test_compress_stream_round_trips(codecs):
+    chunks = [dumps({"id": i, "detail": "x" * (i % 50)}) + b"\n" for i in range(500)]
+    for coding in codecs:
+        assert decompress(b"".join(compress_stream(iter(chunks), coding)), coding) == b"".join(chunks)
+        assert decompress(b"".join(compress_stream([], coding)), coding) == b""
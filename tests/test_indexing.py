@@ -0,0 +1,116 @@
+import asyncio
+
+T0 = 1_700_000_000.0
+
+
+def store_logs(backend, *details, event="door_unlocked"):
+    return backend.store.append([{"event": event, "detail": detail, "timestamp": T0} for detail in details], T0)
+
+
+def indexed_ids(backend):
+    return sorted(int(doc_id) for doc_id in backend.vector_store.index_to_docstore_id.values())
+
+
+def test_index_logs_embeds_only_the_new_logs(app_state, fake_embeddings):
+    first = store_logs(app_state, "RFID authorized", "card 7")
+    asyncio.run(app_state.index_logs(first))
+    second = store_logs(app_state, "card 9", event="rfid_invalid")
+    asyncio.run(app_state.index_logs(second))
+
+    assert fake_embeddings.documents == [
+        ["door_unlocked: RFID authorized", "door_unlocked: card 7"],
+        ["rfid_invalid: card 9"],
+    ]
+    assert app_state.vector_store.index.ntotal == 3
+    assert indexed_ids(app_state) == [1, 2, 3]
+    document = app_state.vector_store.docstore.search("3")
+    assert (document.page_content, document.metadata) == ("rfid_invalid: card 9", {"log_id": 3, "event": "rfid_invalid"})
+    assert app_state.index_changes == 2
+
+
+def test_index_logs_is_a_no_op_without_embeddings_or_logs(app_state, fake_embeddings, monkeypatch):
+    asyncio.run(app_state.index_logs([]))
+    monkeypatch.setattr(app_state, "embeddings", None)
+    asyncio.run(app_state.index_logs(store_logs(app_state, "x")))
+    assert app_state.vector_store is None and not fake_embeddings.documents
+
+
+def test_forget_logs_removes_only_indexed_vectors(app_state, fake_embeddings):
+    asyncio.run(app_state.index_logs(store_logs(app_state, "a", "b", "c", "d")))
+    asyncio.run(app_state.forget_logs(range(0, 3)))
+    assert indexed_ids(app_state) == [3, 4]
+    asyncio.run(app_state.forget_logs(range(100, 200)))
+    assert app_state.vector_store.index.ntotal == 2
+
+
+def test_similar_documents_include_logs_not_yet_indexed(app_state, fake_embeddings, monkeypatch):
+    logs = store_logs(app_state, "front door opened", "motion in hall")
+    asyncio.run(app_state.index_logs(logs))
+    monkeypatch.setattr(app_state, "indexed_upto", 2)
+    store_logs(app_state, "back door opened")
+    documents = asyncio.run(app_state.similar_documents("door opened", k=1))
+    assert [document.metadata["log_id"] for document in documents] == [1, 3]
+
+
+async def run_worker(backend, done, timeout=5.0):
+    """Run the embedding worker until done() holds."""
+    task = asyncio.create_task(backend.embedding_worker())
+    try:
+        for _ in range(int(timeout / 0.01)):
+            if done():
+                return
+            await asyncio.sleep(0.01)
+        raise AssertionError("embedding worker did not catch up")
+    finally:
+        task.cancel()
+
+
+def ingest(backend, count):
+    for i in range(count):
+        backend.append_records([{"event": "door_unlocked", "detail": f"card {i}", "timestamp": T0}])
+
+
+def test_worker_embeds_the_queue_in_micro_batches(app_state, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(app_state, "EMBED_BATCH_SIZE", 4)
+    monkeypatch.setattr(app_state, "EMBED_BATCH_WAIT", 0.05)
+
+    async def scenario():
+        ingest(app_state, 10)
+        assert app_state.embed_queue.qsize() == 10
+        await run_worker(app_state, lambda: app_state.indexed_upto == 10)
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in fake_embeddings.documents] == [4, 4, 2]
+    assert indexed_ids(app_state) == list(range(1, 11))
+    assert app_state.index_status() == {"indexed_upto": 10, "latest_log_id": 10, "pending": 0}
+
+
+def test_worker_backfills_from_the_store_after_the_queue_overflows(app_state, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(app_state, "EMBED_BATCH_SIZE", 3)
+    monkeypatch.setattr(app_state, "embed_queue", asyncio.Queue(maxsize=2))
+
+    async def scenario():
+        ingest(app_state, 11)
+        assert app_state.embed_backfill.is_set()
+        await run_worker(app_state, lambda: app_state.indexed_upto == 11)
+
+    asyncio.run(scenario())
+    # Paged through the store a batch at a time, each log embedded once
+    assert [len(batch) for batch in fake_embeddings.documents] == [3, 3, 3, 2]
+    assert indexed_ids(app_state) == list(range(1, 12))
+
+
+def test_worker_retries_a_failed_batch_from_the_store(app_state, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(app_state, "EMBED_BATCH_WAIT", 0.01)
+    monkeypatch.setattr(app_state, "EMBED_RETRY_DELAY", 0.01)
+    fake_embeddings.fail = 2
+
+    async def scenario():
+        ingest(app_state, 5)
+        await run_worker(app_state, lambda: app_state.indexed_upto == 5)
+        ingest(app_state, 1)
+        await run_worker(app_state, lambda: app_state.indexed_upto == 6)
+
+    asyncio.run(scenario())
+    assert indexed_ids(app_state) == list(range(1, 7))
+    assert sum(len(batch) for batch in fake_embeddings.documents) == 6
@@ -0,0 +1,226 @@
+import asyncio
+import os
+
+import pytest
+
+
+def entry(**fields):
+    return {"event": "door_unlocked", "detail": "ok", **fields}
+
+
+def test_batch_stores_every_entry_in_order(client, app_state):
+    response = client.post("/api/logs/batch", json=[entry(detail=str(i)) for i in range(3)])
+    assert response.status_code == 200
+    assert response.json() == {"message": "3 logs added", "ids": [1, 2, 3], "duplicates": 0, "total_logs": 3}
+    assert [log["detail"] for log in app_state.store.rows()] == ["0", "1", "2"]
+
+
+def test_batch_is_embedded_in_one_round_trip(client, app_state, fake_embeddings):
+    client.post("/api/logs/batch", json=[entry(detail=str(i)) for i in range(5)])
+    batch = asyncio.run(app_state.next_embed_batch())
+    asyncio.run(app_state.index_logs(batch))
+    assert len(fake_embeddings.documents) == 1 and len(fake_embeddings.documents[0]) == 5
+
+
+def test_batch_limits(client, app_state, monkeypatch):
+    assert client.post("/api/logs/batch", json=[]).json()["ids"] == []
+    monkeypatch.setattr(app_state, "MAX_BATCH_SIZE", 2)
+    assert client.post("/api/logs/batch", json=[entry()] * 3).status_code == 413
+    # One invalid entry rejects the whole batch
+    response = client.post("/api/logs/batch", json=[entry(), {"event": "door_unlocked"}])
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", 1, "detail"]
+    assert len(app_state.store) == 0
+
+
+@pytest.mark.parametrize("path", ["/api/logs", "/api/logs/batch"])
+def test_single_and_batch_ingest_agree(client, app_state, path):
+    body = entry(device_id="front", timestamp=1_700_000_000.5)
+    client.post(path, json=body if path == "/api/logs" else [body])
+    assert app_state.store.get(1) == {"id": 1, **body}
+
+
+def ndjson(client, body, chunk_size=None):
+    if chunk_size:
+        content = iter([body[i:i + chunk_size] for i in range(0, len(body), chunk_size)])
+    else:
+        content = body
+    return client.post("/api/logs/ndjson", content=content, headers={"content-type": "application/x-ndjson"}).json()
+
+
+def test_ndjson_skips_and_reports_bad_lines(client, app_state):
+    body = b"\n".join([
+        b'{"event": "door_unlocked", "detail": "1"}',
+        b"",
+        b"not json",
+        b'{"event": "door_unlocked"}',
+        b'{"event": "motion_alert", "detail": "2"}',
+    ])
+    response = ndjson(client, body, chunk_size=7)  # lines split across network chunks
+    assert {key: response[key] for key in ("lines", "accepted", "rejected")} == {"lines": 5, "accepted": 2, "rejected": 2}
+    assert [error["line"] for error in response["errors"]] == [3, 4]
+    assert [log["detail"] for log in app_state.store.rows()] == ["1", "2"]
+
+
+def test_ndjson_appends_in_chunks_and_rejects_oversized_lines(client, app_state, monkeypatch):
+    monkeypatch.setattr(app_state, "NDJSON_CHUNK_SIZE", 3)
+    monkeypatch.setattr(app_state, "NDJSON_MAX_LINE_BYTES", 100)
+    appended = []
+    append_records = app_state.append_records
+    monkeypatch.setattr(app_state, "append_records", lambda records: appended.append(len(records)) or append_records(records))
+    lines = [b'{"event": "door_unlocked", "detail": "%d"}' % i for i in range(7)]
+    lines.insert(4, b'{"event": "door_unlocked", "detail": "' + b"x" * 200 + b'"}')
+    response = ndjson(client, b"\n".join(lines) + b"\n", chunk_size=64)
+    assert (response["accepted"], response["rejected"]) == (7, 1)
+    assert response["errors"] == [{"line": 5, "error": "Line exceeds 100 bytes"}]
+    assert appended == [3, 3, 1]
+    assert len(app_state.store) == 7
+
+
+def test_ndjson_rejects_a_chunk_that_cannot_be_stored(client, app_state, monkeypatch):
+    monkeypatch.setattr("log_store.MAX_EVENT_TYPES", 1)
+    monkeypatch.setattr(app_state, "NDJSON_CHUNK_SIZE", 2)
+    body = b'{"event": "a", "detail": "1"}\n{"event": "a", "detail": "2"}\n{"event": "b", "detail": "3"}\n'
+    response = ndjson(client, body)
+    assert (response["accepted"], response["rejected"]) == (2, 1)
+    assert "could not be stored" in response["errors"][0]["error"]
+
+
+def test_oversized_fields_are_rejected(client, app_state):
+    for fields in (
+        {"event": "x" * 70000},
+        {"device_id": "x" * 70000},
+        {"detail": "x" * (app_state.DETAIL_MAX_CHARS + 1)},
+        {"device_id": "front", "seq": 2**63},
+    ):
+        assert client.post("/api/logs", json=entry(**fields)).status_code == 422
+    assert len(app_state.store) == 0
+
+
+@pytest.mark.parametrize("timestamp", [b"NaN", b"Infinity", b"-Infinity", b"-1", b"1e300"])
+def test_implausible_timestamps_are_rejected(client, app_state, timestamp):
+    body = b'{"event": "door_unlocked", "detail": "ok", "timestamp": ' + timestamp + b"}"
+    for path, content in (("/api/logs", body), ("/api/logs/batch", b"[" + body + b"]")):
+        response = client.post(path, content=content, headers={"content-type": "application/json"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"][-1] == "timestamp"
+    assert len(app_state.store) == 0
+
+
+def test_single_ingest_reports_errors_under_body(client):
+    response = client.post("/api/logs", json={"event": "door_unlocked"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "detail"]
+
+
+def test_binary_ingest(client, app_state):
+    import binary_logs
+    body = binary_logs.encode_records([
+        {"event": "door_unlocked", "detail": "card 7", "timestamp": 1_700_000_000, "seq": 1},
+        {"event": "motion_alert", "detail": "hall", "timestamp": 1_700_000_001, "seq": 2},
+    ], device_id="front")
+    response = client.post("/api/logs", content=body, headers={"content-type": binary_logs.CONTENT_TYPE})
+    assert response.json()["ids"] == [1, 2]
+    assert [log["event"] for log in app_state.store.rows()] == ["door_unlocked", "motion_alert"]
+
+
+def test_duplicates_are_dropped_within_and_across_requests(client, app_state):
+    batch = [entry(device_id="front", seq=1), entry(device_id="front", seq=2), entry(device_id="front", seq=1)]
+    response = client.post("/api/logs/batch", json=batch + [entry(device_id="front", seq=2)]).json()
+    assert (response["ids"], response["duplicates"]) == ([1, 2], 2)
+    assert client.post("/api/logs", json=entry(device_id="front", seq=2)).json()["duplicate"] is True
+    assert len(app_state.store) == 2 and app_state.deduplicator.duplicates == 3
+
+
+def test_clients_without_device_ids_get_their_own_budget(client, app_state, monkeypatch):
+    from ratelimit import RateLimiter
+    monkeypatch.setattr(app_state, "rate_limiter", RateLimiter(1, 2, 0, 0, client_rate=1, client_burst=5))
+    assert [client.post("/api/logs", json=entry()).status_code for _ in range(6)] == [200] * 5 + [429]
+    statuses = [client.post("/api/logs", json=entry(device_id="d1")).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    response = client.post("/api/logs", json=entry(device_id="d1"))
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_forwarded_for_is_trusted_only_from_known_proxies(client, app_state, monkeypatch):
+    clients = []
+    admit = app_state.rate_limiter.admit
+    monkeypatch.setattr(app_state.rate_limiter, "admit", lambda costs, client_costs: clients.extend(client_costs) or admit(costs, client_costs))
+    forwarded = {"x-forwarded-for": "203.0.113.7, 10.0.0.2"}
+    client.post("/api/logs", json=entry(), headers=forwarded)
+    monkeypatch.setattr(app_state, "RATE_LIMIT_TRUSTED_PROXIES", {"testclient", "10.0.0.2"})
+    client.post("/api/logs", json=entry(), headers=forwarded)
+    assert clients == ["testclient", "203.0.113.7"]
+
+
+@pytest.fixture
+def wal(app_state, tmp_path, monkeypatch):
+    from wal import WriteAheadLog
+    log = WriteAheadLog(str(tmp_path / "wal"), fsync="always")
+    monkeypatch.setattr(app_state, "wal", log)
+    yield log
+    log.close()
+
+
+def replayed(wal):
+    from wal import WriteAheadLog
+    return list(WriteAheadLog(wal.directory).replay())
+
+
+def test_wal_replays_everything_after_a_rejected_record(client, app_state, wal):
+    app_state.append_records([entry(device_id="front", seq=1)])
+    with pytest.raises(ValueError):
+        app_state.append_records([entry(event="x" * 70000, device_id="front", seq=2)])
+    assert app_state.append_records([entry(device_id="front", seq=2)])[0]["id"] == 2
+    app_state.append_records([entry(device_id="front", seq=3)])
+    assert [log["seq"] for log in replayed(wal)] == [1, 2, 3]
+    assert replayed(wal) == app_state.store.rows()
+
+
+def test_store_rejection_leaves_store_dedup_and_wal_untouched(client, app_state, wal, monkeypatch):
+    monkeypatch.setattr("log_store.MAX_EVENT_TYPES", 2)
+    client.post("/api/logs", json=entry(event="a", device_id="front", seq=1))
+    batch = [entry(event="b", device_id="front", seq=2), entry(event="c", device_id="front", seq=3)]
+    assert client.post("/api/logs/batch", json=batch).status_code == 422
+    assert len(app_state.store) == 1 and len(replayed(wal)) == 1
+    assert client.post("/api/logs", json=entry(event="b", device_id="front", seq=2)).json()["id"] == 2
+
+
+def test_a_full_disk_answers_503_with_nothing_stored(client, app_state, wal, monkeypatch):
+    import errno
+    import wal as wal_module
+    client.post("/api/logs", json=entry(device_id="front", seq=1))
+    real_write = os.write
+
+    def full_disk(fd, data):
+        real_write(fd, data[:7])
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(wal_module.os, "write", full_disk)
+    response = client.post("/api/logs/batch", json=[entry(device_id="front", seq=2), entry(device_id="front", seq=3)])
+    assert response.status_code == 503
+    assert len(app_state.store) == 1 and app_state.store.last_id == 1
+    assert app_state.event_rollups.version == 1 and app_state.deduplicator.duplicates == 0
+
+    # Once there is space again the retry is stored, not dropped as a duplicate, with no gap in the ids
+    monkeypatch.setattr(wal_module.os, "write", real_write)
+    response = client.post("/api/logs/batch", json=[entry(device_id="front", seq=2), entry(device_id="front", seq=3)])
+    assert response.json()["ids"] == [2, 3]
+    assert replayed(wal) == app_state.store.rows()
+
+
+def test_a_stopped_wal_refuses_every_write(client, app_state, wal, monkeypatch):
+    import wal as wal_module
+
+    def failing(*args):
+        raise OSError("I/O error")
+
+    fsync = os.fsync
+    monkeypatch.setattr(wal_module.os, "fsync", failing)
+    assert client.post("/api/logs", json=entry()).status_code == 503
+    # A later fsync may well succeed, but the log no longer trusts the disk
+    monkeypatch.setattr(wal_module.os, "fsync", fsync)
+    response = client.post("/api/logs/ndjson", content=b'{"event": "a", "detail": "1"}\n',
+                           headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 503 and "stopped" in response.json()["detail"]
+    assert len(app_state.store) == 0
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from live import LiveEvent, LiveHub, LogFilter, severity
+from log_store import LogStore
+
+T0 = 1_700_000_000.0
+
+
+def record(event="door_unlocked", device_id=None):
+    return {"event": event, "detail": "d", "timestamp": T0, "device_id": device_id}
+
+
+def make_hub(store, **kwargs):
+    return LiveHub(store.since, lambda: store.last_id, **kwargs)
+
+
+async def take(subscriber, count, heartbeat=0.05):
+    """The next `count` events, skipping heartbeats; stops early when idle."""
+    events = []
+    idle = 0
+    async for event in subscriber.events(heartbeat):
+        if event is None:
+            idle += 1
+            if idle > 2:
+                break
+            continue
+        events.append(event)
+        if len(events) == count:
+            break
+    return events
+
+
+def test_log_filter():
+    assert severity("motion_alert") == "critical" and severity("anything") == "info"
+    view = LogFilter(events=["motion_alert", "rfid_invalid"], devices=["front"], min_severity="critical")
+    assert view.matches({"event": "motion_alert", "device_id": "front"})
+    assert not view.matches({"event": "rfid_invalid", "device_id": "front"})
+    assert not view.matches({"event": "motion_alert"})
+    assert LogFilter().matches({"event": "door_unlocked"})
+    with pytest.raises(ValueError, match="min_severity"):
+        LogFilter(min_severity="loud")
+    with pytest.raises(ValueError, match="events"):
+        LogFilter(events="motion_alert")
+
+
+def test_live_event_frames_share_one_serialization():
+    event = LiveEvent({"id": 3, "event": "door_unlocked", "detail": "d", "timestamp": T0})
+    assert event.sse == f"id: 3\nevent: log\ndata: {event.data}\n\n".encode("utf-8")
+    frame = json.loads(event.frame(["v1"]))
+    assert frame == {"type": "log", "views": ["v1"], "log": event.log}
+
+
+def test_publish_reaches_matching_subscribers_only():
+    async def scenario():
+        store = LogStore()
+        hub = make_hub(store)
+        everything = hub.subscribe()
+        motion = hub.subscribe(matches=lambda log: log.get("device_id") == "front")
+        hub.set_event_types(motion, ["motion_alert"])
+        hub.publish(store.append([record(), record("motion_alert", "front"), record("motion_alert", "back")], T0))
+        assert [event.id for event in await take(everything, 3)] == [1, 2, 3]
+        assert [event.id for event in await take(motion, 1)] == [2]
+        assert set(hub.by_event) == {"motion_alert"}
+        hub.unsubscribe(motion)
+        assert not hub.by_event and hub.stats()["subscribers"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_catches_up_from_the_store_without_gaps():
+    async def scenario():
+        store = LogStore()
+        hub = make_hub(store, queue_size=5, catch_up_chunk=7)
+        subscriber = hub.subscribe(matches=lambda log: log["event"] != "skip")
+        for i in range(40):
+            hub.publish(store.append([record("skip" if i % 10 == 3 else "door_unlocked")], T0))
+        assert subscriber.behind and hub.overflows == 1
+        ids = [event.id for event in await take(subscriber, 36)]
+        assert ids == [i for i in range(1, 41) if i % 10 != 4]
+        # Nothing is lost around the switch back to the queue
+        hub.publish(store.append([record()], T0))
+        assert [event.id for event in await take(subscriber, 1)] == [41]
+        hub.publish(store.append([record()], T0))
+        assert [event.id for event in await take(subscriber, 1)] == [42]
+
+    asyncio.run(scenario())
+
+
+def test_resuming_replays_from_last_id():
+    async def scenario():
+        store = LogStore()
+        store.append([record() for _ in range(10)], T0)
+        hub = make_hub(store)
+        subscriber = hub.subscribe(last_id=6)
+        assert subscriber.behind
+        hub.publish(store.append([record()], T0))  # not queued while behind
+        assert [event.id for event in await take(subscriber, 5)] == [7, 8, 9, 10, 11]
+        assert hub.subscribe(last_id=10**6).last_id == 11
+
+    asyncio.run(scenario())
+
+
+def test_hub_limits_subscribers():
+    async def scenario():
+        hub = make_hub(LogStore(), max_subscribers=1)
+        assert hub.subscribe() is not None and hub.subscribe() is None
+
+    asyncio.run(scenario())
+
+
+def stream_request(headers=()):
+    from starlette.requests import Request
+    return Request({"type": "http", "method": "GET", "path": "/api/logs/stream", "query_string": b"",
+                    "headers": [(name.encode(), value.encode()) for name, value in headers]})
+
+
+def test_sse_endpoint_resumes_from_last_event_id_and_streams_new_events(app_state):
+    app_state.append_records([record(), record("motion_alert"), record(), record()])
+
+    async def scenario():
+        response = await app_state.stream_logs(
+            stream_request([("last-event-id", "1")]), event="door_unlocked", device_id=None, last_event_id=None
+        )
+        assert response.media_type == "text/event-stream"
+        frames = response.body_iterator
+        assert await frames.__anext__() == b"retry: 3000\n\n"
+        caught_up = [await frames.__anext__() for _ in range(2)]
+        app_state.append_records([record("motion_alert"), record()])
+        live = await asyncio.wait_for(frames.__anext__(), 1)
+        await frames.aclose()
+        return caught_up + [live]
+
+    frames = asyncio.run(scenario())
+    assert [frame.split(b"\n")[0] for frame in frames] == [b"id: 3", b"id: 4", b"id: 6"]
+    assert json.loads(frames[2].split(b"data: ")[1]) == {
+        "id": 6, "event": "door_unlocked", "detail": "d", "timestamp": T0,
+    }
+    assert not app_state.live_hub.subscribers  # closing the stream unsubscribes
+
+
+def test_sse_endpoint_answers_503_when_the_hub_is_full(client, app_state, monkeypatch):
+    monkeypatch.setattr(app_state.live_hub, "max_subscribers", 0)
+    assert client.get("/api/logs/stream").status_code == 503
+
+
+def receive_logs(ws, count):
+    """The next `count` log messages, and the other messages received meanwhile."""
+    logs, others, pings = [], [], 0
+    while len(logs) < count:
+        message = ws.receive_json()
+        if message["type"] == "ping":
+            pings += 1
+            assert pings < 40, f"only {len(logs)} of {count} events arrived"
+        else:
+            (logs if message["type"] == "log" else others).append(message)
+    return logs, others
+
+
+@pytest.fixture
+def heartbeat(app_state, monkeypatch):
+    # The tests append from their own thread, not the server's event loop; a
+    # short heartbeat has the subscriber look at its queue again promptly
+    monkeypatch.setattr(app_state, "LIVE_HEARTBEAT", 0.05)
+
+
+def test_websocket_resumes_from_last_event_id_once_a_view_is_subscribed(client, app_state, heartbeat):
+    app_state.append_records([record(), record("motion_alert"), record(), record("rfid_invalid", "front")])
+    with client.websocket_connect("/api/logs/ws?last_event_id=0") as ws:
+        # Stored after connecting but before the first view: still replayed
+        app_state.append_records([record("motion_alert")])
+        time.sleep(0.1)  # time enough for the server to skip ahead, were it subscribed without a view
+        ws.send_json({"type": "subscribe", "id": "all"})
+        logs, others = receive_logs(ws, 5)
+        assert [message["log"]["id"] for message in logs] == [1, 2, 3, 4, 5]
+        assert all(message["views"] == ["all"] for message in logs)
+        assert others == [{"type": "subscribed", "id": "all", "last_id": 0}]
+
+        ws.send_json({"type": "subscribe", "id": "front", "devices": ["front"]})
+        assert ws.receive_json()["type"] == "subscribed"
+        app_state.append_records([record(device_id="front")])
+        logs, _ = receive_logs(ws, 1)
+        assert (logs[0]["log"]["id"], logs[0]["views"]) == (6, ["all", "front"])
+    assert not app_state.live_hub.subscribers
+
+
+def test_websocket_replays_only_what_its_views_match(client, app_state, heartbeat):
+    app_state.append_records([record(), record("motion_alert"), record("motion_alert", "front")])
+    with client.websocket_connect("/api/logs/ws?last_event_id=1") as ws:
+        ws.send_json({"type": "subscribe", "id": "motion", "events": ["motion_alert"]})
+        logs, _ = receive_logs(ws, 2)
+        assert [message["log"]["id"] for message in logs] == [2, 3]
@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+import struct
+
+import pytest
+
+from log_export import COLUMNAR_MAGIC, columnar_chunks, csv_chunks, ndjson_chunks, read_columnar
+
+PAGES = [
+    [
+        {"id": 1, "event": "door_unlocked", "detail": "RFID authorized", "timestamp": 1700000000.5,
+         "device_id": "front", "seq": 7},
+        {"id": 2, "event": "motion_alert", "detail": 'says "hi", then\nleaves', "timestamp": 1700000001.0},
+    ],
+    [],
+    [
+        {"id": 5, "event": "door_unlocked", "detail": "RFID authorized", "timestamp": 1700000002.25,
+         "device_id": "back"},
+        {"id": 9, "event": "rfid_invalid", "detail": "ünïcode", "timestamp": 1700000003.0, "seq": 0},
+    ],
+]
+LOGS = [log for page in PAGES for log in page]
+
+
+def test_csv_round_trip():
+    rows = list(csv.DictReader(io.StringIO(b"".join(csv_chunks(PAGES)).decode("utf-8"))))
+    assert [row["id"] for row in rows] == ["1", "2", "5", "9"]
+    assert rows[1]["detail"] == LOGS[1]["detail"]
+    assert (rows[1]["device_id"], rows[1]["seq"], rows[3]["seq"]) == ("", "", "0")
+
+
+def test_csv_of_nothing_is_just_the_header():
+    assert b"".join(csv_chunks([])) == b"id,timestamp,event,detail,device_id,seq\r\n"
+
+
+def test_ndjson_round_trip():
+    lines = b"".join(ndjson_chunks(PAGES)).splitlines()
+    assert [json.loads(line) for line in lines] == LOGS
+
+
+def test_columnar_round_trip():
+    data = b"".join(columnar_chunks(PAGES))
+    assert list(read_columnar(data)) == LOGS
+    assert list(read_columnar(b"".join(columnar_chunks([])))) == []
+
+
+def test_columnar_stores_repeated_strings_once():
+    page = [{"id": i, "event": "door_unlocked", "detail": "RFID authorized", "timestamp": 1.0} for i in range(1, 101)]
+    data = b"".join(columnar_chunks([page]))
+    assert data.count(b"RFID authorized") == 1
+    assert list(read_columnar(data)) == page
+
+
+@pytest.mark.parametrize("mutate, message", [
+    (lambda data: b"XXXX" + data[4:], "not a columnar export"),
+    (lambda data: COLUMNAR_MAGIC + b"\x09" + data[5:], "unsupported columnar version"),
+    (lambda data: data[:-9], "truncated"),
+    (lambda data: data + b"\x00", "trailing bytes"),
+])
+def test_read_columnar_errors(mutate, message):
+    with pytest.raises(ValueError, match=message):
+        list(read_columnar(mutate(b"".join(columnar_chunks(PAGES)))))
+
+
+def test_read_columnar_rejects_out_of_range_string_indexes():
+    page = [{"id": 1, "event": "a", "detail": "b", "timestamp": 1.0}]
+    data = bytearray(b"".join(columnar_chunks([page])))
+    # The event column (one u16) follows the header, strings, id, delta and timestamp
+    offset = 5 + 4 + (4 + 4 + 1) + (4 + 4 + 1) + 4 + 8 + 4 + 8
+    assert struct.unpack_from("<H", data, offset) == (0,)
+    struct.pack_into("<H", data, offset, 3)
+    with pytest.raises(ValueError, match="string index"):
+        list(read_columnar(bytes(data)))
@@ -0,0 +1,153 @@
+import random
+
+import pytest
+
+import log_store
+from log_store import LogStore, log_matches, stored_log
+
+T0 = 1_700_000_000.0
+EVENTS = ["door_unlocked", "motion_alert", "rfid_invalid", "door_autolock"]
+
+
+def make_records(count, rng, late=0.1):
+    records = []
+    for i in range(count):
+        timestamp = T0 + i + rng.random() * 5
+        if rng.random() < late:
+            timestamp -= rng.random() * 300  # arrived late
+        records.append({
+            "event": rng.choice(EVENTS),
+            "detail": f"detail {i % 5}",
+            "timestamp": round(timestamp, 1),  # rounding makes ties
+            "device_id": rng.choice([None, "front", "back"]),
+            "seq": rng.choice([None, i]),
+        })
+    return records
+
+
+def filled(count=600, seed=1, batch=20, late=0.1):
+    rng = random.Random(seed)
+    store, logs = LogStore(), []
+    records = make_records(count, rng, late)
+    for start in range(0, count, batch):
+        logs += store.append(records[start:start + batch], T0)
+    return store, logs
+
+
+def expected_page(logs, limit, before=None, after=None, **filters):
+    matches = [
+        log for log in logs
+        if (before is None or log["id"] < before) and (after is None or log["id"] > after) and log_matches(log, **filters)
+    ]
+    if after is not None:
+        return matches[:limit], len(matches) > limit
+    return matches[-limit:], len(matches) > limit
+
+
+def random_page(rng, first, last):
+    filters = {
+        "event": rng.choice([None, None, "motion_alert", "rfid_invalid", "unknown"]),
+        "device_id": rng.choice([None, None, "front", "unknown"]),
+    }
+    if rng.random() < 0.7:
+        filters["start"] = T0 + rng.randint(-300, last - first)
+        filters["end"] = filters["start"] + rng.choice([1, 10, 100, 1000])
+    return dict(
+        limit=rng.randint(1, 50),
+        before=rng.choice([None, rng.randint(first, last + 1)]),
+        after=rng.choice([None, rng.randint(first - 1, last)]),
+        **filters,
+    )
+
+
+def check_time_index(store):
+    by_time = list(store._by_time)
+    assert sorted(by_time) == list(range(store.first_id, store.last_id + 1))
+    assert by_time == sorted(by_time, key=lambda log_id: (store._time_of(log_id), log_id))
+
+
+def test_append_returns_rows_as_stored():
+    store = LogStore()
+    records = [
+        {"event": "door_unlocked", "detail": "ok", "timestamp": None, "device_id": "front", "seq": 0},
+        {"event": "motion_alert", "detail": "hall", "timestamp": T0},
+    ]
+    stored = store.append(records, T0 + 5)
+    assert stored == [stored_log(record, i + 1, T0 + 5) for i, record in enumerate(records)]
+    assert stored[0] == {"id": 1, "event": "door_unlocked", "detail": "ok", "timestamp": T0 + 5,
+                         "device_id": "front", "seq": 0}
+    assert store.rows() == stored and store.get(2) == stored[1] and store.get(3) is None
+
+
+@pytest.mark.parametrize("late", [0, 0.1, 1])
+def test_time_index_stays_ordered_with_late_events(late):
+    store, _ = filled(late=late)
+    check_time_index(store)
+    # load() of a replay builds the same index
+    replayed = LogStore()
+    replayed.load(store.rows())
+    assert replayed._by_time == store._by_time
+
+
+def test_page_matches_brute_force():
+    store, logs = filled()
+    rng = random.Random(5)
+    for _ in range(1000):
+        args = random_page(rng, 1, len(logs))
+        assert store.page(**args) == expected_page(logs, **args), args
+
+
+def test_page_limit_stops_early_in_a_large_time_range():
+    store, logs = filled(count=5000, late=0)
+    page, has_more = store.page(limit=3, start=T0 + 100)
+    assert page == logs[-3:] and has_more
+    page, has_more = store.page(limit=3, after=0, start=T0 + 100, end=T0 + 4000)
+    assert page == [log for log in logs if log["timestamp"] >= T0 + 100][:3] and has_more
+
+
+def test_counts():
+    store, logs = filled()
+    assert store.count() == len(logs)
+    assert store.count("motion_alert") == sum(log["event"] == "motion_alert" for log in logs)
+    assert store.count("motion_alert", "front") == sum(log_matches(log, "motion_alert", "front") for log in logs)
+    assert store.count("unknown") == 0
+    assert store.event_counts(300) == {
+        event: sum(log["event"] == event for log in logs[300:]) for event in EVENTS
+    }
+
+
+def test_evict_keeps_indexes_consistent():
+    store, logs = filled()
+    assert store.evict(250) == 250
+    assert store.first_id == 251 and store.rows() == logs[250:]
+    check_time_index(store)
+    rng = random.Random(9)
+    for _ in range(200):
+        args = random_page(rng, 251, len(logs))
+        assert store.page(**args) == expected_page(logs[250:], **args), args
+    assert store.evict(10**6) == len(logs) - 250 and len(store) == 0
+    assert store.page(limit=10) == ([], False)
+
+
+def test_too_many_event_types_stores_nothing(monkeypatch):
+    monkeypatch.setattr(log_store, "MAX_EVENT_TYPES", 3)
+    store = LogStore()
+    store.append([{"event": "a", "detail": ""}, {"event": "b", "detail": ""}], T0)
+    version = store.version
+    with pytest.raises(ValueError, match="distinct event types"):
+        store.append([{"event": "a", "detail": ""}, {"event": "c", "detail": ""}, {"event": "d", "detail": ""}], T0)
+    with pytest.raises(ValueError):
+        store.load([{"id": 3, "event": "c", "detail": "", "timestamp": T0}, {"id": 4, "event": "d", "detail": "", "timestamp": T0}])
+    assert len(store) == 2 and store.version == version
+    assert list(store.event_names.codes) == ["a", "b"]
+    check_time_index(store)
+    # Known types still fit
+    assert [log["id"] for log in store.append([{"event": "a", "detail": ""}, {"event": "c", "detail": ""}], T0)] == [3, 4]
+
+
+def test_load_requires_contiguous_ids():
+    store = LogStore()
+    store.load([{"id": 10, "event": "a", "detail": "", "timestamp": T0}])
+    assert store.first_id == 10
+    with pytest.raises(ValueError, match="at id 11"):
+        store.load([{"id": 12, "event": "a", "detail": "", "timestamp": T0}])
@@ -0,0 +1,183 @@
+T0 = 1_700_000_000.0
+
+
+def fill(backend, count=25):
+    return backend.store.append([
+        {"event": ["door_unlocked", "motion_alert"][i % 2], "detail": f"detail {i}", "timestamp": T0 + i,
+         "device_id": ["front", "back", None][i % 3]}
+        for i in range(count)
+    ], T0)
+
+
+def ids(page):
+    return [log["id"] for log in page["logs"]]
+
+
+def test_newest_page_then_older_pages_by_cursor(client, app_state):
+    fill(app_state)
+    page = client.get("/api/logs", params={"limit": 10}).json()
+    assert ids(page) == list(range(16, 26)) and page["has_more"]
+    assert (page["before"], page["after"]) == (16, 25)
+    seen = ids(page)
+    while page["has_more"]:
+        page = client.get("/api/logs", params={"limit": 10, "before": page["before"]}).json()
+        seen = ids(page) + seen
+    assert seen == list(range(1, 26))
+
+
+def test_polling_with_after_returns_only_newer_events(client, app_state):
+    fill(app_state, 5)
+    page = client.get("/api/logs", params={"after": 3}).json()
+    assert ids(page) == [4, 5] and not page["has_more"]
+    # An empty page keeps the cursor, so the poller asks again from the same place
+    page = client.get("/api/logs", params={"since": page["after"]}).json()
+    assert page == {"logs": [], "has_more": False, "before": None, "after": 5}
+    fill(app_state, 2)
+    assert ids(client.get("/api/logs", params={"since": 5}).json()) == [6, 7]
+
+
+def test_filters_combine_with_cursors(client, app_state):
+    logs = fill(app_state)
+    params = {"event": "motion_alert", "device_id": "front", "start": T0 + 5, "limit": 2}
+    expected = [
+        log["id"] for log in logs
+        if log["event"] == "motion_alert" and log.get("device_id") == "front" and log["timestamp"] >= T0 + 5
+    ]
+    page = client.get("/api/logs", params=params).json()
+    assert ids(page) == expected[-2:] and page["has_more"] == (len(expected) > 2)
+    older = client.get("/api/logs", params={**params, "before": page["before"]}).json()
+    assert ids(older) == expected[-4:-2]
+
+
+def test_page_size_is_bounded(client, app_state):
+    assert client.get("/api/logs", params={"limit": 0}).status_code == 422
+    assert client.get("/api/logs", params={"limit": app_state.LOGS_PAGE_MAX + 1}).status_code == 422
+
+
+def revalidate(client, path, etag, **params):
+    return client.get(path, params=params, headers={"If-None-Match": etag})
+
+
+def test_unchanged_logs_answer_304_until_an_event_is_written(client, app_state):
+    fill(app_state, 3)
+    first = client.get("/api/logs")
+    etag = first.headers["ETag"]
+    response = revalidate(client, "/api/logs", etag)
+    assert response.status_code == 304 and response.content == b"" and response.headers["ETag"] == etag
+    # Any of several cached versions matches
+    assert revalidate(client, "/api/logs", f'W/"stale", {etag}').status_code == 304
+
+    client.post("/api/logs", json={"event": "door_unlocked", "detail": "new"})
+    response = revalidate(client, "/api/logs", etag)
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert ids(response.json())[-1] == 4
+
+
+def test_summary_and_timeseries_revalidate_too(client, app_state):
+    fill(app_state, 3)
+    etags = {path: client.get(path).headers["ETag"] for path in ("/api/summary", "/api/stats/timeseries")}
+    for path, etag in etags.items():
+        assert revalidate(client, path, etag).status_code == 304, path
+    client.post("/api/logs", json={"event": "door_unlocked", "detail": "new"})
+    for path, etag in etags.items():
+        assert revalidate(client, path, etag).status_code == 200, path
+
+
+def test_etags_do_not_survive_a_restart(client, app_state, monkeypatch):
+    etag = client.get("/api/logs").headers["ETag"]
+    # A fresh process starts again from version 0, so the boot id tells the versions apart
+    monkeypatch.setattr(app_state, "BOOT_ID", "restarted")
+    assert revalidate(client, "/api/logs", etag).status_code == 200
+
+
+def test_timeseries_counts_events_per_bucket(client, app_state):
+    import time
+    hour = int(time.time() // 3600) * 3600
+    app_state.append_records([
+        {"event": "door_unlocked", "detail": "", "timestamp": hour - 3000},  # last hour, folded
+        {"event": "motion_alert", "detail": "", "timestamp": hour - 3000},
+        {"event": "door_unlocked", "detail": "", "timestamp": hour + 1},
+        {"event": "door_unlocked", "detail": "", "timestamp": hour - 5 * 86400},  # late, straight into hours
+    ])
+    params = {"bucket": "1h", "start": hour - 2 * 3600, "end": hour + 3600}
+    response = client.get("/api/stats/timeseries", params=params).json()
+    assert (response["bucket"], response["start"], response["end"]) == (3600, hour - 7200, hour + 3600)
+    assert response["buckets"] == [
+        {"start": hour - 7200, "counts": {}, "total": 0},
+        {"start": hour - 3600, "counts": {"door_unlocked": 1, "motion_alert": 1}, "total": 2},
+        {"start": hour, "counts": {"door_unlocked": 1}, "total": 1},
+    ]
+    filtered = client.get("/api/stats/timeseries", params={**params, "event": "motion_alert"}).json()
+    assert [bucket["total"] for bucket in filtered["buckets"]] == [0, 1, 0]
+    days = client.get("/api/stats/timeseries", params={"bucket": "1d", "start": hour - 6 * 86400, "end": hour}).json()
+    assert sum(bucket["total"] for bucket in days["buckets"]) == 4
+
+
+def test_timeseries_rejects_bad_windows(client, app_state):
+    assert client.get("/api/stats/timeseries", params={"bucket": "90s"}).status_code == 400
+    assert client.get("/api/stats/timeseries", params={"bucket": "1h", "start": 10, "end": 10}).status_code == 400
+    too_many = {"bucket": "1m", "start": 0, "end": 60 * (app_state.TIMESERIES_MAX_BUCKETS + 1)}
+    assert client.get("/api/stats/timeseries", params=too_many).status_code == 400
+    for value in ("nan", "inf"):
+        assert client.get("/api/stats/timeseries", params={"start": value}).status_code == 422
+
+
+def test_non_finite_timestamps_are_refused_before_anything_is_written(app_state):
+    import pytest
+    app_state.append_records([{"event": "door_unlocked", "detail": "", "timestamp": T0}])
+    version = app_state.event_rollups.version
+    for timestamp in (float("nan"), float("inf"), -1.0):
+        with pytest.raises(ValueError, match="timestamp"):
+            app_state.append_records([
+                {"event": "door_unlocked", "detail": "", "timestamp": T0},
+                {"event": "door_unlocked", "detail": "", "timestamp": timestamp},
+            ])
+    assert len(app_state.store) == 1 and app_state.event_rollups.version == version
+
+
+def test_rollups_recount_past_a_stored_nan(app_state, monkeypatch):
+    # A record stored before ingest rejected NaN must not stop startup
+    monkeypatch.setattr(app_state, "ROLLUP_PATH", "")
+    monkeypatch.setattr(app_state, "rollups_saved", 0)
+    app_state.store.load([{"id": 1, "event": "a", "detail": "", "timestamp": float("nan")},
+                          {"id": 2, "event": "a", "detail": "", "timestamp": T0}])
+    app_state.restore_rollups()
+    assert app_state.event_rollups.upto == 2
+
+
+def test_large_responses_are_compressed_per_accept_encoding(client, app_state):
+    fill(app_state, 200)
+    plain = client.get("/api/logs", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.headers["Vary"] == "Accept-Encoding"
+    for coding in ("br", "gzip"):
+        response = client.get("/api/logs", headers={"Accept-Encoding": coding})
+        assert response.headers["Content-Encoding"] == coding
+        assert int(response.headers["Content-Length"]) < len(plain.content)
+        assert response.json() == plain.json()  # decoded by the client
+    # Below COMPRESS_MIN_BYTES the body is sent as is
+    small = client.get("/api/logs", params={"limit": 1}, headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in small.headers
+
+
+def test_export_streams_every_matching_event_in_chunks(client, app_state, monkeypatch):
+    import json
+    from log_export import read_columnar
+    monkeypatch.setattr(app_state, "EXPORT_CHUNK_SIZE", 7)
+    logs = fill(app_state, 30)
+    response = client.get("/api/logs/export")
+    assert response.headers["X-Export-Last-Id"] == "30"
+    assert 'filename="vaultify-logs-30.ndjson"' in response.headers["Content-Disposition"]
+    assert [json.loads(line) for line in response.text.splitlines()] == logs
+
+    columnar = client.get("/api/logs/export", params={"format": "columnar", "event": "motion_alert", "after": 10})
+    expected = [log for log in logs if log["event"] == "motion_alert" and log["id"] > 10]
+    assert [log["id"] for log in read_columnar(columnar.content)] == [log["id"] for log in expected]
+
+    csv_export = client.get("/api/logs/export", params={"format": "csv", "before": 4}, headers={"Accept-Encoding": "gzip"})
+    assert csv_export.headers["Content-Encoding"] == "gzip"
+    assert csv_export.text.splitlines()[0] == "id,timestamp,event,detail,device_id,seq"
+    assert len(csv_export.text.splitlines()) == 4
+
+
+def test_export_format_is_validated(client):
+    assert client.get("/api/logs/export", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,73 @@
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+def test_token_bucket_lets_an_oversized_batch_through_into_debt():
+    bucket = TokenBucket(rate=2, capacity=10, now=0)
+    assert bucket.wait_time(25) == 0
+    bucket.consume(25)
+    assert bucket.wait_time(1) == pytest.approx(8)
+    bucket.refill(8)
+    assert bucket.tokens == pytest.approx(1) and bucket.wait_time(1) == 0
+    bucket.refill(100)
+    assert bucket.tokens == 10
+
+
+def test_device_budget(clock):
+    limiter = RateLimiter(device_rate=1, device_burst=3, global_rate=0, global_burst=0)
+    assert limiter.admit({"a": 2}) is None
+    assert limiter.admit({"a": 2}) == pytest.approx(1)
+    assert limiter.admit({"b": 3}) is None  # other devices are unaffected
+    clock.now += 1
+    assert limiter.admit({"a": 2}) is None
+    assert limiter.stats() == {"admitted": 7, "shed_device": 2, "shed_global": 0,
+                               "tracked_devices": 2, "tracked_clients": 0}
+
+
+def test_rejected_requests_charge_nothing(clock):
+    limiter = RateLimiter(device_rate=1, device_burst=2, global_rate=1, global_burst=3)
+    assert limiter.admit({"a": 1, "b": 2}) is None
+    # b is empty, so a is not charged either
+    assert limiter.admit({"a": 1, "b": 1}) is not None
+    assert limiter.devices["a"].tokens == 1
+    # Device buckets allow it, the global bucket does not
+    assert limiter.admit({"c": 2}) is not None
+    assert "c" in limiter.devices and limiter.devices["c"].tokens == 2
+    assert limiter.stats()["shed_global"] == 2
+
+
+def test_client_budget_is_separate_from_device_budget(clock):
+    limiter = RateLimiter(1, 2, 0, 0, client_rate=10, client_burst=20)
+    assert limiter.admit({}, {"10.0.0.1": 20}) is None
+    assert limiter.admit({}, {"10.0.0.1": 1}) == pytest.approx(0.1)
+    assert limiter.admit({"d1": 2}, {}) is None
+    assert limiter.admit({}, {"10.0.0.2": 5}) is None
+    # Disabled levels never limit
+    unlimited = RateLimiter(0, 0, 0, 0)
+    assert unlimited.admit({"d1": 10**6}, {"10.0.0.1": 10**6}) is None
+    assert not unlimited.devices and not unlimited.clients
+
+
+def test_tracked_keys_are_bounded(clock):
+    limiter = RateLimiter(1, 1, 0, 0, max_devices=2, client_rate=1, client_burst=1)
+    for key in ("a", "b", "c"):
+        limiter.admit({key: 1}, {key: 1})
+    assert list(limiter.devices) == ["b", "c"] and list(limiter.clients) == ["b", "c"]
+    assert limiter.admit({"a": 1}) is None  # forgotten keys start full
@@ -0,0 +1,191 @@
+import random
+
+import pytest
+
+from log_store import log_matches
+from retention import Segment, TieredLogStore
+
+T0 = 1_700_000_000.0
+
+
+def make_records(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        {
+            "event": rng.choice(["door_unlocked", "motion_alert", "rfid_invalid"]),
+            "detail": f"detail {i % 7}",
+            "timestamp": T0 + i + rng.random() * 20,  # slightly out of order
+            "device_id": rng.choice([None, "front", "back"]),
+        }
+        for i in range(count)
+    ]
+
+
+def as_stored(records, first_id=1):
+    logs = []
+    for i, record in enumerate(records):
+        log = {"id": first_id + i, **record}
+        if log["device_id"] is None:
+            del log["device_id"]
+        logs.append(log)
+    return logs
+
+
+@pytest.fixture
+def tiered(tmp_path):
+    store = TieredLogStore(str(tmp_path), hot_events=50, evict_chunk=40)
+    records = make_records(400)
+    for start in range(0, len(records), 25):
+        store.append(records[start:start + 25], T0)
+        store.evict_excess()  # as the background thread would, but before the next append
+    return store, as_stored(records)
+
+
+def expected_page(logs, limit, before=None, after=None, **filters):
+    matches = [
+        log for log in logs
+        if (before is None or log["id"] < before) and (after is None or log["id"] > after) and log_matches(log, **filters)
+    ]
+    if after is not None:
+        return matches[:limit], len(matches) > limit
+    return matches[-limit:], len(matches) > limit
+
+
+def check_pages(store, logs, rounds=300):
+    rng = random.Random(7)
+    first, last = logs[0]["id"], logs[-1]["id"]
+    for _ in range(rounds):
+        limit = rng.randint(1, 60)
+        before = rng.choice([None, rng.randint(first, last + 1)])
+        after = rng.choice([None, rng.randint(first - 1, last)])
+        filters = {
+            "event": rng.choice([None, "motion_alert", "rfid_invalid", "unknown"]),
+            "device_id": rng.choice([None, "front", "unknown"]),
+        }
+        if rng.random() < 0.5:
+            filters["start"] = T0 + rng.randint(0, 400)
+            filters["end"] = filters["start"] + rng.randint(0, 120)
+        args = dict(limit=limit, before=before, after=after, **filters)
+        assert store.page(**args) == expected_page(logs, **args), args
+
+
+def test_evicts_to_warm_segments_without_losing_rows(tiered):
+    store, logs = tiered
+    assert len(store.hot) <= store.hot_events + store.evict_chunk
+    assert store.segments and all(not segment.compressed for segment in store.segments)
+    assert len(store) == len(logs)
+    assert store.rows() == logs
+    assert list(store.iter_rows(chunk_size=17)) == logs
+    assert store.get(1) == logs[0] and store.get(len(logs)) == logs[-1]
+    assert store.tail(70) == logs[-70:]
+    assert store.since(100, 30) == logs[100:130]
+
+
+def test_appends_and_reads_do_not_wait_for_a_segment_write(tmp_path, monkeypatch):
+    import threading
+    store = TieredLogStore(str(tmp_path), hot_events=10, evict_chunk=10)
+    writing, release = threading.Event(), threading.Event()
+    write = Segment.write
+
+    def slow_write(*args, **kwargs):
+        writing.set()
+        assert release.wait(5)
+        return write(*args, **kwargs)
+
+    monkeypatch.setattr(Segment, "write", slow_write)
+    logs = as_stored(make_records(30))
+    records = [{key: value for key, value in log.items() if key != "id"} for log in logs]
+    store.append(records[:25], T0)
+    assert writing.wait(5)
+    # The background eviction is mid-write: the store stays usable and whole
+    store.append(records[25:], T0)
+    assert store.rows() == logs and store.tail(3) == logs[-3:]
+    release.set()
+    store.evict_excess()  # waits for the background eviction
+    assert [segment.count for segment in store.segments] == [15] and store.rows() == logs
+    store.close()
+
+
+def test_page_across_hot_and_warm_tiers(tiered):
+    store, logs = tiered
+    check_pages(store, logs)
+
+
+def test_page_across_cold_tier_and_after_reopening(tiered, tmp_path):
+    store, logs = tiered
+    store.cold_after_hours = 0
+    store.maintain(T0 + 10**6)
+    assert all(segment.compressed for segment in store.segments)
+    check_pages(store, logs, rounds=100)
+
+    reopened = TieredLogStore(str(tmp_path), hot_events=50, evict_chunk=40)
+    reopened.load(logs[reopened.hot.first_id - 1:])
+    check_pages(reopened, logs, rounds=100)
+
+
+def test_counts_span_every_tier(tiered):
+    store, logs = tiered
+    for event in (None, "motion_alert", "unknown"):
+        for device_id in (None, "back", "unknown"):
+            expected = sum(1 for log in logs if log_matches(log, event=event, device_id=device_id))
+            assert store.count(event, device_id) == expected
+    for after in (None, 0, 123, 390):
+        newer = [log for log in logs if after is None or log["id"] > after]
+        events, devices = {}, {}
+        for log in newer:
+            events[log["event"]] = events.get(log["event"], 0) + 1
+            if "device_id" in log:
+                devices[log["device_id"]] = devices.get(log["device_id"], 0) + 1
+        assert store.event_counts(after) == events
+        assert store.device_counts(after) == devices
+
+
+def test_purge_drops_the_oldest_cold_segments(tiered):
+    store, logs = tiered
+    store.cold_after_hours = 0
+    store.purge_after_days = 1
+    purged = store.maintain(T0 + 10**6)
+    assert purged and not store.segments
+    assert store.first_id == store.hot.first_id
+    assert store.rows() == logs[store.first_id - 1:]
+    assert store.count() == len(logs) - sum(segment.count for segment in purged)
+
+
+def age_out(tmp_path, per_minute, hours):
+    store = TieredLogStore(str(tmp_path), hot_events=10**6, hot_hours=1, evict_chunk=100)
+    for minute in range(hours * 60):
+        now = T0 + minute * 60
+        store.append([{"event": "motion_alert", "detail": "", "timestamp": now}] * per_minute, now)
+        store.maintain(now)
+    return store
+
+
+def test_age_eviction_writes_whole_chunks(tmp_path):
+    store = age_out(tmp_path, per_minute=5, hours=4)
+    assert store.segments
+    assert all(segment.count == 100 for segment in store.segments)
+    assert store.hot.get(store.hot.first_id)["timestamp"] >= T0 + 4 * 3600 - 2 * 3600
+
+
+def test_age_eviction_of_a_trickle_writes_one_segment_per_hot_hours(tmp_path):
+    # One event a minute never fills a chunk: before, every run wrote a one-event segment
+    store = age_out(tmp_path, per_minute=1, hours=6)
+    assert 4 <= len(store.segments) <= 6
+    assert sum(segment.count for segment in store.segments) + len(store.hot) == 360
+
+
+def test_iter_rows_survives_a_segment_compressed_mid_read(tiered, monkeypatch):
+    store, logs = tiered
+    store.cold_after_hours = 0
+    read = Segment.read
+    compressed = []
+
+    def read_after_compressing(segment):
+        if not compressed:
+            compressed.append(True)
+            store.maintain(T0 + 10**6)  # deletes the warm file being read
+        return read(segment)
+
+    monkeypatch.setattr(Segment, "read", read_after_compressing)
+    assert list(store.iter_rows()) == logs
+    assert compressed
@@ -0,0 +1,120 @@
+import random
+from collections import Counter
+
+import pytest
+
+import rollups
+from rollups import DAY, HOUR, MINUTE, Rollups
+
+T0 = 1_700_000_000.0  # not aligned to an hour
+
+
+def brute_series(logs, start, end, bucket, events=None):
+    series = []
+    for bucket_start in range(int(start // bucket) * bucket, int(end), bucket):
+        counts = Counter(
+            log["event"] for log in logs
+            if bucket_start <= log["timestamp"] < bucket_start + bucket and (events is None or log["event"] in events)
+        )
+        series.append({"start": bucket_start, "counts": dict(counts), "total": sum(counts.values())})
+    return series
+
+
+def ingest(minute_hours=6, steps=2000, seed=3, snapshot_every=None):
+    """Feed batches with out-of-order and late timestamps; return (rollups, logs, now)."""
+    rng = random.Random(seed)
+    table = Rollups(minute_hours=minute_hours)
+    logs, now, log_id = [], T0, 0
+    for step in range(steps):
+        now += rng.random() * 200
+        batch = []
+        for _ in range(rng.randint(1, 4)):
+            log_id += 1
+            late = rng.random() * 3 * DAY if rng.random() < 0.05 else rng.random() * 30
+            batch.append({"id": log_id, "timestamp": now - late, "event": rng.choice("abc")})
+        logs += batch
+        table.add(batch, now)
+        if snapshot_every and step % snapshot_every == 0:
+            table = Rollups.from_json(table.to_json(), minute_hours)
+    return table, logs, now
+
+
+@pytest.mark.parametrize("snapshot_every", [None, 300])
+def test_series_match_brute_force_at_every_resolution(snapshot_every):
+    table, logs, now = ingest(snapshot_every=snapshot_every)
+    start, end = T0 - 4 * DAY, now + HOUR
+    for bucket in (DAY, 2 * DAY, HOUR, 6 * HOUR):
+        assert table.series(start, end, bucket) == brute_series(logs, start, end, bucket)
+    # Minute buckets are complete from minutes_from on
+    first = -(-table.minutes_from // 300) * 300
+    for bucket in (MINUTE, 5 * MINUTE):
+        assert table.series(first, now + MINUTE, bucket, ["a", "b"]) == brute_series(logs, first, now + MINUTE, bucket, ["a", "b"])
+
+
+def test_minute_cutoff_follows_the_server_clock():
+    table, logs, now = ingest(minute_hours=6, steps=500)
+    assert now - 6 * HOUR - MINUTE <= table.minutes_from <= now - 6 * HOUR
+    assert min(table.minutes) >= table.minutes_from
+
+
+def test_future_timestamps_do_not_drop_recent_minutes():
+    table = Rollups(minute_hours=2)
+    now = T0
+    table.add([{"id": 1, "timestamp": now - 30, "event": "a"}], now)
+    table.add([{"id": 2, "timestamp": now + 30 * DAY, "event": "b"}], now)
+    table.add([{"id": 3, "timestamp": now - 3 * HOUR, "event": "c"}], now)  # late, before the minute window
+
+    assert table.minutes_from > now - 2 * HOUR - MINUTE
+    minute = int((now - 30) // MINUTE) * MINUTE
+    assert table.series(minute, minute + MINUTE, MINUTE)[0]["counts"] == {"a": 1}
+    assert table.series(now + 30 * DAY, now + 30 * DAY + MINUTE, MINUTE)[0]["counts"] == {"b": 1}
+    # Too old for minutes, but still counted in its hour
+    assert sum(bucket["total"] for bucket in table.series(now - 4 * HOUR, now, HOUR)) == 2
+
+
+def test_compact_folds_closed_hours_and_expires_minutes_in_order():
+    table = Rollups(minute_hours=1)
+    table.add([{"id": i + 1, "timestamp": T0 + i * MINUTE, "event": "a"} for i in range(180)], T0 + 180 * MINUTE)
+    table.compact(T0 + 3 * DAY)
+    assert table.hours_upto == int((T0 + 3 * DAY) // HOUR) * HOUR
+    assert table.days_upto == int((T0 + 3 * DAY) // DAY) * DAY
+    assert not table.minutes and not table._minute_order
+    assert sum(counts["a"] for counts in table.hours.values()) == 180
+    assert sum(counts["a"] for counts in table.days.values()) == 180
+
+
+def test_minutes_from_is_none_before_the_first_event():
+    table = Rollups()
+    table.add([], T0)
+    table.compact(T0)
+    assert table.minutes_from is None
+    hour = int(T0 // HOUR) * HOUR
+    assert table.series(hour, hour + HOUR, HOUR) == [{"start": hour, "counts": {}, "total": 0}]
+
+
+def test_resolution():
+    assert (Rollups.resolution(DAY), Rollups.resolution(2 * HOUR), Rollups.resolution(5 * MINUTE)) == (DAY, HOUR, MINUTE)
+    with pytest.raises(ValueError):
+        Rollups.resolution(90)
+
+
+def test_snapshots_round_trip(tmp_path):
+    table, logs, now = ingest(steps=300)
+    path = str(tmp_path / "rollups.json")
+    rollups.save(table.to_json(), path)
+    loaded = rollups.load(path, table.minute_hours)
+    assert (loaded.upto, loaded.clock, loaded.minutes_from) == (table.upto, table.clock, table.minutes_from)
+    assert loaded.series(T0 - DAY, now, HOUR) == table.series(T0 - DAY, now, HOUR)
+    assert rollups.load(str(tmp_path / "missing.json")) is None
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert rollups.load(path) is None
+
+
+def test_non_finite_timestamps_are_skipped():
+    table = Rollups()
+    table.add([{"id": 1, "timestamp": float("nan"), "event": "a"},
+               {"id": 2, "timestamp": float("inf"), "event": "a"},
+               {"id": 3, "timestamp": T0, "event": "a"}], T0)
+    assert table.upto == 3
+    assert table.series(T0 - HOUR, T0 + HOUR, HOUR)[1]["total"] == 1
@@ -0,0 +1,54 @@
+T0 = 1_700_000_000.0
+
+
+def ingest(backend, *logs):
+    backend.append_records([
+        {"event": event, "detail": detail, "timestamp": T0, "device_id": device_id}
+        for event, detail, device_id in logs
+    ])
+
+
+def search(client, q, **params):
+    return client.get("/api/search", params={"q": q, **params})
+
+
+def result_ids(response):
+    return [hit["log"]["id"] for hit in response.json()["results"]]
+
+
+def test_search_ranks_matching_events(client, app_state):
+    ingest(
+        app_state,
+        ("door_unlocked", "front door opened with card 7", "front"),
+        ("motion_alert", "motion in the hall", "hall"),
+        ("door_unlocked", "back door opened", "back"),
+        ("rfid_invalid", "unknown card at the front door", "front"),
+    )
+    response = search(client, "front door")
+    body = response.json()
+    assert body["total"] == 2 and body["complete"] is True
+    assert sorted(result_ids(response)) == [1, 4]
+    assert body["results"][0]["score"] >= body["results"][1]["score"]
+    assert result_ids(search(client, '"back door"')) == [3]
+    assert sorted(result_ids(search(client, "door -card"))) == [3]
+    assert sorted(result_ids(search(client, "hall OR back"))) == [2, 3]
+
+
+def test_search_pages_and_rejects_bad_queries(client, app_state):
+    ingest(app_state, *[("door_unlocked", f"card {i}", None) for i in range(5)])
+    first = search(client, "card", limit=2).json()
+    second = search(client, "card", limit=2, offset=2).json()
+    assert first["total"] == second["total"] == 5
+    assert not {hit["log"]["id"] for hit in first["results"]} & {hit["log"]["id"] for hit in second["results"]}
+    assert search(client, "(card").status_code == 400
+    assert search(client, "card", limit=app_state.SEARCH_PAGE_MAX + 1).status_code == 422
+
+
+def test_search_is_incomplete_until_the_startup_build_catches_up(client, app_state, monkeypatch):
+    monkeypatch.setattr(app_state, "search_ready", False)
+    ingest(app_state, ("door_unlocked", "card 7", None))  # not indexed while the build runs
+    body = search(client, "card").json()
+    assert (body["total"], body["complete"]) == (0, False)
+    app_state.build_search_index()
+    body = search(client, "card").json()
+    assert (body["total"], body["complete"]) == (1, True)
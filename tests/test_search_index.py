@@ -0,0 +1,94 @@
+import pytest
+
+from search_index import SearchIndex, parse_query, tokenize
+
+
+def test_tokenize_splits_on_non_alphanumerics():
+    assert tokenize("RFID_invalid: card #42") == ["rfid", "invalid", "card", "42"]
+
+
+@pytest.mark.parametrize("query, tree", [
+    ("door", ("terms", ("door",))),
+    ("door motion", ("and", [("terms", ("door",)), ("terms", ("motion",))])),
+    ("door AND motion", ("and", [("terms", ("door",)), ("terms", ("motion",))])),
+    ("door OR motion", ("or", [("terms", ("door",)), ("terms", ("motion",))])),
+    ("door -auto", ("and", [("terms", ("door",)), ("not", ("terms", ("auto",)))])),
+    ("NOT door", ("not", ("terms", ("door",)))),
+    ('"auto lock"', ("terms", ("auto", "lock"))),
+    ("rfid_invalid", ("terms", ("rfid", "invalid"))),
+    ("(door OR rfid) alert", ("and", [
+        ("or", [("terms", ("door",)), ("terms", ("rfid",))]),
+        ("terms", ("alert",)),
+    ])),
+    ("door or motion", ("and", [("terms", ("door",)), ("terms", ("or",)), ("terms", ("motion",))])),
+])
+def test_parse_query(query, tree):
+    assert parse_query(query) == tree
+
+
+@pytest.mark.parametrize("query, message", [
+    ("", "no search terms"),
+    ("!!! ...", "no search terms"),
+    ("(door", "Unbalanced parenthesis"),
+    ("door)", "Unexpected"),
+    ("door NOT", "needs something to negate"),
+    ("door -", "needs something to negate"),
+])
+def test_parse_query_errors(query, message):
+    with pytest.raises(ValueError, match=message):
+        parse_query(query)
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add([
+        {"id": 1, "event": "door_unlocked", "detail": "RFID authorized", "device_id": "front"},
+        {"id": 2, "event": "motion_alert", "detail": "Possible intrusion detected"},
+        {"id": 3, "event": "door_autolock", "detail": "Auto-lock executed", "device_id": "front"},
+        {"id": 4, "event": "rfid_invalid", "detail": "Unauthorized card scanned", "device_id": "back"},
+        {"id": 5, "event": "door_unlocked", "detail": "RFID authorized", "device_id": "front"},
+    ])
+    return index
+
+
+def ids(index, query, **kwargs):
+    return [log_id for log_id, _ in index.search(query, **kwargs)[0]]
+
+
+def test_search_matches_boolean_queries(index):
+    assert sorted(ids(index, "door")) == [1, 3, 5]
+    assert sorted(ids(index, "door -front")) == []
+    assert sorted(ids(index, "rfid OR motion")) == [1, 2, 4, 5]
+    assert sorted(ids(index, "NOT door")) == [2, 4]
+    assert ids(index, '"auto lock"') == [3]
+    assert ids(index, '"lock auto"') == []
+    assert ids(index, "nothing") == []
+
+
+def test_search_ranks_by_bm25_then_newest(index):
+    results, total = index.search("rfid unlocked")
+    assert total == 2
+    assert [log_id for log_id, _ in results] == [5, 1]
+    assert results[0][1] == results[1][1] > 0
+    # A rarer term scores higher than a common one
+    assert index.search("intrusion")[0][0][1] > index.search("door")[0][0][1]
+
+
+def test_search_pages_with_limit_and_offset(index):
+    assert ids(index, "door", limit=2) == [5, 1]
+    assert ids(index, "door", limit=2, offset=2) == [3]
+    assert index.search("door", limit=1)[1] == 3
+
+
+def test_trim_forgets_old_events_and_empty_shapes(index):
+    index.trim(4)
+    assert len(index) == 2
+    assert ids(index, "rfid") == [5, 4]
+    assert ids(index, "motion") == []
+    assert "motion" not in index.postings and "motion" not in index.doc_freq
+    assert index.stats()["documents"] == 2
+    # Re-adding a trimmed shape starts a new one
+    index.add([{"id": 6, "event": "motion_alert", "detail": "Possible intrusion detected"}])
+    assert ids(index, "motion") == [6]
+    assert index.doc_freq["motion"] == 1
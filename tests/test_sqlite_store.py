@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+from log_store import LogStore
+from sqlite_store import SQLiteLogStore
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def stores(tmp_path):
+    """A LogStore and a SQLiteLogStore fed the same batches."""
+    rng = random.Random(2)
+    memory, sqlite = LogStore(), SQLiteLogStore(str(tmp_path / "logs.db"))
+    for batch in range(20):
+        records = [
+            {
+                "event": rng.choice(["door_unlocked", "motion_alert", "rfid_invalid"]),
+                "detail": f"detail {i}",
+                "timestamp": rng.choice([None, T0 + batch * 30 + rng.random() * 60]),
+                "device_id": rng.choice([None, "front", "back"]),
+                "seq": rng.choice([None, batch * 100 + i]),
+            }
+            for i in range(rng.randint(1, 15))
+        ]
+        assert sqlite.append(records, T0 + batch) == memory.append(records, T0 + batch)
+    yield memory, sqlite
+    sqlite.close()
+
+
+def test_reads_match_the_memory_store(stores):
+    memory, sqlite = stores
+    assert (len(sqlite), sqlite.first_id, sqlite.last_id) == (len(memory), memory.first_id, memory.last_id)
+    assert sqlite.rows() == memory.rows() and sqlite.rows(5, 12) == memory.rows(5, 12)
+    assert sqlite.get(7) == memory.get(7) and sqlite.get(10**6) is None
+    assert sqlite.since(40, 10) == memory.since(40, 10)
+    assert sqlite.tail(9) == memory.tail(9)
+    assert list(sqlite.iter_rows(chunk_size=7)) == memory.rows()
+
+
+def test_page_and_counts_match_the_memory_store(stores):
+    memory, sqlite = stores
+    rng = random.Random(4)
+    for _ in range(300):
+        args = dict(
+            limit=rng.randint(1, 30),
+            before=rng.choice([None, rng.randint(1, memory.last_id + 1)]),
+            after=rng.choice([None, rng.randint(0, memory.last_id)]),
+            event=rng.choice([None, "motion_alert", "unknown"]),
+            device_id=rng.choice([None, "back", "unknown"]),
+            start=rng.choice([None, T0 + rng.randint(0, 600)]),
+            end=rng.choice([None, T0 + rng.randint(0, 900)]),
+        )
+        assert sqlite.page(**args) == memory.page(**args), args
+    for event in (None, "rfid_invalid", "unknown"):
+        for device_id in (None, "front", "unknown"):
+            assert sqlite.count(event, device_id) == memory.count(event, device_id)
+    for after in (None, 0, 50):
+        assert sqlite.event_counts(after) == memory.event_counts(after)
+        assert sqlite.device_counts(after) == memory.device_counts(after)
+
+
+def test_reopening_restores_ids_and_counts(stores, tmp_path):
+    memory, sqlite = stores
+    sqlite.close()
+    reopened = SQLiteLogStore(str(tmp_path / "logs.db"))
+    assert (len(reopened), reopened.last_id) == (len(memory), memory.last_id)
+    assert reopened.event_counts() == memory.event_counts()
+    assert reopened.device_counts() == memory.device_counts()
+    log = reopened.append([{"event": "door_locked", "detail": "", "timestamp": T0}], T0)[0]
+    assert log["id"] == memory.last_id + 1
+    reopened.close()
+
+
+@pytest.mark.parametrize("filters", [
+    {"event": "motion_alert"},
+    {"device_id": "front"},
+    {"event": "motion_alert", "device_id": "front"},
+    {"event": "motion_alert", "start": T0, "end": T0 + 300},
+    {"start": T0},
+    {},
+])
+@pytest.mark.parametrize("cursor", [{}, {"before": 50}, {"after": 20}])
+def test_pages_walk_an_index_in_id_order(stores, filters, cursor):
+    _, sqlite = stores
+    statements = []
+    sqlite.db.set_trace_callback(statements.append)
+    sqlite.page(10, **cursor, **filters)
+    sqlite.db.set_trace_callback(None)
+    plan = " ".join(row[3] for row in sqlite.db.execute("EXPLAIN QUERY PLAN " + statements[-1]))
+    assert "TEMP B-TREE" not in plan
+    if "event" in filters or "device_id" in filters:
+        assert "USING INDEX" in plan
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+import summary_cache
+from summary_cache import SummaryCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(summary_cache, "time", clock)
+    return clock
+
+
+class Generator:
+    """A summary generator that counts calls and can be made to fail or wait."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            raise RuntimeError("model unavailable")
+        return f"summary {self.calls}"
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_serves_the_cached_summary_while_current(clock):
+    async def scenario():
+        cache, generate = SummaryCache(stale_seconds=30), Generator()
+        first = await cache.get(1, generate)
+        assert (first.text, first.version) == ("summary 1", 1)
+        assert await cache.get(1, generate) is first
+        clock.now += 10
+        assert await cache.get(2, generate) is first  # newer logs, but not stale yet
+        assert generate.calls == 1 and cache.hits == 2
+
+    run(scenario())
+
+
+def test_stale_summary_is_served_while_one_refresh_runs(clock):
+    async def scenario():
+        cache, generate = SummaryCache(stale_seconds=30), Generator()
+        first = await cache.get(1, generate)
+        clock.now += 60
+        generate.release = asyncio.Event()
+        results = await asyncio.gather(*(cache.get(2, generate) for _ in range(5)))
+        assert all(result is first for result in results)
+        assert generate.calls == 2 and cache.stats()["generating"]
+        generate.release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        fresh = await cache.get(2, generate)
+        assert (fresh.text, fresh.version, fresh.serial) == ("summary 2", 2, 2)
+        assert cache.stale_hits == 5
+
+    run(scenario())
+
+
+def test_first_requests_share_one_generation(clock):
+    async def scenario():
+        cache, generate = SummaryCache(), Generator()
+        results = await asyncio.gather(*(cache.get(1, generate) for _ in range(10)))
+        assert generate.calls == 1
+        assert len({id(result) for result in results}) == 1
+
+    run(scenario())
+
+
+def test_refresh_seconds_regenerates_an_unchanged_summary(clock):
+    async def scenario():
+        cache, generate = SummaryCache(stale_seconds=30, refresh_seconds=120), Generator()
+        await cache.get(1, generate)
+        clock.now += 119
+        await cache.get(1, generate)
+        assert generate.calls == 1
+        clock.now += 1
+        await cache.get(1, generate)
+        await asyncio.sleep(0)
+        assert generate.calls == 2
+
+    run(scenario())
+
+
+def test_failures_back_off_and_keep_serving_the_old_summary(clock):
+    async def scenario():
+        cache, generate = SummaryCache(stale_seconds=2), Generator()
+        generate.fail = True
+        with pytest.raises(RuntimeError):
+            await cache.get(1, generate)
+        # Backing off: the error is raised again without calling the model
+        with pytest.raises(RuntimeError):
+            await cache.get(1, generate)
+        assert generate.calls == 1 and cache.failures == 1
+        clock.now += summary_cache.RETRY_SECONDS  # backoff is at least RETRY_SECONDS
+        generate.fail = False
+        first = await cache.get(1, generate)
+        assert generate.calls == 2
+
+        clock.now += 10
+        generate.fail = True
+        assert await cache.get(2, generate) is first
+        await asyncio.sleep(0)
+        assert cache.failures == 2
+        assert await cache.get(2, generate) is first
+        assert generate.calls == 3
+
+    run(scenario())
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+T0 = 1_700_000_000.0
+
+
+@pytest.fixture
+def snapshots(app_state, fake_embeddings, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_state, "VECTOR_INDEX_DIR", str(tmp_path / "faiss"))
+    return app_state
+
+
+def store_logs(backend, count):
+    return backend.store.append([{"event": "door_unlocked", "detail": f"card {i}", "timestamp": T0} for i in range(count)], T0)
+
+
+def indexed_ids(backend):
+    return sorted(int(doc_id) for doc_id in backend.vector_store.index_to_docstore_id.values())
+
+
+def save_and_forget(backend, indexed_upto, monkeypatch):
+    """Snapshot the index as of indexed_upto, then drop it as a restart would."""
+    monkeypatch.setattr(backend, "indexed_upto", indexed_upto)
+    asyncio.run(backend.snapshot_vector_index())
+    monkeypatch.setattr(backend, "vector_store", None)
+    monkeypatch.setattr(backend, "indexed_upto", 0)
+
+
+def test_a_snapshot_restores_the_index_and_watermark(snapshots, fake_embeddings, monkeypatch):
+    asyncio.run(snapshots.index_logs(store_logs(snapshots, 6)))
+    save_and_forget(snapshots, 6, monkeypatch)
+    embedded = len(fake_embeddings.documents)
+
+    snapshots.load_vector_snapshot()
+    assert indexed_ids(snapshots) == [1, 2, 3, 4, 5, 6]
+    assert (snapshots.indexed_upto, snapshots.repair_ids) == (6, [])
+    assert len(fake_embeddings.documents) == embedded  # nothing re-embedded
+
+
+def test_loading_reconciles_the_snapshot_with_the_store(snapshots, fake_embeddings, monkeypatch):
+    logs = store_logs(snapshots, 7)
+    asyncio.run(snapshots.index_logs([logs[i] for i in (0, 1, 3, 4)]))
+    save_and_forget(snapshots, 5, monkeypatch)
+    snapshots.store.evict(2)  # ids 1-2 left the store while the server was down
+
+    snapshots.load_vector_snapshot()
+    assert indexed_ids(snapshots) == [4, 5]
+    assert (snapshots.indexed_upto, snapshots.repair_ids) == (5, [3])
+    asyncio.run(snapshots.repair_index())
+    assert indexed_ids(snapshots) == [3, 4, 5] and snapshots.repair_ids == []
+
+
+@pytest.mark.parametrize("mismatch", ["model", "store"])
+def test_a_snapshot_that_does_not_match_is_ignored(snapshots, fake_embeddings, monkeypatch, mismatch):
+    asyncio.run(snapshots.index_logs(store_logs(snapshots, 3)))
+    save_and_forget(snapshots, 3, monkeypatch)
+    if mismatch == "model":
+        monkeypatch.setattr(fake_embeddings, "namespace", "another-model")
+    else:
+        monkeypatch.setattr(snapshots, "store", type(snapshots.store)())  # a store that lost its history
+    snapshots.load_vector_snapshot()
+    assert snapshots.vector_store is None and snapshots.indexed_upto == 0
+
+
+def test_snapshots_are_only_written_when_the_index_changed(snapshots, monkeypatch):
+    import vector_index
+    saves = []
+    monkeypatch.setattr(vector_index, "save", lambda *args: saves.append(args))
+    asyncio.run(snapshots.index_logs(store_logs(snapshots, 2)))
+    asyncio.run(snapshots.snapshot_vector_index())
+    asyncio.run(snapshots.snapshot_vector_index())
+    assert len(saves) == 1 and saves[0][2]["vectors"] == 2
@@ -0,0 +1,159 @@
+import os
+
+import pytest
+
+from wal import WriteAheadLog, decode_frames, encode_record, encode_records
+
+
+def make_logs(first_id, count, **extra):
+    return [
+        {"id": first_id + i, "event": "door_unlocked", "detail": f"detail {i % 3}", "timestamp": 1000.0 + i, **extra}
+        for i in range(count)
+    ]
+
+
+def test_frames_round_trip_optional_fields():
+    logs = [
+        {"id": 1, "event": "motion_alert", "detail": "hall", "timestamp": 1.5},
+        {"id": 2, "event": "rfid_valid", "detail": "ünïcode", "timestamp": 2.5, "device_id": "esp32-1", "seq": 7},
+        {"id": 3, "event": "door_locked", "detail": "", "timestamp": 3.5, "device_id": ""},
+    ]
+    assert list(decode_frames(encode_records(logs))) == logs
+
+
+def test_decode_frames_rejects_damage():
+    data = encode_records(make_logs(1, 2))
+    with pytest.raises(ValueError, match="truncated"):
+        list(decode_frames(data[:5]))
+    damaged = bytearray(data)
+    damaged[-1] ^= 0xFF
+    with pytest.raises(ValueError, match="corrupt"):
+        list(decode_frames(bytes(damaged)))
+
+
+def test_oversized_fields_raise_value_error():
+    log = make_logs(1, 1)[0]
+    with pytest.raises(ValueError, match="event"):
+        encode_record(dict(log, event="x" * 0x10000))
+    with pytest.raises(ValueError, match="device id"):
+        encode_record(dict(log, device_id="x" * 0xFFFF))
+    encode_record(dict(log, event="x" * 0xFFFF, device_id="x" * 0xFFFE))
+
+
+def test_replay_returns_appended_logs_across_segments(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), segment_bytes=200, fsync="always")
+    logs = make_logs(1, 30, device_id="d1")
+    for start in range(0, 30, 4):
+        wal.append(logs[start:start + 4])
+    wal.close()
+    assert len(wal.segments()) > 1
+    assert list(WriteAheadLog(str(tmp_path)).replay()) == logs
+
+
+def test_replay_after_a_failed_append_keeps_every_log(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), fsync="always")
+    wal.append(make_logs(1, 3))
+    # Encoding fails before anything is written, so the ids stay contiguous
+    with pytest.raises(ValueError):
+        wal.append([dict(make_logs(4, 1)[0], event="x" * 70000)])
+    later = make_logs(4, 3)
+    wal.append(later, encode_records(later))
+    wal.close()
+    assert [log["id"] for log in WriteAheadLog(str(tmp_path)).replay()] == list(range(1, 7))
+
+
+def test_replay_truncates_a_torn_tail(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), fsync="always")
+    wal.append(make_logs(1, 5))
+    wal.close()
+    path = wal.segments()[0]
+    intact = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(encode_records(make_logs(6, 1))[:-3])
+
+    assert [log["id"] for log in WriteAheadLog(str(tmp_path)).replay()] == [1, 2, 3, 4, 5]
+    assert os.path.getsize(path) == intact
+    # The truncated log takes new appends after the last intact frame
+    wal = WriteAheadLog(str(tmp_path), fsync="always")
+    wal.append(make_logs(6, 2))
+    wal.close()
+    assert [log["id"] for log in WriteAheadLog(str(tmp_path)).replay()] == list(range(1, 8))
+
+
+def test_replay_stops_at_an_id_gap_and_sets_later_segments_aside(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), segment_bytes=1, fsync="always")
+    wal.append(make_logs(1, 2))
+    wal.append(make_logs(4, 2))  # id 3 is missing
+    wal.append(make_logs(6, 2))
+    wal.close()
+
+    assert [log["id"] for log in WriteAheadLog(str(tmp_path)).replay()] == [1, 2]
+    assert len(wal.segments()) == 2
+    assert sum(name.endswith(".orphaned") for name in os.listdir(tmp_path)) == 1
+
+
+def test_truncate_before_keeps_the_segment_holding_the_id(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), segment_bytes=1, fsync="always")
+    for first in (1, 3, 5):
+        wal.append(make_logs(first, 2))
+    wal.truncate_before(4)
+    wal.close()
+    assert [log["id"] for log in WriteAheadLog(str(tmp_path)).replay()] == [3, 4, 5, 6]
+
+
+def failing(message):
+    def call(*args):
+        raise OSError(message)
+    return call
+
+
+def fill_disk_after(monkeypatch, written):
+    """Make the next os.write store `written` bytes, then fail as a full disk does."""
+    import errno
+    import wal as wal_module
+    real_write = os.write
+
+    def write(fd, data):
+        monkeypatch.setattr(wal_module.os, "write", real_write)
+        real_write(fd, data[:written])
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(wal_module.os, "write", write)
+
+
+def test_a_failed_write_is_cut_back_off_the_segment(tmp_path, monkeypatch):
+    wal = WriteAheadLog(str(tmp_path), fsync="always")
+    wal.append(make_logs(1, 3))
+    fill_disk_after(monkeypatch, 10)
+    with pytest.raises(OSError, match="No space"):
+        wal.append(make_logs(4, 2))
+    # Nothing of the failed write is left, and the same ids can be written again
+    wal.append(make_logs(4, 2))
+    wal.close()
+    assert wal.failed is None
+    assert [log["id"] for log in WriteAheadLog(str(tmp_path)).replay()] == [1, 2, 3, 4, 5]
+
+
+def test_the_log_stops_when_a_failed_write_cannot_be_cut_back(tmp_path, monkeypatch):
+    import wal as wal_module
+    wal = WriteAheadLog(str(tmp_path), fsync="group")
+    wal.append(make_logs(1, 1))
+    fill_disk_after(monkeypatch, 10)
+    monkeypatch.setattr(wal_module.os, "ftruncate", failing("read-only"))
+    with pytest.raises(OSError):
+        wal.append(make_logs(2, 1))
+    with pytest.raises(OSError, match="stopped"):
+        wal.append(make_logs(2, 1))
+    assert wal.stats()["failed"] == "read-only"
+
+
+def test_a_failed_fsync_stops_the_log_and_drops_the_write(tmp_path, monkeypatch):
+    import wal as wal_module
+    wal = WriteAheadLog(str(tmp_path), fsync="always")
+    wal.append(make_logs(1, 2))
+    monkeypatch.setattr(wal_module.os, "fsync", failing("I/O error"))
+    with pytest.raises(OSError, match="I/O error"):
+        wal.append(make_logs(3, 2))
+    with pytest.raises(OSError, match="stopped"):
+        wal.append(make_logs(3, 2))
+    assert [log["id"] for log in WriteAheadLog(str(tmp_path)).replay()] == [1, 2]
@@ -0,0 +1,45 @@
+# vector_index.py
+"""Snapshots of the FAISS vector index on disk.
+
+A snapshot is a directory holding FAISS's own files (the index plus a pickle
+of the docstore and the index-to-docstore-id mapping) and a meta.json with
+the log-id watermark it covers. It is written to a temporary directory and
+swapped in, so a crash mid-save leaves the previous snapshot readable.
+"""
+import json
+import os
+import shutil
+from typing import Optional
+
+META_FILE = "meta.json"
+
+
+def save(vector_store, directory: str, meta: dict):
+    tmp, old = directory + ".tmp", directory + ".old"
+    shutil.rmtree(tmp, ignore_errors=True)
+    vector_store.save_local(tmp)
+    with open(os.path.join(tmp, META_FILE), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load(directory: str, embeddings) -> Optional[tuple]:
+    """Return (vector_store, meta) from the newest readable snapshot, or None."""
+    from langchain_community.vectorstores import FAISS
+    for path in (directory, directory + ".old"):
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            continue
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # The pickle is one this server wrote itself
+            vector_store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+            return vector_store, meta
+        except Exception as e:
+            print(f"Could not load vector index snapshot from {path}: {e}")
+    return None
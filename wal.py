@@ -0,0 +1,310 @@
+# wal.py
+"""Segmented, checksummed append-only log of stored events.
+
+Each segment is named after the first event id it holds and is a sequence of
+frames:
+
+    frame  : payload length u32 | crc32(payload) u32 | payload
+    payload: id i64 | timestamp f64 | seq i64 | event length u16 |
+             detail length u32 | device id length u16 (0xFFFF = none) |
+             event | detail | device id                (UTF-8)
+
+Replay memory-maps each segment and stops at the first short or corrupt
+frame, or at a gap in the ids. The log is truncated there (a torn tail left
+by a crash mid-write) and any later segments are renamed to *.orphaned, so
+what remains is always a clean prefix that new appends can follow.
+
+fsync policies:
+    always   -- fsync inline on every append, before the request returns
+    group    -- writes go straight to the OS; concurrent requests await
+                commit() and share a single fsync run off the event loop
+    interval -- a background thread fsyncs every `fsync_interval` seconds;
+                a crash can lose up to that window
+
+A failed write is cut back off the segment and raised as OSError, so the
+caller can refuse the records it was writing. If the segment cannot be cut
+back, or an fsync fails, the log stops: every later append raises too,
+rather than letting events be acknowledged that a restart would lose.
+"""
+import asyncio
+import errno
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional
+
+FSYNC_POLICIES = ("always", "group", "interval")
+
+_FRAME = struct.Struct("<II")
+_RECORD = struct.Struct("<qdqHIH")
+_NO_DEVICE = 0xFFFF
+MAX_EVENT_BYTES = 0xFFFF
+MAX_DEVICE_BYTES = _NO_DEVICE - 1
+
+
+def encode_record(log: dict) -> bytes:
+    """Encode one frame, raising ValueError if a field does not fit its length prefix."""
+    event = log["event"].encode("utf-8")
+    detail = log["detail"].encode("utf-8")
+    device_id = log.get("device_id")
+    device = b"" if device_id is None else device_id.encode("utf-8")
+    if len(event) > MAX_EVENT_BYTES:
+        raise ValueError(f"event longer than {MAX_EVENT_BYTES} bytes")
+    if len(device) > MAX_DEVICE_BYTES:
+        raise ValueError(f"device id longer than {MAX_DEVICE_BYTES} bytes")
+    device_len = _NO_DEVICE if device_id is None else len(device)
+    payload = b"".join((
+        _RECORD.pack(log["id"], log["timestamp"], log.get("seq", -1), len(event), len(detail), device_len),
+        event,
+        detail,
+        device,
+    ))
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_record(payload: bytes, strings: Optional[Dict[bytes, str]] = None) -> dict:
+    """Decode one payload; `strings` caches decoded text across calls."""
+    if strings is None:
+        strings = {}
+    log_id, timestamp, seq, event_len, detail_len, device_len = _RECORD.unpack_from(payload, 0)
+    offset = _RECORD.size
+    raw = payload[offset:offset + event_len]
+    event = strings.get(raw)
+    if event is None:
+        event = strings[raw] = raw.decode("utf-8")
+    offset += event_len
+    raw = payload[offset:offset + detail_len]
+    detail = strings.get(raw)
+    if detail is None:
+        detail = strings[raw] = raw.decode("utf-8")
+    offset += detail_len
+    log = {"id": log_id, "event": event, "detail": detail, "timestamp": timestamp}
+    if device_len != _NO_DEVICE:
+        raw = payload[offset:offset + device_len]
+        device = strings.get(raw)
+        if device is None:
+            device = strings[raw] = raw.decode("utf-8")
+        log["device_id"] = device
+    if seq >= 0:
+        log["seq"] = seq
+    return log
+
+
+def encode_records(logs: List[dict]) -> bytes:
+    return b"".join(encode_record(log) for log in logs)
+
+
+def decode_frames(data: bytes) -> Iterator[dict]:
+    """Decode a buffer of frames written by encode_records, raising ValueError on damage."""
+    strings: Dict[bytes, str] = {}
+    offset = 0
+    while offset < len(data):
+        if offset + _FRAME.size > len(data):
+            raise ValueError(f"truncated frame at byte {offset}")
+        length, checksum = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            raise ValueError(f"corrupt frame at byte {offset}")
+        yield decode_record(payload, strings)
+        offset = start + length
+
+
+def segment_name(first_id: int) -> str:
+    return f"wal-{first_id:020d}.log"
+
+
+class WriteAheadLog:
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, fsync: str = "group", fsync_interval: float = 1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_policy = fsync
+        self.fsync_interval = fsync_interval
+        self._fd: Optional[int] = None
+        self._segment_size = 0
+        self._io_lock = threading.Lock()  # serializes fsync with segment rotation
+        self._written = 0  # appends written to the OS
+        self._synced = 0   # appends known to be on disk
+        self._sync_task: Optional[asyncio.Future] = None
+        self._closed = threading.Event()
+        self.fsyncs = 0
+        self.failed: Optional[OSError] = None  # set once the log has stopped
+
+        if fsync == "interval":
+            threading.Thread(target=self._interval_sync, name="wal-fsync", daemon=True).start()
+
+    def segments(self) -> List[str]:
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith("wal-") and name.endswith(".log"))
+        return [os.path.join(self.directory, name) for name in names]
+
+    # ----------------- replay -----------------
+    def replay(self) -> Iterator[dict]:
+        """Yield every intact record, oldest first."""
+        segments = self.segments()
+        expected = None
+        strings: Dict[bytes, str] = {}
+        for index, path in enumerate(segments):
+            size = os.path.getsize(path)
+            offset = 0
+            if size:
+                with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    while offset + _FRAME.size <= size:
+                        length, checksum = _FRAME.unpack_from(view, offset)
+                        start = offset + _FRAME.size
+                        payload = view[start:start + length]
+                        if len(payload) != length or zlib.crc32(payload) != checksum:
+                            break
+                        log = decode_record(payload, strings)
+                        if expected is not None and log["id"] != expected:
+                            break
+                        expected = log["id"] + 1
+                        yield log
+                        offset = start + length
+            if offset != size:
+                print(f"WAL: bad frame in {os.path.basename(path)} at byte {offset}, truncating")
+                os.truncate(path, offset)
+                for orphan in segments[index + 1:]:
+                    print(f"WAL: setting aside {os.path.basename(orphan)}")
+                    os.rename(orphan, orphan + ".orphaned")
+                return
+
+    # ----------------- writing -----------------
+    def _open_segment(self, first_id: int):
+        path = os.path.join(self.directory, segment_name(first_id))
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._segment_size = os.fstat(self._fd).st_size
+
+    def _rotate(self, first_id: int):
+        with self._io_lock:
+            if self._fd is not None:
+                try:
+                    os.fsync(self._fd)
+                except OSError as e:
+                    self._stop(e)
+                    raise
+                os.close(self._fd)
+                self._fd = None
+            self._open_segment(first_id)
+
+    def append(self, logs: List[dict], data: Optional[bytes] = None):
+        """Write stored logs (ids already assigned) to the current segment.
+
+        `data` is the logs already passed through encode_records, so callers
+        can encode (and fail) before changing anything else. Raises OSError,
+        with nothing left in the log, if the records could not be written.
+        """
+        if not logs:
+            return
+        self._check_running()
+        if self._fd is None:
+            segments = self.segments()
+            if segments:
+                with self._io_lock:
+                    self._fd = os.open(segments[-1], os.O_WRONLY | os.O_APPEND)
+                    self._segment_size = os.fstat(self._fd).st_size
+            else:
+                self._rotate(logs[0]["id"])
+        elif self._segment_size >= self.segment_bytes:
+            self._rotate(logs[0]["id"])
+
+        if data is None:
+            data = encode_records(logs)
+        try:
+            written = os.write(self._fd, data)
+            if written != len(data):
+                raise OSError(errno.ENOSPC, f"short write of {written} of {len(data)} bytes")
+        except OSError:
+            self._cut_back()
+            raise
+        self._segment_size += len(data)
+        self._written += 1
+        if self.fsync_policy == "always":
+            try:
+                self._fsync()
+            except OSError:
+                # Not durable, so not kept: a restart must not replay what the caller refused
+                self._segment_size -= len(data)
+                self._written -= 1
+                self._cut_back()
+                raise
+
+    def _cut_back(self):
+        """Truncate a failed append off the segment, stopping the log if that fails too."""
+        try:
+            os.ftruncate(self._fd, self._segment_size)
+        except OSError as e:
+            self._stop(e)
+
+    def _check_running(self):
+        if self.failed is not None:
+            raise OSError(f"write-ahead log stopped after an earlier error: {self.failed}")
+
+    def _stop(self, error: OSError):
+        if self.failed is None:
+            print(f"WAL: stopping after a failed write: {error}")
+            self.failed = error
+
+    def _fsync(self):
+        with self._io_lock:
+            written = self._written
+            if self._fd is not None and self._synced < written:
+                # A repeated fsync can succeed without the lost writes ever reaching the disk
+                self._check_running()
+                try:
+                    os.fsync(self._fd)
+                except OSError as e:
+                    # Whether the unsynced writes reached the disk is unknown from here on
+                    self._stop(e)
+                    raise
+                self.fsyncs += 1
+                self._synced = written
+
+    async def commit(self):
+        """Wait until everything appended so far is on disk (group policy only)."""
+        if self.fsync_policy != "group":
+            return
+        target = self._written
+        while self._synced < target:
+            if self._sync_task is None or self._sync_task.done():
+                self._sync_task = asyncio.ensure_future(asyncio.to_thread(self._fsync))
+            await asyncio.shield(self._sync_task)
+
+    def _interval_sync(self):
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                self._fsync()
+            except OSError:
+                return
+
+    def truncate_before(self, log_id: int):
+        """Delete whole segments whose events all have ids below log_id."""
+        segments = self.segments()
+        for path, next_path in zip(segments, segments[1:]):
+            next_first = int(os.path.basename(next_path)[4:-4])
+            if next_first <= log_id:
+                os.remove(path)
+
+    def close(self):
+        self._closed.set()
+        try:
+            self._fsync()
+        except OSError as e:
+            print(f"WAL: final fsync failed: {e}")
+        with self._io_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def stats(self) -> dict:
+        return {
+            "segments": len(self.segments()),
+            "fsync_policy": self.fsync_policy,
+            "fsyncs": self.fsyncs,
+            "unsynced_appends": self._written - self._synced,
+            "failed": None if self.failed is None else str(self.failed),
+        }